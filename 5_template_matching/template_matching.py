@@ -30,13 +30,15 @@ for method in methods:
 
     bottom_right = (top_left[0] + w, top_left[1] + h)
 
-    # Draw on the original image by enclosing the detected area in a rectangle
-    cv2.rectangle(img, top_left, bottom_right, 255, 2)
+    # Draw on a copy of the image by enclosing the detected area in a rectangle
+    # (drawing on img itself would change the image the next methods search in)
+    detected = img.copy()
+    cv2.rectangle(detected, top_left, bottom_right, 255, 2)
 
     plt.figure()
     plt.subplot(121), plt.imshow(matched_result, cmap="gray"), plt.title("Matched Result"), plt.axis("off")
     # plt.subplot(121) - Say there are 1 row, 2 columns - we use the 1st one
-    plt.subplot(122), plt.imshow(img, cmap="gray"), plt.title("Detected Result"), plt.axis("off")
+    plt.subplot(122), plt.imshow(detected, cmap="gray"), plt.title("Detected Result"), plt.axis("off")
     # plt.subplot(122) - Say there are 1 row, 2 columns - we use the 2nd one
 
     plt.suptitle(method)
@@ -11,13 +11,14 @@ for f in files:
         img_path_list.append(f)
 print(img_path_list)
 
+# use fronttalface from github.com/opencv/opencv/tree/master/data/haarcascades
+# load the cascade once - parsing the xml for every image is as slow as the detection itself
+detector = cv2.CascadeClassifier("haarcascade_frontalcatface.xml")
+
 for j in img_path_list:
     img = cv2.imread(j)
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-    # use fronttalface from github.com/opencv/opencv/tree/master/data/haarcascades
-    detector = cv2.CascadeClassifier("haarcascade_frontalcatface.xml")
-
     rects = detector.detectMultiScale(gray, scaleFactor=1.045, minNeighbors=2)
     # scaleFactor=1 determines how much to zoom in on the image
 
@@ -0,0 +1,4 @@
+'''
+Benchmarks for the object_detection package. Run them from the repository root, e.g.:
+    python -m benchmarks.bench_pedestrians
+'''
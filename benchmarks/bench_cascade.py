@@ -0,0 +1,114 @@
+'''
+Accuracy vs speed of FastCascadeDetector against the full-resolution detectMultiScale calls of the tutorial scripts.
+
+Still images: barcelona.jpg, einstein.jpg (frontal face) and cat_img*.jpg (cat face) at a few downscale factors.
+The boxes of the original call are the reference; recall/precision count boxes matching it with IoU >= 0.5.
+
+Video: barcelona.jpg pasted into a moving 1920x1080 frame, full search per frame vs ROI tracking.
+'''
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from object_detection.cascade import FastCascadeDetector
+from object_detection.nms import box_overlap
+from object_detection.samples import sample_path
+
+FACE = sample_path("8_face_detection", "haarcascade_frontalface_default.xml")
+CAT = sample_path("9_cat_face_detection_with_cascade", "haarcascade_frontalcatface.xml")
+
+# image, cascade, parameters of the tutorial script, expected object size
+CASES = [
+    (sample_path("8_face_detection", "einstein.jpg"), FACE, {}, 400),
+    (sample_path("8_face_detection", "barcelona.jpg"), FACE, {"minNeighbors": 7}, 85),
+] + [
+    (sample_path("9_cat_face_detection_with_cascade", "cat_img%d.jpg" % i), CAT,
+     {"scaleFactor": 1.045, "minNeighbors": 2}, 150) for i in (1, 2, 3)
+]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def match(reference, found, threshold=0.5):
+    """(recall, precision) of found against reference boxes."""
+    if len(reference) == 0 and len(found) == 0:
+        return 1.0, 1.0
+    overlap = box_overlap(reference, found)
+    recall = float((overlap.max(axis=1, initial=0.0) >= threshold).mean()) if len(reference) else 1.0
+    precision = float((overlap.max(axis=0, initial=0.0) >= threshold).mean()) if len(found) else 1.0
+    return recall, precision
+
+
+def bench_images(scales, repeat):
+    print("{:<16} {:>6} {:>10} {:>8} {:>7} {:>9}".format("image", "scale", "ms", "speedup", "recall", "precision"))
+    for path, cascade_path, params, size in CASES:
+        gray = cv2.imread(path, 0)
+        cascade = cv2.CascadeClassifier(cascade_path)
+        reference, base_time = timed(lambda: cascade.detectMultiScale(gray, **params), repeat)
+        reference = np.asarray(reference).reshape(-1, 4)
+        name = path.rsplit("/", 1)[-1]
+        print("{:<16} {:>6} {:>10.1f} {:>8.2f} {:>7.2f} {:>9.2f}".format(name, "orig", base_time * 1000, 1, 1, 1))
+
+        for scale in scales:
+            detector = FastCascadeDetector(cascade, scale=scale, object_size=size, **params)
+            found, t = timed(lambda: detector.detect(gray), repeat)
+            recall, precision = match(reference, found)
+            label = "auto" if scale == "auto" else "%.2f" % scale
+            print("{:<16} {:>6} {:>10.1f} {:>8.2f} {:>7.2f} {:>9.2f}".format(
+                name, label, t * 1000, base_time / t, recall, precision))
+
+
+def moving_frames(count, size=(1920, 1080), step=6):
+    image = cv2.imread(sample_path("8_face_detection", "barcelona.jpg"))
+    h, w = image.shape[:2]
+    for i in range(count):
+        frame = np.zeros((size[1], size[0], 3), np.uint8)
+        x = (i * step) % (size[0] - w)
+        frame[: h, x: x + w] = image
+        yield frame
+
+
+def bench_video(frames):
+    cascade = cv2.CascadeClassifier(FACE)
+    tracker = FastCascadeDetector(cascade, scale="auto", object_size=85, full_search_every=10, minNeighbors=7)
+    full_time = track_time = 0.0
+    recalls = []
+    for frame in moving_frames(frames):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        start = time.perf_counter()
+        reference = np.asarray(cascade.detectMultiScale(gray, minNeighbors=7)).reshape(-1, 4)
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = tracker.track(frame)
+        track_time += time.perf_counter() - start
+        recalls.append(match(reference, found)[0])
+
+    print("\n1080p video, {} frames".format(frames))
+    print("full search per frame: {:8.1f} ms/frame".format(full_time / frames * 1000))
+    print("downscale + ROI track: {:8.1f} ms/frame  ({:.1f}x, mean recall {:.2f})".format(
+        track_time / frames * 1000, full_time / track_time, float(np.mean(recalls))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--frames", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    bench_images([1.0, 0.5, 0.25, "auto"], args.repeat)
+    bench_video(args.frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+'''
+ColorTracker against the per-frame processing of color_detection_and_tracking.py on a synthetic 960x480 video:
+a blue disc moving over a noisy background. The tutorial's imshow calls are left out, everything else is kept.
+'''
+
+import argparse
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from object_detection.color_tracking import BLUE_LOWER, BLUE_UPPER, ColorTracker
+
+
+def synthetic_video(count, size=(960, 480), seed=0):
+    rng = np.random.default_rng(seed)
+    w, h = size
+    background = rng.integers(0, 90, (h, w, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        x = int(w / 2 + (w / 3) * np.cos(i / 10))
+        y = int(h / 2 + (h / 3) * np.sin(i / 10))
+        cv2.circle(frame, (x, y), 40, (200, 120, 30), -1)  # blue in BGR
+        frames.append(frame)
+    return frames
+
+
+def tutorial_loop(frames):
+    """The loop body of the tutorial script, minus the windows."""
+    center_points = deque(maxlen=16)
+    for frame in frames:
+        blurred = cv2.GaussianBlur(frame, (11, 11), 0)
+        hsv = cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, BLUE_LOWER, BLUE_UPPER)
+        mask = cv2.erode(mask, None, iterations=2)
+        mask = cv2.dilate(mask, None, iterations=2)
+        contours, hierarchy = cv2.findContours(mask.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if len(contours) > 0:
+            c = max(contours, key=cv2.contourArea)
+            rect = cv2.minAreaRect(c)
+            ((x, y), (width, height), rotation) = rect
+            info = "x: {}, y: {}, width: {}, height: {}, rotation: {}".format(
+                np.round(x), np.round(y), np.round(width), np.round(height), np.round(rotation))
+            box = np.int64(cv2.boxPoints(rect))
+            M = cv2.moments(c)
+            center = (int(M["m10"] / M["m00"]), int(M["m01"] / M["m00"]))
+            center_points.appendleft(center)
+
+
+def tracker_loop(frames, mask_scale):
+    tracker = ColorTracker(frames[0].shape, mask_scale=mask_scale)
+    for frame in frames:
+        tracker.process(frame)
+    return tracker
+
+
+def fps(fn, frames, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(frames)
+        best = min(best, time.perf_counter() - start)
+    return len(frames) / best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    frames = synthetic_video(args.frames)
+    baseline = fps(tutorial_loop, frames, args.repeat)
+    print("{:<24} {:>8.1f} frames/sec".format("tutorial loop", baseline))
+    for scale in (1.0, 0.5, 0.25):
+        rate = fps(lambda f: tracker_loop(f, scale), frames, args.repeat)
+        print("{:<24} {:>8.1f} frames/sec  {:.2f}x".format("ColorTracker scale %.2f" % scale, rate, rate / baseline))
+
+
+if __name__ == "__main__":
+    main()
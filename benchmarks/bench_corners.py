@@ -0,0 +1,78 @@
+'''
+The flow of 2_corner_detection against CornerDetector, without the plots.
+
+tutorial: cornerHarris + threshold mask, reload sudoku.jpg, goodFeaturesToTrack, one cv2.circle per corner
+detector: one read, both responses computed once, Harris mask and corners from the kept responses, one-pass drawing
+
+Then the batch API on --frames synthetic 1280x720 frames (sudoku tiled), plain and with grid bucketing + subpix.
+'''
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from object_detection.corners import METHODS, CornerDetector, detect_corners, draw_corners
+from object_detection.samples import sample_path
+
+PATH = sample_path("2_corner_detection", "sudoku.jpg")
+
+
+def tutorial():
+    img = np.float32(cv2.imread(PATH, 0))
+    dst = cv2.dilate(cv2.cornerHarris(img, blockSize=2, ksize=3, k=0.04), None)
+    img[dst > 0.2 * dst.max()] = 1
+    img = np.float32(cv2.imread(PATH, 0))
+    corners = np.int64(cv2.goodFeaturesToTrack(img, 120, 0.01, 10))
+    for i in corners:
+        x, y = i.ravel()
+        cv2.circle(img, (int(x), int(y)), 3, (125, 125, 125), cv2.FILLED)
+    return corners
+
+
+def with_detector(detector):
+    img = cv2.imread(PATH, 0)
+    corners = detector.detect(img, methods=METHODS)
+    harris = detector.threshold_mask(0.2)
+    draw_corners(img, corners)
+    return corners, harris
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    detector = CornerDetector(block_size=2)
+    t_tutorial = best_time(tutorial, args.repeat)
+    t_detector = best_time(lambda: with_detector(detector), args.repeat)
+    print("sudoku.jpg   tutorial {:6.2f} ms   detector {:6.2f} ms   {:4.1f}x".format(
+        t_tutorial * 1000, t_detector * 1000, t_tutorial / t_detector))
+
+    tile = cv2.imread(PATH, 0)
+    frame = np.tile(tile, (720 // tile.shape[0] + 1, 1280 // tile.shape[1] + 1))[:720, :1280]
+    frames = [np.roll(frame, i, axis=1) for i in range(args.frames)]
+    print("\n{:<24} {:>8} {:>10} {:>10}".format("1280x720 frames", "workers", "frames/s", "corners"))
+    for label, params in (("plain", {}), ("grid 4x4 + subpix", {"grid": (4, 4), "subpix": True})):
+        for workers in sorted({0, args.workers}):
+            start = time.perf_counter()
+            counts = [len(c) for _, c in detect_corners(frames, workers=workers, **params)]
+            rate = len(frames) / (time.perf_counter() - start)
+            print("{:<24} {:>8} {:>10.1f} {:>10.1f}".format(label, workers or "main", rate, np.mean(counts)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+'''
+The capture loop of create_dataset.py (10_custom_cascade.zip) against dataset.capture with a background ImageWriter,
+then augmentation in the calling thread against the thread pool, and the .vec writer.
+
+The frames are --frames synthetic 640x480 camera frames held in memory, so only the loop itself is timed:
+"loop" is how long the capture loop takes (how long a camera would be kept waiting), "total" includes the
+flush of the pending writes.
+'''
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+
+from benchmarks.bench_color_tracking import synthetic_video
+from object_detection.dataset import (FRAME_SIZE, ImageWriter, augment_positives, capture, read_vec, vec_samples,
+                                      write_vec)
+
+
+def tutorial(frames, directory):
+    """create_dataset.py's loop without the window: resize, imwrite every 5th frame in the loop."""
+    count_save = 0
+    for count, frame in enumerate(frames):
+        frame = cv2.resize(frame, FRAME_SIZE)
+        if count % 5 == 0:
+            cv2.imwrite(directory + "/" + str(count_save) + ".png", frame)
+            count_save += 1
+    return count_save
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--augment", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    frames = synthetic_video(args.frames, size=(640, 480))
+    root = tempfile.mkdtemp()
+    try:
+        os.makedirs(os.path.join(root, "tutorial"))
+        saved, loop = timed(lambda: tutorial(frames, os.path.join(root, "tutorial")))
+        print("{:<22} {:>8} {:>10} {:>10}".format("capture", "images", "loop ms", "total ms"))
+        print("{:<22} {:>8} {:>10.1f} {:>10.1f}".format("tutorial", saved, loop * 1000, loop * 1000))
+
+        start = time.perf_counter()
+        writer = ImageWriter()
+        paths = capture(frames, os.path.join(root, "p"), writer)
+        loop = time.perf_counter() - start
+        writer.close()
+        total = time.perf_counter() - start
+        print("{:<22} {:>8} {:>10.1f} {:>10.1f}".format("capture + ImageWriter", len(paths), loop * 1000, total * 1000))
+
+        print("\n{:<22} {:>8} {:>10}".format("augment", "images", "ms"))
+        for name, workers in (("calling thread", 0), ("thread pool", args.workers)):
+            out, seconds = timed(lambda: augment_positives(paths, os.path.join(root, "aug"), args.augment, workers))
+            print("{:<22} {:>8} {:>10.1f}".format(name, len(out), seconds * 1000))
+
+        entries = [(p, [(0, 0) + FRAME_SIZE]) for p in paths + out]
+        vec = os.path.join(root, "pos_samples.vec")
+        count, seconds = timed(lambda: write_vec(vec, vec_samples(entries, workers=args.workers)))
+        assert len(read_vec(vec)) == count
+        print("{:<22} {:>8} {:>10.1f}".format(".vec samples", count, seconds * 1000))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+'''
+Auto-threshold Canny of 1_edge_detection against EdgeExtractor and the batch API.
+
+1) median: np.median against the 256-bin histogram median, same value
+2) per frame: the tutorial's blur + np.median + Canny (new arrays every time) against EdgeExtractor
+3) batch: extract_edges over --frames copies of london.jpg with 1..--max-workers threads
+4) output size per edge map: 8-bit PNG, 1-bit PNG and bit-packed
+'''
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from object_detection.edges import EdgeExtractor, encode_png, extract_edges, histogram_median, pack_edges
+from object_detection.samples import sample_path
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def tutorial(gray):
+    blurred = cv2.blur(gray, ksize=(5, 5))
+    median = np.median(blurred)
+    low = int(max(0, (1 - 0.33) * median))
+    high = int(min(255, (1 + 0.33) * median))
+    return cv2.Canny(blurred, low, high)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    gray = cv2.imread(sample_path("1_edge_detection", "london.jpg"), 0)
+    print("london.jpg {}x{}".format(gray.shape[1], gray.shape[0]))
+
+    assert histogram_median(gray) == np.median(gray)
+    t_np = best_time(lambda: np.median(gray), args.repeat)
+    t_hist = best_time(lambda: histogram_median(gray), args.repeat)
+    print("median     np.median {:7.2f} ms   histogram {:7.2f} ms   {:5.1f}x".format(
+        t_np * 1000, t_hist * 1000, t_np / t_hist))
+
+    extractor = EdgeExtractor()
+    assert (extractor.extract(gray)[0] == tutorial(gray)).all()
+    t_tutorial = best_time(lambda: tutorial(gray), args.repeat)
+    t_extractor = best_time(lambda: extractor.extract(gray), args.repeat)
+    print("per frame  tutorial  {:7.2f} ms   extractor {:7.2f} ms   {:5.1f}x".format(
+        t_tutorial * 1000, t_extractor * 1000, t_tutorial / t_extractor))
+
+    frames = [gray] * args.frames
+    print("\n{:>8} {:>12}".format("workers", "frames/s"))
+    for workers in [0] + list(range(1, args.max_workers + 1)):
+        start = time.perf_counter()
+        for _ in extract_edges(frames, workers=workers):
+            pass
+        print("{:>8} {:>12.1f}".format(workers or "main", args.frames / (time.perf_counter() - start)))
+
+    edges = extractor.extract(gray)[0]
+    print("\nedge map bytes: raw {}, 8-bit PNG {}, 1-bit PNG {}, bit-packed {}".format(
+        edges.nbytes, len(cv2.imencode(".png", edges)[1]), len(encode_png(edges)), pack_edges(edges).nbytes))
+
+
+if __name__ == "__main__":
+    main()
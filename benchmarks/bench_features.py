@@ -0,0 +1,130 @@
+'''
+ProductIndex (FLANN KD-tree / LSH) against the brute-force path of feature_matching.py.
+
+The catalogue is nestle.jpg plus --templates distractor crops cut from the other bundled images.
+The query is chocolates.jpg. Brute force matches every template against the scene one by one, like the tutorial,
+but with precomputed template descriptors so only the matching itself is compared.
+
+Before that, the recall of ORB: nestle.jpg alone against chocolates.jpg with 1000 keypoints and with ORB_NFEATURES,
+next to SIFT. Every configuration but ORB with 1000 keypoints must find nestle, in the catalogue too.
+'''
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from object_detection.features import ORB_NFEATURES, ProductIndex, compute_features, create_extractor, ratio_test
+from object_detection.samples import sample_path
+
+DISTRACTOR_SOURCES = [
+    ("1_edge_detection", "london.jpg"),
+    ("2_corner_detection", "sudoku.jpg"),
+    ("5_template_matching", "cat.jpg"),
+    ("7_watershed", "coins.jpg"),
+    ("8_face_detection", "barcelona.jpg"),
+    ("9_cat_face_detection_with_cascade", "cat_img1.jpg"),
+    ("11_pedestrian_detection", "img2.jpg"),
+]
+
+
+def catalogue(count, seed=0):
+    rng = np.random.default_rng(seed)
+    nestle = cv2.imread(sample_path("6_feature_matching", "nestle.jpg"), 0)
+    sources = [cv2.imread(sample_path(*parts), 0) for parts in DISTRACTOR_SOURCES]
+    h, w = nestle.shape
+    templates = [("nestle", nestle)]
+    for i in range(count):
+        src = sources[i % len(sources)]
+        ch, cw = min(h, src.shape[0]), min(w, src.shape[1])
+        y = rng.integers(0, src.shape[0] - ch + 1)
+        x = rng.integers(0, src.shape[1] - cw + 1)
+        templates.append(("distractor_%d" % i, np.ascontiguousarray(src[y: y + ch, x: x + cw])))
+    return templates
+
+
+def brute_force(kind, templates, scene):
+    extractor = create_extractor(kind)
+    features = [(name, compute_features(extractor, image)) for name, image in templates]
+    norm = cv2.NORM_L2 if kind == "sift" else cv2.NORM_HAMMING
+    matcher = cv2.BFMatcher(norm)
+
+    start = time.perf_counter()
+    scene_points, scene_des = compute_features(extractor, scene)
+    best = None
+    for name, (points, des) in features:
+        if des is None or len(des) < 2:
+            continue
+        good = ratio_test(matcher.knnMatch(des, scene_des, k=2))
+        if len(good) < 10:
+            continue
+        src = points[[m.queryIdx for m in good], :2].reshape(-1, 1, 2)
+        dst = scene_points[[m.trainIdx for m in good], :2].reshape(-1, 1, 2)
+        _, mask = cv2.findHomography(src, dst, cv2.RANSAC, 5.0)
+        inliers = int(mask.sum()) if mask is not None else 0
+        if inliers >= 8 and (best is None or inliers > best[1]):
+            best = (name, inliers)
+    return best, time.perf_counter() - start
+
+
+def indexed(kind, templates, scene, db_dir):
+    index = ProductIndex(os.path.join(db_dir, kind), kind=kind)
+    start = time.perf_counter()
+    for name, image in templates:
+        try:
+            index.add_template(name, image)
+        except ValueError:
+            pass  # flat crops without keypoints
+    index.merge()
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = index.query(scene)
+    elapsed = time.perf_counter() - start
+    best = (results[0]["name"], results[0]["inliers"]) if results else None
+    return best, elapsed, build
+
+
+def recall(kind, nfeatures, nestle, scene):
+    """Matches and RANSAC inliers of nestle in the scene with the query thresholds switched off, plus the query."""
+    index = ProductIndex(kind=kind, nfeatures=nfeatures)
+    index.add_template("nestle", nestle)
+    index.merge()
+    raw = index.query(scene, min_matches=0, min_inliers=0)
+    return (raw[0]["matches"], raw[0]["inliers"]) if raw else (0, 0), bool(index.query(scene))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--templates", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    templates = catalogue(args.templates)
+    scene = cv2.imread(sample_path("6_feature_matching", "chocolates.jpg"), 0)
+    db_dir = tempfile.mkdtemp(prefix="product_index_")
+    try:
+        print("nestle.jpg against chocolates.jpg")
+        for kind, nfeatures in (("orb", 1000), ("orb", ORB_NFEATURES), ("sift", None)):
+            (matches, inliers), found = recall(kind, nfeatures, templates[0][1], scene)
+            print("{:>4} {:>5} keypoints: {:4} matches, {:3} inliers, {}".format(
+                kind, nfeatures or "all", matches, inliers, "found" if found else "not found"))
+            assert found or nfeatures == 1000
+
+        print("\n{} templates, query chocolates.jpg".format(len(templates)))
+        for kind in ("orb", "sift"):
+            bf_best, bf_time = brute_force(kind, templates, scene)
+            ix_best, ix_time, build = indexed(kind, templates, scene, db_dir)
+            assert bf_best[0] == ix_best[0] == "nestle", (kind, bf_best, ix_best)
+            print("{:>4} brute force: {:8.1f} ms  best {}".format(kind, bf_time * 1000, bf_best))
+            print("{:>4} index:       {:8.1f} ms  best {}  (build {:.1f} s, {:.1f}x)".format(
+                kind, ix_time * 1000, ix_best, build, bf_time / ix_time))
+    finally:
+        shutil.rmtree(db_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+'''
+FFT backend against cv2.matchTemplate on cat.jpg/cat_face.jpg at several upscales.
+
+Checks that the three normalized methods agree within tolerance, then times --frames frames per size with
+cv2.matchTemplate and with one FFTMatcher (template transform cached across the frames).
+'''
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from object_detection.fft_matching import FFTMatcher, METHODS, use_fft
+from object_detection.samples import sample_path
+
+METHOD_NAMES = {cv2.TM_CCORR_NORMED: "TM_CCORR_NORMED", cv2.TM_CCOEFF_NORMED: "TM_CCOEFF_NORMED",
+                cv2.TM_SQDIFF_NORMED: "TM_SQDIFF_NORMED"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=8)
+    parser.add_argument("--upscale", type=float, nargs="+", default=[1.0, 2.0, 3.0, 4.0])
+    args = parser.parse_args(argv)
+
+    cat = cv2.imread(sample_path("5_template_matching", "cat.jpg"), 0)
+    face = cv2.imread(sample_path("5_template_matching", "cat_face.jpg"), 0)
+
+    for method in METHODS:
+        diff = np.abs(FFTMatcher(face, method).match(cat) - cv2.matchTemplate(cat, face, method)).max()
+        print("{:<17} max abs difference {:.2e}".format(METHOD_NAMES[method], diff))
+
+    print("\n{:>12} {:>12} {:>10} {:>8} {:>6}".format("image", "spatial ms", "fft ms", "speedup", "auto"))
+    rng = np.random.default_rng(0)
+    for factor in args.upscale:
+        image = cv2.resize(cat, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+        template = cv2.resize(face, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+        # a little noise per frame so every frame is different
+        frames = [cv2.add(image, rng.integers(0, 8, image.shape, dtype=np.uint8)) for _ in range(args.frames)]
+
+        start = time.perf_counter()
+        for frame in frames:
+            cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED)
+        spatial = (time.perf_counter() - start) / len(frames)
+
+        matcher = FFTMatcher(template)
+        start = time.perf_counter()
+        matcher.match_each(frames)
+        fft = (time.perf_counter() - start) / len(frames)
+
+        print("{:>12} {:>12.1f} {:>10.1f} {:>8.2f} {:>6}".format(
+            "%dx%d" % (image.shape[1], image.shape[0]), spatial * 1000, fft * 1000, spatial / fft,
+            "fft" if use_fft(image.shape, template.shape) else "spatial"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+'''
+Multi-source ingestion with local video files standing in for cameras and streams.
+
+1) throughput: --sources files read back to back by the tutorial loop (one blocking while True loop per source,
+   one after the other) against Ingest reading all of them at once; the same frames go through the face cascade
+2) rate limit: the same sources paced to --fps each, with loop=True, for --seconds; delivered fps per source
+3) recovery: flaky live captures that refuse the first two opens, lose every 7th frame and go dark for 5 reads
+   every 100; frames delivered, failed reads, failed opens and reconnects
+
+The videos are einstein.jpg panned across a 320x240 frame, so the cascade has a face to find in every frame.
+'''
+
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from object_detection.ingest import Ingest, Source
+from object_detection.pipeline import face_detector
+from object_detection.samples import sample_path
+
+
+def write_video(path, frames, seed):
+    rng = np.random.default_rng(seed)
+    face = cv2.resize(cv2.imread(sample_path("8_face_detection", "einstein.jpg")), (160, 200))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30.0, (320, 240))
+    for i in range(frames):
+        frame = np.full((240, 320, 3), 40, np.uint8)
+        x, y = (i * 3 + int(rng.integers(0, 40))) % 160, int(rng.integers(0, 40))
+        frame[y:y + 200, x:x + 160] = face
+        writer.write(frame)
+    writer.release()
+
+
+def tutorial_loop(paths, detector):
+    """Every source in its own blocking loop, one after the other."""
+    count = 0
+    for path in paths:
+        cap = cv2.VideoCapture(path)
+        while True:
+            success, frame = cap.read()
+            if not success:
+                break
+            detector(frame)
+            count += 1
+        cap.release()
+    return count
+
+
+class FlakyCapture:
+    """
+    A video file played like a 30 fps camera (grab blocks until the next frame is due), losing every `every`-th
+    frame, and all of them for `outage` reads every 100 reads.
+    """
+
+    def __init__(self, path, every=7, outage=5, fps=30.0):
+        self.cap = cv2.VideoCapture(path)
+        self.every = every
+        self.outage = outage
+        self.interval = 1.0 / fps
+        self.due = time.perf_counter()
+        self.reads = 0
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def grab(self):
+        self.due += self.interval
+        time.sleep(max(0.0, self.due - time.perf_counter()))
+        self.reads += 1
+        if self.reads % self.every == 0 or self.reads % 100 >= 100 - self.outage:
+            return False
+        if not self.cap.grab():
+            # the stream "restarts" at the end of the file
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return self.cap.grab()
+        return True
+
+    def retrieve(self):
+        return self.cap.retrieve()
+
+    def release(self):
+        self.cap.release()
+
+
+def flaky_opener(path, refusals=2):
+    """A target for Source that fails to open `refusals` times before it connects."""
+    attempts = [0]
+
+    def open_capture():
+        attempts[0] += 1
+        if attempts[0] <= refusals:
+            return cv2.VideoCapture()  # not opened
+        return FlakyCapture(path)
+
+    return open_capture
+
+
+def print_report(title, report):
+    print("\n{} - {processed} frames in {seconds:.2f}s, {fps:.1f} FPS".format(title, **report))
+    print("{:<8} {:>9} {:>7} {:>8} {:>8} {:>8} {:>10} {:>8} {:>8}".format(
+        "source", "processed", "fps", "dropped", "failed", "refused", "reconnects", "restarts", "p95 ms"))
+    for name, r in report["sources"].items():
+        print("{:<8} {:>9} {:>7.1f} {:>8} {:>8} {:>8} {:>10} {:>8} {:>8.1f}".format(
+            name, r["processed"], r["processed"] / report["seconds"], r["dropped"], r["failed_reads"],
+            r["failed_opens"], r["reconnects"], r["restarts"], r["stages"]["end_to_end"].get("p95_ms", 0.0)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sources", type=int, default=16)
+    parser.add_argument("--frames", type=int, default=60, help="frames per video file")
+    parser.add_argument("--fps", type=float, default=1.0)
+    parser.add_argument("--seconds", type=float, default=4.0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    detector = face_detector(minNeighbors=5)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, "{}.avi".format(i)) for i in range(args.sources)]
+        for i, path in enumerate(paths):
+            write_video(path, args.frames, i)
+
+        start = time.perf_counter()
+        count = tutorial_loop(paths, detector)
+        seconds = time.perf_counter() - start
+        report = Ingest([Source(str(i), p) for i, p in enumerate(paths)], detector, workers=args.workers).run()
+        assert report["processed"] == count
+        print("{:<28} {:>8} {:>8} {:>8}".format("{} sources".format(args.sources), "frames", "s", "fps"))
+        print("{:<28} {:>8} {:>8.2f} {:>8.1f}".format("tutorial loop, one by one", count, seconds, count / seconds))
+        print("{:<28} {:>8} {:>8.2f} {:>8.1f}".format("Ingest", report["processed"], report["seconds"],
+                                                      report["fps"]))
+
+        sources = [Source(str(i), p, max_fps=args.fps, loop=True) for i, p in enumerate(paths)]
+        print_report("{} sources at {} fps".format(args.sources, args.fps),
+                     Ingest(sources, detector, workers=args.workers).run(args.seconds))
+
+        sources = [Source(str(i), flaky_opener(p), args.fps * 4, reconnect_delay=0.05, live=True)
+                   for i, p in enumerate(paths[:4])]
+        print_report("4 flaky live sources", Ingest(sources, detector, workers=args.workers).run(args.seconds))
+
+
+if __name__ == "__main__":
+    main()
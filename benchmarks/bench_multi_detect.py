@@ -0,0 +1,68 @@
+'''
+One detectMultiScale call per model against MultiDetector's shared pyramid, adding one model at a time:
+face, cat, the custom cascade of 10_custom_cascade.zip and the HOG people detector, on barcelona.jpg.
+
+Both sides use the same scale factor, so they search the same scales; "step 2" is MultiDetector with
+coarse_step=2 on the cascades. The detection counts (separate / shared / step 2) are printed next to the times.
+'''
+
+import argparse
+import time
+
+import cv2
+
+from object_detection.multi_detect import HOG_NAMES, CascadeModel, MultiDetector
+from object_detection.registry import get_cascade
+from object_detection.samples import sample_path
+
+MODELS = ["face", "cat", "custom", "pedestrians"]
+
+
+def separate(gray, models, scale_factor):
+    """The tutorial way: every model builds its own pyramid."""
+    counts = {}
+    for name in models:
+        if name in HOG_NAMES:
+            hog = cv2.HOGDescriptor()
+            hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+            rects, _ = hog.detectMultiScale(gray, padding=(8, 8), scale=scale_factor)
+        else:
+            rects = get_cascade(name).detectMultiScale(gray, scaleFactor=scale_factor, minNeighbors=3)
+        counts[name] = len(rects)
+    return counts
+
+
+def best_time(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--image", default=sample_path("8_face_detection", "barcelona.jpg"))
+    parser.add_argument("--scale-factor", type=float, default=1.1)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    gray = cv2.cvtColor(cv2.imread(args.image), cv2.COLOR_BGR2GRAY)
+    print("{:<28} {:>12} {:>10} {:>10}   {}".format("models", "separate ms", "shared ms", "step 2 ms", "detections"))
+    for n in range(1, len(MODELS) + 1):
+        models = MODELS[:n]
+        t_separate, counts = best_time(lambda: separate(gray, models, args.scale_factor), args.repeat)
+        times, found = [], [list(counts.values())]
+        for specs in (models, [m if m in HOG_NAMES else CascadeModel(m, coarse_step=2) for m in models]):
+            with MultiDetector(specs, args.scale_factor, args.workers) as detector:
+                seconds, result = best_time(lambda: detector.detect(gray), args.repeat)
+            times.append(seconds)
+            found.append([len(boxes) for boxes, _ in result.values()])
+        print("{:<28} {:>12.1f} {:>10.1f} {:>10.1f}   {}".format("+".join(models), t_separate * 1000, times[0] * 1000,
+                                                               times[1] * 1000, " / ".join(map(str, found))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+'''
+NMS cost and what it removes.
+
+1) --boxes synthetic detections clustered around objects, like the raw hits of a detector: a pure Python pairwise
+   NMS against nms() (same kept boxes), and soft_nms()
+2) --images images of such detections: postprocess() per image against one postprocess_batch() call
+3) the HOG people detector on the bundled images with a fine winStride: boxes before and after postprocess()
+'''
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from object_detection.nms import nms, postprocess, postprocess_batch, soft_nms
+from object_detection.pedestrians import DEFAULT_NMS, create_hog
+from object_detection.samples import list_images, sample_path
+
+
+def clustered_boxes(count, rng, objects=20, size=(640, 480)):
+    """(boxes, scores): jittered copies of `objects` boxes, the copies near the object score higher."""
+    w, h = size
+    centers = rng.uniform((0, 0, 30, 60), (w - 60, h - 120, 60, 120), (objects, 4))
+    which = rng.integers(0, objects, count)
+    jitter = rng.normal(0, 0.08, (count, 4))
+    boxes = centers[which] * (1 + jitter)
+    scores = np.exp(-np.abs(jitter).sum(axis=1) * 5) + rng.uniform(0, 0.1, count)
+    return boxes, scores
+
+
+def python_nms(boxes, scores, iou_threshold):
+    """Pairwise loop over the boxes, best first."""
+    order = sorted(range(len(boxes)), key=lambda i: -scores[i])
+    keep = []
+    for i in order:
+        x, y, w, h = boxes[i]
+        duplicate = False
+        for j in keep:
+            x2, y2, w2, h2 = boxes[j]
+            iw = max(0.0, min(x + w, x2 + w2) - max(x, x2))
+            ih = max(0.0, min(y + h, y2 + h2) - max(y, y2))
+            inter = iw * ih
+            if inter / (w * h + w2 * h2 - inter) > iou_threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            keep.append(i)
+    return keep
+
+
+def timed(fn, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--boxes", type=int, default=5000)
+    parser.add_argument("--images", type=int, default=500)
+    parser.add_argument("--iou", type=float, default=0.3)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+
+    boxes, scores = clustered_boxes(args.boxes, rng)
+    reference, t_python = timed(lambda: python_nms(boxes.tolist(), scores.tolist(), args.iou))
+    kept, t_numpy = timed(lambda: nms(boxes, scores, args.iou))
+    assert kept.tolist() == reference
+    (soft, _), t_soft = timed(lambda: soft_nms(boxes, scores, score_threshold=0.3))
+    print("{:<24} {:>8} {:>8} {:>10}".format("{} boxes".format(args.boxes), "kept", "ms", "speedup"))
+    print("{:<24} {:>8} {:>8.1f} {:>10}".format("python loop", len(reference), t_python * 1000, "1.0x"))
+    print("{:<24} {:>8} {:>8.1f} {:>9.1f}x".format("nms", len(kept), t_numpy * 1000, t_python / t_numpy))
+    print("{:<24} {:>8} {:>8.1f}".format("soft_nms (>= 0.3)", len(soft), t_soft * 1000))
+
+    outputs = [clustered_boxes(int(rng.integers(20, 80)), rng, objects=5) for _ in range(args.images)]
+    total = sum(len(b) for b, _ in outputs)
+    each, t_each = timed(lambda: [postprocess(b, s, iou_threshold=args.iou, top_k=3) for b, s in outputs])
+    batch, t_batch = timed(lambda: postprocess_batch(outputs, iou_threshold=args.iou, top_k=3))
+    assert all(np.array_equal(a[0], b[0]) for a, b in zip(each, batch))
+    print("\n{:<24} {:>8} {:>8} {:>10}".format("{} images, {} boxes".format(args.images, total), "kept", "ms",
+                                               "speedup"))
+    print("{:<24} {:>8} {:>8.1f} {:>10}".format("postprocess per image", sum(len(b) for b, _, _ in each),
+                                                t_each * 1000, "1.0x"))
+    print("{:<24} {:>8} {:>8.1f} {:>9.1f}x".format("postprocess_batch", sum(len(b) for b, _, _ in batch),
+                                                   t_batch * 1000, t_each / t_batch))
+
+    hog = create_hog()
+    print("\n{:<24} {:>8} {:>8}".format("HOG winStride=(4, 4)", "boxes", "after"))
+    for path in list_images(sample_path("11_pedestrian_detection")):
+        rects, weights = hog.detectMultiScale(cv2.imread(path), winStride=(4, 4), padding=(8, 8), scale=1.05)
+        after = postprocess(rects, weights, **DEFAULT_NMS)[0]
+        print("{:<24} {:>8} {:>8}".format(path.split("/")[-1], len(rects), len(after)))
+
+
+if __name__ == "__main__":
+    main()
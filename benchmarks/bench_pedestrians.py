@@ -0,0 +1,42 @@
+'''
+Throughput of the batch HOG pedestrian detector against the number of worker processes.
+The bundled img1-3.jpg are repeated until there are --images paths to process. The baseline is the tutorial's
+single detector in this process, with OpenCV's default thread count; the workers run with one OpenCV thread each.
+'''
+
+import argparse
+import os
+import time
+
+from object_detection.pedestrians import detect_images
+from object_detection.samples import list_images, sample_path
+
+
+def throughput(paths, workers):
+    start = time.perf_counter()
+    count = sum(1 for _ in detect_images(paths, workers=workers))
+    return count / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", default=sample_path("11_pedestrian_detection"))
+    parser.add_argument("--images", type=int, default=60)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    images = list_images(args.source)
+    paths = [images[i % len(images)] for i in range(args.images)]
+
+    # workers=0 is the old behaviour: one detector on the main thread, with OpenCV's own threads left as they are
+    baseline = throughput(paths, workers=0)
+    print("{:>8} {:>12} {:>8}".format("workers", "images/sec", "speedup"))
+    print("{:>8} {:>12.2f} {:>8.2f}".format("main", baseline, 1.0))
+
+    for workers in range(1, args.max_workers + 1):
+        rate = throughput(paths, workers)
+        print("{:>8} {:>12.2f} {:>8.2f}".format(workers, rate, rate / baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+'''
+Cost of the profiling hooks and the per-stage breakdown they give.
+
+The instrumented ColorTracker, watershed and FastCascadeDetector run with profiling off and on; the difference is
+the overhead of the hooks. Then the stages are listed by total time, and --prometheus writes the metrics file.
+'''
+
+import argparse
+import time
+
+import cv2
+
+from benchmarks.bench_cascade import moving_frames
+from benchmarks.bench_color_tracking import synthetic_video
+from object_detection.cascade import FastCascadeDetector
+from object_detection.color_tracking import ColorTracker
+from object_detection.profiling import default_profiler as profiler
+from object_detection.samples import sample_path
+from object_detection.segmentation import segment
+
+
+def workloads(frames):
+    video = synthetic_video(frames)
+    tracker = ColorTracker(video[0].shape)
+    coins = cv2.imread(sample_path("7_watershed", "coins.jpg"))
+    faces = list(moving_frames(frames // 5))
+    detector = FastCascadeDetector("face", scale="auto", object_size=85, minNeighbors=7)
+
+    def track_faces():
+        detector.reset()
+        for frame in faces:
+            detector.track(frame)
+
+    return [
+        ("color_tracker", lambda: [tracker.process(f) for f in video]),
+        ("watershed", lambda: segment(coins, labels=False)),
+        ("cascade", track_faces),
+    ]
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--prometheus", help="write the metrics to this file")
+    args = parser.parse_args(argv)
+
+    print("{:<14} {:>10} {:>10} {:>9}".format("workload", "off ms", "on ms", "overhead"))
+    for name, fn in workloads(args.frames):
+        fn()  # warm-up
+        profiler.disable()
+        off = best_time(fn, args.repeat)
+        profiler.enable()
+        on = best_time(fn, args.repeat)
+        print("{:<14} {:>10.2f} {:>10.2f} {:>8.1f}%".format(name, off * 1000, on * 1000, (on / off - 1) * 100))
+
+    print("\n{:<14} {:<20} {:>8} {:>10} {:>10}".format("component", "stage", "calls", "total ms", "mean ms"))
+    for component, stages in profiler.summary().items():
+        for stage, s in stages.items():
+            print("{:<14} {:<20} {:>8} {:>10.1f} {:>10.3f}".format(component, stage, s["count"], s["total_s"] * 1000,
+                                                                   s["mean_ms"]))
+    if args.prometheus:
+        profiler.write_prometheus(args.prometheus)
+
+
+if __name__ == "__main__":
+    main()
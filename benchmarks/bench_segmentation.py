@@ -0,0 +1,35 @@
+'''
+Throughput of segment_batch (stats only) against the number of worker processes, on coins.jpg repeated --images times.
+'''
+
+import argparse
+import os
+import time
+
+from object_detection.samples import sample_path
+from object_detection.segmentation import segment_batch
+
+
+def images_per_minute(paths, workers):
+    start = time.perf_counter()
+    count = sum(1 for _ in segment_batch(paths, workers=workers))
+    return count / (time.perf_counter() - start) * 60
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=60)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    paths = [sample_path("7_watershed", "coins.jpg")] * args.images
+    baseline = images_per_minute(paths, workers=0)
+    print("{:>8} {:>14} {:>8}".format("workers", "images/minute", "speedup"))
+    print("{:>8} {:>14.0f} {:>8.2f}".format("main", baseline, 1.0))
+    for workers in range(1, args.max_workers + 1):
+        rate = images_per_minute(paths, workers)
+        print("{:>8} {:>14.0f} {:>8.2f}".format(workers, rate, rate / baseline))
+
+
+if __name__ == "__main__":
+    main()
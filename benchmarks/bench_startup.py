@@ -0,0 +1,113 @@
+'''
+Start-up time of the command line, held to a budget.
+
+Every case runs in a fresh interpreter --repeat times and the median is compared with its budget; the script exits
+with status 1 when a case is over budget or imports a module it must not, so it can gate CI:
+
+- python -c pass                  the interpreter alone, for reference
+- import object_detection.cli     must not import cv2, numpy or matplotlib
+- detect --help                   the same
+- import object_detection.detectors
+- detect edges london.jpg         a whole run: imports, one image, the JSON line
+
+Besides, every module of the package is imported once and matplotlib must not be among the loaded modules, and
+cli.DETECTORS must match Detectors.NAMES.
+
+    python -m benchmarks.bench_startup --budget-help 150 --budget-run 600
+
+tests/test_startup.py runs the import and --help checks with the default budget under pytest.
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from object_detection.samples import ROOT, sample_path
+
+HEAVY = ("cv2", "numpy", "matplotlib")
+
+# default budgets in milliseconds (median of the runs)
+BUDGET_HELP_MS = 150.0
+BUDGET_IMPORT_MS = 400.0
+BUDGET_RUN_MS = 800.0
+
+# prints the heavy modules loaded after the given statement
+PROBE = "import sys; {}; print(' '.join(m for m in {!r} if m in sys.modules))"
+
+
+def python_env():
+    """Environment of the child interpreters: the repository comes first on the import path."""
+    return dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+
+
+def median_ms(args, env, repeat):
+    """Median wall time of `repeat` fresh interpreters running args, in milliseconds."""
+    return statistics.median(run_python(args, env)[0] * 1000 for _ in range(repeat))
+
+
+def run_python(args, env):
+    start = time.perf_counter()
+    done = subprocess.run([sys.executable] + args, cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    if done.returncode != 0:
+        raise RuntimeError("{} failed:\n{}".format(" ".join(args), done.stderr))
+    return time.perf_counter() - start, done.stdout
+
+
+def heavy_imports(statement, env):
+    return run_python(["-c", PROBE.format(statement, HEAVY)], env)[1].split()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--budget-help", type=float, default=BUDGET_HELP_MS,
+                        help="ms for detect --help and importing cli")
+    parser.add_argument("--budget-import", type=float, default=BUDGET_IMPORT_MS, help="ms for importing the detectors")
+    parser.add_argument("--budget-run", type=float, default=BUDGET_RUN_MS, help="ms for detect edges on one image")
+    args = parser.parse_args(argv)
+    env = python_env()
+
+    cases = [
+        ("python -c pass", ["-c", "pass"], None),
+        ("import object_detection.cli", ["-c", "import object_detection.cli"], args.budget_help),
+        ("detect --help", ["-m", "object_detection", "--help"], args.budget_help),
+        ("import detectors", ["-c", "import object_detection.detectors"], args.budget_import),
+        ("detect edges london.jpg", ["-m", "object_detection", "edges", sample_path("1_edge_detection", "london.jpg")],
+         args.budget_run),
+    ]
+    failures = []
+    print("{:<28} {:>9} {:>9} {:>9}".format("", "median ms", "max ms", "budget"))
+    for name, command, budget in cases:
+        times = [run_python(command, env)[0] * 1000 for _ in range(args.repeat)]
+        median = statistics.median(times)
+        print("{:<28} {:>9.1f} {:>9.1f} {:>9}".format(name, median, max(times), "-" if budget is None else budget))
+        if budget is not None and median > budget:
+            failures.append("{}: {:.0f} ms, budget {:.0f} ms".format(name, median, budget))
+
+    loaded = heavy_imports("import object_detection.cli", env)
+    if loaded:
+        failures.append("import object_detection.cli loads {}".format(", ".join(loaded)))
+    modules = sorted(f[:-3] for f in os.listdir(os.path.join(ROOT, "object_detection"))
+                     if f.endswith(".py") and f != "__main__.py")
+    statement = "; ".join("import object_detection.{}".format(m) for m in modules if m != "__init__")
+    if "matplotlib" in heavy_imports(statement, env):
+        failures.append("a module of the package imports matplotlib")
+    names = run_python(["-c", "import json; from object_detection.detectors import Detectors; "
+                              "print(json.dumps(Detectors.NAMES))"], env)[1]
+    from object_detection.cli import DETECTORS
+    if tuple(json.loads(names)) != DETECTORS:
+        failures.append("cli.DETECTORS differs from Detectors.NAMES")
+
+    if failures:
+        print("\nFAILED\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nall within budget; the cli loads none of {}".format(", ".join(HEAVY)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+'''
+Parameter sweep with and without the raw result cache.
+
+1) cascade: the face cascade on the images of 8_face_detection. There are no labeled faces in the repository, so the
+   labels are the detections of a careful run (scaleFactor=1.03, minNeighbors=6) - the sweep then measures how well
+   the cheaper settings reproduce it. One detectMultiScale call per parameter set (the trackbar way) against sweep()
+   cold (empty cache directory) and warm (second sweep reading it back); the rows must be the same
+2) color: synthetic frames with blue squares at known places, HSV ranges and minimum areas
+'''
+
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from object_detection.dataset import read_info
+from object_detection.registry import get_cascade
+from object_detection.samples import list_images, sample_path
+from object_detection.sweep import ResultCache, grid, match_boxes, pareto_front, sweep
+
+
+def pseudo_labels(paths, directory):
+    """An info file of the careful face cascade run on paths."""
+    lines = []
+    for path in paths:
+        gray = cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2GRAY)
+        faces = get_cascade("face").detectMultiScale(gray, scaleFactor=1.03, minNeighbors=6)
+        lines.append("{} {} {}".format(path, len(faces), " ".join(str(v) for box in faces for v in box)))
+    info = os.path.join(directory, "faces.lst")
+    with open(info, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return info
+
+
+def direct(paths, labels, params):
+    """One detectMultiScale call per image and parameter set; (tp, fp, fn) per parameter set."""
+    counts = []
+    grays = [cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2GRAY) for path in paths]
+    for p in params:
+        total = np.zeros(3, np.int64)
+        for gray, truth in zip(grays, labels):
+            faces = get_cascade("face").detectMultiScale(gray, scaleFactor=p["scaleFactor"],
+                                                         minNeighbors=p["minNeighbors"],
+                                                         minSize=(p["minSize"] or 0,) * 2)
+            total += match_boxes(np.asarray(faces).reshape(-1, 4), np.asarray(truth).reshape(-1, 4))
+        counts.append(tuple(total))
+    return counts
+
+
+def color_frames(directory, count, rng):
+    """An info file of count frames with 1-3 blue squares on a noisy background."""
+    lines = []
+    for i in range(count):
+        frame = rng.integers(0, 120, (240, 320, 3), dtype=np.uint8)
+        boxes = []
+        for _ in range(rng.integers(1, 4)):
+            size = int(rng.integers(20, 60))
+            x, y = int(rng.integers(0, 320 - size)), int(rng.integers(0, 240 - size))
+            frame[y:y + size, x:x + size] = (200, 80, 20)
+            boxes.append((x, y, size, size))
+        name = "{}.png".format(i)
+        cv2.imwrite(os.path.join(directory, name), frame)
+        lines.append("{} {} {}".format(name, len(boxes), " ".join(str(v) for box in boxes for v in box)))
+    info = os.path.join(directory, "colors.lst")
+    with open(info, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return info
+
+
+def print_front(rows):
+    for row in pareto_front(rows):
+        print("  {:>8.1f} ms  f1 {:.3f}  {}".format(row["ms"], row["f1"], row["params"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=40, help="synthetic color frames")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = list_images(sample_path("8_face_detection"))
+        info = pseudo_labels(paths, directory)
+        params = grid(scaleFactor=[1.1, 1.2, 1.3], minNeighbors=[3, 5, 7], minSize=[None, 40])
+        labels = [boxes for _, boxes in read_info(info)]
+
+        start = time.perf_counter()
+        reference = direct(paths, labels, params)
+        t_direct = time.perf_counter() - start
+        cache_dir = os.path.join(directory, "cache")
+        times, results = [], []
+        for run in ("cold", "warm"):
+            cache = ResultCache(cache_dir)
+            start = time.perf_counter()
+            results.append(sweep("cascade", info, params, args.workers, cache))
+            times.append(time.perf_counter() - start)
+            print("{} cache: {}".format(run, cache.stats()))
+        for rows in results:
+            assert [(r["tp"], r["fp"], r["fn"]) for r in rows] == reference
+
+        print("\n{:<32} {:>8} {:>10}".format("{} face parameter sets".format(len(params)), "s", "speedup"))
+        print("{:<32} {:>8.2f} {:>10}".format("detectMultiScale per set", t_direct, "1.0x"))
+        for run, seconds in zip(("sweep, cold cache", "sweep, warm cache"), times):
+            print("{:<32} {:>8.2f} {:>9.1f}x".format(run, seconds, t_direct / seconds))
+        print("Pareto front (ms per image without cache):")
+        print_front(results[0])
+
+        info = color_frames(directory, args.frames, rng)
+        params = grid(lower=[(84, 98, 0), (100, 150, 50), (110, 200, 100)], upper=[(130, 255, 255), (179, 255, 255)],
+                      min_area=[50, 400, 1600])
+        start = time.perf_counter()
+        rows = sweep("color", info, params, args.workers)
+        print("\n{} color parameter sets on {} frames: {:.2f}s".format(len(params), args.frames,
+                                                                       time.perf_counter() - start))
+        print_front(rows)
+
+
+if __name__ == "__main__":
+    main()
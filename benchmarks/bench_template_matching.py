@@ -0,0 +1,60 @@
+'''
+Coarse-to-fine match_templates against the single-scale full search of template_matching.py on cat.jpg/cat_face.jpg.
+
+Both images are also upscaled by --upscale to see how the two grow with image size.
+'''
+
+import argparse
+import time
+
+import cv2
+
+from object_detection.samples import sample_path
+from object_detection.template_matching import match_templates
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def full_search(image, template):
+    result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    _, score, _, loc = cv2.minMaxLoc(result)
+    return loc, score
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--upscale", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    args = parser.parse_args(argv)
+
+    cat = cv2.imread(sample_path("5_template_matching", "cat.jpg"), 0)
+    face = cv2.imread(sample_path("5_template_matching", "cat_face.jpg"), 0)
+
+    print("{:>12} {:>8} {:>10} {:>10} {:>8}  {}".format("image", "levels", "full ms", "engine ms", "speedup",
+                                                      "same location"))
+    for factor in args.upscale:
+        image = cv2.resize(cat, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+        template = cv2.resize(face, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+        (loc, _), full_time = timed(lambda: full_search(image, template), args.repeat)
+
+        for levels in (1, 2, 3):
+            matches, t = timed(lambda: match_templates(image, template, levels=levels), args.repeat)
+            same = bool(matches) and max(abs(matches[0]["box"][0] - loc[0]), abs(matches[0]["box"][1] - loc[1])) <= 1
+            print("{:>12} {:>8} {:>10.1f} {:>10.1f} {:>8.2f}  {}".format(
+                "%dx%d" % (image.shape[1], image.shape[0]), levels, full_time * 1000, t * 1000, full_time / t, same))
+
+    # the tutorial's multi-scale question, answered in one call
+    scales = (0.8, 0.9, 1.0, 1.1, 1.2)
+    matches, t = timed(lambda: match_templates(cat, [("cat_face", face)], scales=scales), args.repeat)
+    print("\n{} scales in one call: {:.1f} ms, best {}".format(len(scales), t * 1000, matches[0] if matches else None))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+'''
+Peak RSS and wall time of the tiled watershed against the monolithic one.
+
+The test image is coins.jpg repeated --repeat x --repeat times, saved as .npy. Every run happens in a fresh
+subprocess so its peak RSS is its own; for the tiled run the largest worker process is reported too.
+The tiled run's main process peak includes the pages of the memory-mapped input and output label files;
+those are file-backed and the kernel can drop them, unlike the anonymous intermediates of the monolithic run.
+
+Before that, coins.jpg repeated --check-repeat x --check-repeat times is segmented both ways in-process with the same
+foreground distance, and the labels must agree: the same number of objects and a one-to-one mapping of their IDs.
+'''
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from object_detection.samples import sample_path
+from object_detection.segmentation import DEFAULT_PARAMS, estimate_fg_distance, segment_tiled, watershed_labels
+
+
+def _peak_mb(who):
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024.0
+
+
+def label_agreement(a, b):
+    """
+    (objects in a, objects in b, IDs without a one-to-one partner): the IDs of a and b that are not each other's
+    best match. Two labelings agree when the counts are equal and no ID is left over.
+    """
+    both = (a > 1) & (b > 1)
+    keys, counts = np.unique((a[both].astype(np.int64) << 32) | b[both].astype(np.int64), return_counts=True)
+    best_a, best_b = {}, {}
+    for key, n in zip(keys.tolist(), counts.tolist()):
+        x, y = key >> 32, key & 0xFFFFFFFF
+        if n > best_a.get(x, (None, 0))[1]:
+            best_a[x] = (y, n)
+        if n > best_b.get(y, (None, 0))[1]:
+            best_b[y] = (x, n)
+    unmatched = sum(best_b[y][0] != x for x, (y, _) in best_a.items())
+    unmatched += sum(best_a[x][0] != y for y, (x, _) in best_b.items())
+    return len(np.unique(a[a > 1])), len(np.unique(b[b > 1])), unmatched
+
+
+def check_agreement(coins, repeat, tile_size, overlap, workers):
+    """Tiled and monolithic labels of a small sample, with the same foreground distance, must agree."""
+    image = np.tile(coins, (repeat, repeat, 1))
+    params = dict(DEFAULT_PARAMS, fg_distance=estimate_fg_distance(image))
+    tiled, count = segment_tiled(image, tile_size, overlap, workers, params)
+    monolithic, objects, unmatched = label_agreement(watershed_labels(image, params), tiled)
+    print("agreement on {}x{}: monolithic {} objects, tiled {} ({} reported), {} IDs without a one-to-one partner"
+          .format(image.shape[1], image.shape[0], monolithic, objects, count, unmatched))
+    assert count == objects == monolithic and unmatched == 0
+
+
+def run_mode(mode, path, tile_size, overlap, workers):
+    start = time.perf_counter()
+    if mode == "monolithic":
+        labels = watershed_labels(np.load(path))
+        objects = len(np.unique(labels[labels > 1]))
+    else:
+        shape = np.load(path, mmap_mode="r").shape[:2]
+        out_path = path + ".labels"
+        out = np.memmap(out_path, np.int32, mode="w+", shape=shape)
+        _, objects = segment_tiled(path, tile_size=tile_size, overlap=overlap, workers=workers, out=out)
+        del out
+        os.remove(out_path)
+    elapsed = time.perf_counter() - start
+    return {"mode": mode, "seconds": elapsed, "objects": objects, "peak_mb": _peak_mb(resource.RUSAGE_SELF),
+            "worker_peak_mb": _peak_mb(resource.RUSAGE_CHILDREN)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=6)
+    parser.add_argument("--tile-size", type=int, default=1024)
+    parser.add_argument("--overlap", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--check-repeat", type=int, default=3)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.path, args.tile_size, args.overlap, args.workers)))
+        return
+
+    coins = cv2.imread(sample_path("7_watershed", "coins.jpg"))
+    check_agreement(coins, args.check_repeat, args.tile_size, args.overlap, args.workers)
+    image = np.tile(coins, (args.repeat, args.repeat, 1))
+    tmp_dir = tempfile.mkdtemp(prefix="watershed_")
+    try:
+        path = os.path.join(tmp_dir, "coins.npy")
+        np.save(path, image)
+        print("image {}x{} ({:.0f} MB)".format(image.shape[1], image.shape[0], image.nbytes / 2 ** 20))
+        del image
+
+        print("{:<12} {:>8} {:>8} {:>12} {:>16}".format("mode", "seconds", "objects", "peak MB", "worker peak MB"))
+        for mode in ("monolithic", "tiled"):
+            cmd = [sys.executable, "-m", "benchmarks.bench_watershed_tiled", "--mode", mode, "--path", path,
+                   "--tile-size", str(args.tile_size), "--overlap", str(args.overlap),
+                   "--workers", str(args.workers)]
+            result = json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout)
+            print("{mode:<12} {seconds:>8.2f} {objects:>8} {peak_mb:>12.1f} {worker_peak_mb:>16.1f}".format(**result))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
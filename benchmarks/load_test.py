@@ -0,0 +1,121 @@
+'''
+Load test of the detection service: --clients threads send requests back to back for --seconds seconds,
+cycling through the detectors with the bundled image of each tutorial folder. Reports p50/p99 latency per
+detector and requests/sec overall.
+
+By default the requests go through LocalClient (in-process, no sockets); --http starts the HTTP server on a free
+port and uses HTTPClient, so decoding and the HTTP round trip are included.
+
+    python -m benchmarks.load_test --clients 8 --seconds 10 --detectors edges,corners,faces
+'''
+
+import argparse
+import itertools
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from object_detection.samples import sample_path
+from object_detection.service import DetectionService, HTTPClient, LocalClient, make_server
+
+# detector -> bundled image and parameters of the tutorial script
+WORKLOAD = {
+    "edges": (sample_path("1_edge_detection", "london.jpg"), {}),
+    "corners": (sample_path("2_corner_detection", "sudoku.jpg"), {}),
+    "contours": (sample_path("3_contour_detection", "contour.jpg"), {}),
+    "color": (sample_path("5_template_matching", "cat.jpg"), {}),
+    "template": (sample_path("5_template_matching", "cat.jpg"), {}),
+    "features": (sample_path("6_feature_matching", "chocolates.jpg"), {}),
+    "watershed": (sample_path("7_watershed", "coins.jpg"), {}),
+    "faces": (sample_path("8_face_detection", "barcelona.jpg"), {"minNeighbors": 7}),
+    "cats": (sample_path("9_cat_face_detection_with_cascade", "cat_img1.jpg"), {}),
+    "pedestrians": (sample_path("11_pedestrian_detection", "img1.jpg"), {}),
+}
+
+
+def run_clients(make_client, requests, clients, seconds):
+    """Every client thread loops over requests until the time is up. Returns {detector: latencies} and elapsed."""
+    latencies = {name: [] for name, _, _ in requests}
+    errors = []
+    stop = time.perf_counter() + seconds
+
+    def client_loop(offset):
+        client = make_client()
+        # each client starts at a different detector so the batchers see mixed traffic
+        for name, data, params in itertools.islice(itertools.cycle(requests), offset, None):
+            if time.perf_counter() >= stop:
+                return
+            start = time.perf_counter()
+            try:
+                client.detect(name, data, **params)
+            except Exception as e:
+                errors.append("{}: {}".format(name, e))
+                continue
+            latencies[name].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--detectors", default=",".join(WORKLOAD))
+    parser.add_argument("--http", action="store_true", help="go through the HTTP server instead of LocalClient")
+    args = parser.parse_args(argv)
+
+    requests = []
+    for name in args.detectors.split(","):
+        path, params = WORKLOAD[name]
+        # clients send encoded images, as they would over the wire
+        requests.append((name, cv2.imencode(".jpg", cv2.imread(path))[1].tobytes(), params))
+
+    with DetectionService(args.workers, args.max_batch, args.max_wait_ms / 1000.0) as service:
+        server = None
+        if args.http:
+            server = make_server(service, port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = "http://{}:{}".format(*server.server_address)
+            make_client = lambda: HTTPClient(url)
+        else:
+            make_client = lambda: LocalClient(service)
+
+        try:
+            latencies, elapsed, errors = run_clients(make_client, requests, args.clients, args.seconds)
+            stats = service.stats()
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+    print("{} clients, {} workers, max batch {}, {}".format(args.clients, service.workers, args.max_batch,
+                                                          "HTTP" if args.http else "local"))
+    print("{:<12} {:>8} {:>10} {:>10} {:>11}".format("detector", "requests", "p50 ms", "p99 ms", "mean batch"))
+    for name, values in latencies.items():
+        if not values:
+            continue
+        ms = np.array(values) * 1000.0
+        print("{:<12} {:>8} {:>10.1f} {:>10.1f} {:>11.2f}".format(
+            name, len(ms), np.percentile(ms, 50), np.percentile(ms, 99), stats[name]["mean_batch"]))
+
+    everything = np.concatenate([np.array(v) for v in latencies.values() if v]) * 1000.0
+    print("{:<12} {:>8} {:>10.1f} {:>10.1f}".format("all", len(everything), np.percentile(everything, 50),
+                                                    np.percentile(everything, 99)))
+    print("requests/sec: {:.1f}".format(len(everything) / elapsed))
+    if errors:
+        print("{} errors, first: {}".format(len(errors), errors[0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+'''
+Benchmark suite: the core operation of every tutorial folder and object_detection module, on the bundled images
+and on synthetic frames.
+
+For every case it reports the median wall time of --repeat samples (after one warm-up run), the throughput in items
+(images or frames) per second and in megapixels per second, the peak RSS above the RSS before the case, and the
+largest number of OS threads seen during the case. Fast operations are repeated within a sample until it lasts at
+least --min-time seconds, so sub-millisecond cases are not just timer noise.
+
+Memory and threads are sampled from /proc/self/status by a background thread, so short peaks between two samples
+can be missed; without /proc only ru_maxrss and the Python thread count are available. Memory released by an earlier
+case can be reused by a later one without raising the RSS, run a single case with --filter for an isolated figure.
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --filter cats --compare before.json --tolerance 0.15
+
+--compare exits with status 1 when a case got slower than the baseline by more than --tolerance, so the suite can
+gate a release. Compare results from the same machine only.
+'''
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_cascade import moving_frames
+from benchmarks.bench_color_tracking import synthetic_video
+from object_detection.cascade import FastCascadeDetector
+from object_detection.color_tracking import ColorTracker
+from object_detection.detectors import DEFAULT_COLORS, detect_edges
+from object_detection.features import ProductIndex, compute_features, create_extractor, ratio_test
+from object_detection.multi_color_tracking import MultiColorTracker
+from object_detection.pedestrians import create_hog
+from object_detection.samples import ROOT, sample_path
+from object_detection.segmentation import segment, watershed_labels
+from object_detection.template_matching import match_templates
+
+FACE = sample_path("8_face_detection", "haarcascade_frontalface_default.xml")
+CAT = sample_path("9_cat_face_detection_with_cascade", "haarcascade_frontalcatface.xml")
+
+
+def _read(folder, name, flags=cv2.IMREAD_COLOR):
+    return cv2.imread(sample_path(folder, name), flags)
+
+
+# Every case is (name, setup). setup() loads its inputs and returns (fn, images): fn() runs the operation once
+# and processes `images`, a list of the images or frames it works on (for throughput).
+
+def _canny():
+    image = _read("1_edge_detection", "london.jpg")
+    return lambda: detect_edges(image), [image]
+
+
+def _harris():
+    gray = np.float32(_read("2_corner_detection", "sudoku.jpg", 0))
+    return lambda: cv2.cornerHarris(gray, blockSize=2, ksize=3, k=0.04), [gray]
+
+
+def _shi_tomasi():
+    gray = _read("2_corner_detection", "sudoku.jpg", 0)
+    return lambda: cv2.goodFeaturesToTrack(gray, 120, 0.01, 10), [gray]
+
+
+def _contours():
+    gray = _read("3_contour_detection", "contour.jpg", 0)
+    return lambda: cv2.findContours(gray, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_NONE), [gray]
+
+
+def _color_tracker():
+    frames = synthetic_video(30)
+    tracker = ColorTracker(frames[0].shape)
+    return lambda: [tracker.process(f) for f in frames], frames
+
+
+def _multi_color_tracker():
+    frames = synthetic_video(30)
+    tracker = MultiColorTracker(frames[0].shape, DEFAULT_COLORS)
+    return lambda: [tracker.process(f) for f in frames], frames
+
+
+def _match_template(method):
+    def setup():
+        image = _read("5_template_matching", "cat.jpg", 0)
+        template = _read("5_template_matching", "cat_face.jpg", 0)
+        return lambda: cv2.matchTemplate(image, template, getattr(cv2, method)), [image]
+    return setup
+
+
+def _template_pyramid():
+    image = _read("5_template_matching", "cat.jpg", 0)
+    templates = [("cat_face", _read("5_template_matching", "cat_face.jpg", 0))]
+    return lambda: match_templates(image, templates), [image]
+
+
+def _extract(kind):
+    def setup():
+        scene = _read("6_feature_matching", "chocolates.jpg", 0)
+        extractor = create_extractor(kind, 1000)
+        return lambda: extractor.detectAndCompute(scene, None), [scene]
+    return setup
+
+
+def _brute_force_match(kind):
+    def setup():
+        scene = _read("6_feature_matching", "chocolates.jpg", 0)
+        template = _read("6_feature_matching", "nestle.jpg", 0)
+        extractor = create_extractor(kind, 1000)
+        _, template_descriptors = compute_features(extractor, template)
+        norm = cv2.NORM_L2 if kind == "sift" else cv2.NORM_HAMMING
+
+        def run():
+            # the tutorial's flow: describe the scene, knn against the template, ratio test
+            _, descriptors = compute_features(extractor, scene)
+            return ratio_test(cv2.BFMatcher(norm).knnMatch(template_descriptors, descriptors, k=2), 0.75)
+        return run, [scene]
+    return setup
+
+
+def _product_index(kind):
+    def setup():
+        scene = _read("6_feature_matching", "chocolates.jpg", 0)
+        index = ProductIndex(kind=kind)
+        index.add_template("nestle", _read("6_feature_matching", "nestle.jpg", 0))
+        index.merge()
+        return lambda: index.query(scene), [scene]
+    return setup
+
+
+def _watershed():
+    image = _read("7_watershed", "coins.jpg")
+    return lambda: watershed_labels(image), [image]
+
+
+def _segment_stats():
+    image = _read("7_watershed", "coins.jpg")
+    return lambda: segment(image, contours=False, labels=False), [image]
+
+
+def _cascade(xml, folder, names, **params):
+    def setup():
+        cascade = cv2.CascadeClassifier(xml)
+        grays = [_read(folder, name, 0) for name in names]
+        return lambda: [cascade.detectMultiScale(g, **params) for g in grays], grays
+    return setup
+
+
+def _fast_cascade():
+    detector = FastCascadeDetector(FACE, scale=0.5, minNeighbors=7)
+    image = _read("8_face_detection", "barcelona.jpg")
+    return lambda: detector.detect(image), [image]
+
+
+def _face_tracking():
+    frames = list(moving_frames(30))
+    detector = FastCascadeDetector(FACE, scale="auto", object_size=85, minNeighbors=7)
+
+    def run():
+        detector.reset()
+        return [detector.track(f) for f in frames]
+    return run, frames
+
+
+def _hog(name, scale):
+    def setup():
+        hog = create_hog()
+        image = _read("11_pedestrian_detection", name)
+        return lambda: hog.detectMultiScale(image, padding=(8, 8), scale=scale), [image]
+    return setup
+
+
+CAT_IMAGES = ("cat_img1.jpg", "cat_img2.jpg", "cat_img3.jpg")
+
+CASES = [
+    ("edges/canny_london", _canny),
+    ("corners/harris_sudoku", _harris),
+    ("corners/shi_tomasi_sudoku", _shi_tomasi),
+    ("contours/find_contours", _contours),
+    ("color/tracker_synthetic", _color_tracker),
+    ("color/multi_tracker_synthetic", _multi_color_tracker),
+    ("template/ccoeff_normed_cat", _match_template("TM_CCOEFF_NORMED")),
+    ("template/sqdiff_cat", _match_template("TM_SQDIFF")),
+    ("template/pyramid_cat", _template_pyramid),
+    ("features/sift_extract_chocolates", _extract("sift")),
+    ("features/orb_extract_chocolates", _extract("orb")),
+    ("features/sift_bf_match", _brute_force_match("sift")),
+    ("features/orb_bf_match", _brute_force_match("orb")),
+    ("features/sift_index_query", _product_index("sift")),
+    ("features/orb_index_query", _product_index("orb")),
+    ("watershed/labels_coins", _watershed),
+    ("watershed/segment_stats_coins", _segment_stats),
+    ("faces/einstein", _cascade(FACE, "8_face_detection", ["einstein.jpg"])),
+    ("faces/barcelona", _cascade(FACE, "8_face_detection", ["barcelona.jpg"], minNeighbors=7)),
+    ("faces/barcelona_fast_0.5", _fast_cascade),
+    ("faces/tracking_synthetic_1080p", _face_tracking),
+    ("cats/scale_factor_1.045", _cascade(CAT, "9_cat_face_detection_with_cascade", CAT_IMAGES,
+                                         scaleFactor=1.045, minNeighbors=2)),
+    ("cats/scale_factor_1.1", _cascade(CAT, "9_cat_face_detection_with_cascade", CAT_IMAGES,
+                                       scaleFactor=1.1, minNeighbors=2)),
+] + [
+    ("pedestrians/hog_{}_scale_1.05".format(name[:-4]), _hog(name, 1.05))
+    for name in ("img1.jpg", "img2.jpg", "img3.jpg")
+]
+
+
+def _proc_status():
+    """(RSS in MB, OS threads) of this process, or None without /proc."""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]) / 1024.0, int(fields["Threads"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class ResourceSampler:
+    """Samples RSS and the thread count every `interval` seconds while active."""
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.peak_mb = 0.0
+        self.threads = 0
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _sample(self, sampler_running=True):
+        status = _proc_status()
+        if status is None:
+            # ru_maxrss is in kilobytes on Linux, bytes on macOS; this fallback is only a rough figure
+            status = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, threading.active_count()
+        # the sampler thread itself is not part of the workload
+        self.peak_mb = max(self.peak_mb, status[0])
+        self.threads = max(self.threads, status[1] - sampler_running)
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self._sample(sampler_running=False)
+
+
+def run_case(setup, repeat, min_time=0.05):
+    before = _proc_status()
+    fn, images = setup()
+    start = time.perf_counter()
+    fn()  # warm-up: lazy initialisation, caches, OpenCV thread pool
+    loops = max(1, int(min_time / max(time.perf_counter() - start, 1e-9)))
+    times = []
+    with ResourceSampler() as sampler:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            times.append((time.perf_counter() - start) / loops)
+    median = float(np.median(times))
+    megapixels = sum(image.shape[0] * image.shape[1] for image in images) / 1e6
+    return {
+        "median_ms": median * 1000,
+        "min_ms": min(times) * 1000,
+        "items": len(images),
+        "loops": loops,
+        "items_per_s": len(images) / median,
+        "megapixels_per_s": megapixels / median,
+        "peak_rss_mb": sampler.peak_mb,
+        "peak_rss_delta_mb": sampler.peak_mb - (before[0] if before else 0.0),
+        "threads": sampler.threads,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "opencv_threads": cv2.getNumThreads(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Cases slower than the baseline by more than tolerance: list of (name, baseline ms, ms)."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference and result["median_ms"] > reference["median_ms"] * (1 + tolerance):
+            regressions.append((name, reference["median_ms"], result["median_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="shortest sample in seconds")
+    parser.add_argument("--filter", default="", help="only the cases whose name contains this text")
+    parser.add_argument("--threads", type=int, default=None, help="cv2.setNumThreads before running")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against --compare")
+    args = parser.parse_args(argv)
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    results = {}
+    print("{:<36} {:>10} {:>10} {:>9} {:>9} {:>8}".format("case", "median ms", "items/s", "MP/s", "peak MB",
+                                                          "threads"))
+    for name, setup in CASES:
+        if args.filter not in name:
+            continue
+        r = results[name] = run_case(setup, args.repeat, args.min_time)
+        print("{:<36} {:>10.2f} {:>10.1f} {:>9.1f} {:>9.1f} {:>8}".format(
+            name, r["median_ms"], r["items_per_s"], r["megapixels_per_s"], r["peak_rss_delta_mb"], r["threads"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "repeat": args.repeat, "min_time": args.min_time,
+                       "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        print("\ncompared with {} ({})".format(args.compare, baseline["environment"].get("commit")))
+        for name, before, after in regressions:
+            print("REGRESSION {:<36} {:>10.2f} -> {:.2f} ms ({:+.0f}%)".format(name, before, after,
+                                                                          (after / before - 1) * 100))
+        if regressions:
+            raise SystemExit(1)
+        print("no regressions above {:.0%}".format(args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+'''
+Reusable, headless building blocks behind the numbered tutorial scripts.
+
+The scripts in the numbered folders show each technique step by step with plots and windows.
+The modules in this package run the same techniques without any GUI so they can be used on servers and in batches.
+Importing the package or its command line (python -m object_detection <detector> <paths>, see cli) does not import
+OpenCV; every module imports what it needs itself.
+'''
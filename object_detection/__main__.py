@@ -0,0 +1,3 @@
+from object_detection.cli import main
+
+main()
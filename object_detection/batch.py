@@ -0,0 +1,97 @@
+'''
+Frame sources and ordered, bounded pool maps for the frame-by-frame APIs (edges, corners, ...).
+
+OpenCV releases the GIL inside its functions, so threads scale without copying frames between processes.
+executor.map would submit the whole input at once - a video would be decoded into memory ahead of the workers -
+so thread_map keeps at most max_pending items in flight and yields the results in input order.
+process_map does the same on a process pool, for work that holds the GIL, sending the items in chunks.
+'''
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+
+from object_detection.samples import IMAGE_EXTENSIONS, list_images
+
+
+def _is_video(source):
+    return isinstance(source, str) and os.path.isfile(source) and \
+        not source.lower().endswith(IMAGE_EXTENSIONS + (".txt", ".lst"))
+
+
+def iter_frames(source):
+    """
+    (name, image or path) pairs of a video file, a list of images/paths or a directory/manifest/image.
+    Video frames are read lazily, image paths are left for the workers to read.
+    """
+    if isinstance(source, (list, tuple)):
+        for i, item in enumerate(source):
+            yield (item if isinstance(item, str) else str(i)), item
+    elif _is_video(source):
+        cap = cv2.VideoCapture(source)
+        try:
+            index = 0
+            while True:
+                success, frame = cap.read()
+                if not success:
+                    return
+                yield "{:08d}".format(index), frame
+                index += 1
+        finally:
+            cap.release()
+    else:
+        for path in list_images(source):
+            yield path, path
+
+
+def thread_map(fn, items, workers=None, max_pending=None, name="worker"):
+    """
+    Yields fn(item) for every item, in order. workers=None uses every core, workers=0 runs in the calling thread.
+    At most max_pending (default 4 per worker) items are submitted and not yet yielded.
+    """
+    if workers == 0:
+        for item in items:
+            yield fn(item)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 4 * workers
+    pending = []
+    # one OpenCV thread per worker, the parallelism comes from the pool
+    with ThreadPoolExecutor(workers, thread_name_prefix=name, initializer=cv2.setNumThreads, initargs=(1,)) as pool:
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= max_pending:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def _map_chunk(fn, chunk):
+    return [fn(item) for item in chunk]
+
+
+def process_map(fn, items, workers=None, chunksize=4, max_pending=None, initializer=None):
+    """
+    Yields fn(item) for every item, in order, from a process pool. fn must be picklable (a module-level function).
+    Items go to the workers chunksize at a time, so the IPC cost is paid per chunk; at most max_pending chunks
+    (default 2 per worker) are submitted and not yet yielded.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    pending = deque()
+    chunk = []
+    with ProcessPoolExecutor(workers, initializer=initializer) as pool:
+        for item in items:
+            chunk.append(item)
+            if len(chunk) == chunksize:
+                pending.append(pool.submit(_map_chunk, fn, chunk))
+                chunk = []
+                if len(pending) >= max_pending:
+                    yield from pending.popleft().result()
+        if chunk:
+            pending.append(pool.submit(_map_chunk, fn, chunk))
+        while pending:
+            yield from pending.popleft().result()
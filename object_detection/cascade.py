@@ -0,0 +1,152 @@
+'''
+Faster Haar cascade detection for 8_face_detection and 9_cat_face_detection_with_cascade.
+
+The tutorial scripts run detectMultiScale over the full image on every call. The cost of a cascade grows with the
+number of pixels and with the number of pyramid levels (scaleFactor=1.045 in the cat script makes a very deep pyramid).
+FastCascadeDetector cuts both:
+
+1) Downscaled search - the cascade runs on a downscaled grayscale copy and the boxes are mapped back to full resolution.
+   A 24x24 cascade window does not need a 1080p frame to find an 80 pixel face.
+2) Automatic minSize/maxSize - from the expected object size, so the pyramid only has the levels that can match.
+3) ROI tracking on video - between full-frame searches only expanded regions around the previous frame's detections
+   are searched. A full-frame search runs every `full_search_every` frames, and whenever a tracked object is lost.
+'''
+
+import cv2
+import numpy as np
+
+from object_detection.nms import nms
+from object_detection.profiling import default_profiler as profiler
+from object_detection.registry import get_cascade
+
+
+def _as_size(size):
+    if size is None:
+        return None
+    if np.isscalar(size):
+        return int(size), int(size)
+    return int(size[0]), int(size[1])
+
+
+class FastCascadeDetector:
+    """
+    cascade           - cv2.CascadeClassifier, or a registered cascade name / XML path loaded through the registry
+    scale             - downscale factor of the search image (1.0 = full resolution); "auto" picks the smallest scale
+                        at which the smallest expected object is still `window_margin` times the cascade window
+    object_size       - expected object size in full resolution pixels, an int or (w, h); sets minSize/maxSize
+    size_tolerance    - (low, high) multipliers of object_size accepted as minSize/maxSize
+    full_search_every - on video, run a full-frame search every N frames and ROI searches in between
+    roi_margin        - how much a previous detection is expanded (relative to its size) to make its search ROI
+    params            - passed to detectMultiScale (scaleFactor, minNeighbors, ...)
+    """
+
+    def __init__(self, cascade, scale=0.5, object_size=None, size_tolerance=(0.5, 2.0), full_search_every=10,
+                 roi_margin=0.5, window_margin=1.5, **params):
+        self.cascade = get_cascade(cascade) if isinstance(cascade, str) else cascade
+        self.window = _as_size(self.cascade.getOriginalWindowSize())
+        self.object_size = _as_size(object_size)
+        self.size_tolerance = size_tolerance
+        self.full_search_every = full_search_every
+        self.roi_margin = roi_margin
+        self.params = params
+
+        if scale == "auto":
+            scale = 1.0
+            if self.object_size is not None:
+                smallest = min(self.object_size) * size_tolerance[0]
+                scale = min(1.0, window_margin * max(self.window) / smallest)
+        self.scale = float(scale)
+
+        # video state
+        self.frame_count = 0
+        self.previous = np.empty((0, 4), dtype=np.int32)
+        self.force_full_search = True
+
+    def size_limits(self, scale=None):
+        """minSize/maxSize for detectMultiScale at the given scale, from the expected object size."""
+        scale = self.scale if scale is None else scale
+        if self.object_size is None:
+            return {}
+        low, high = self.size_tolerance
+        w, h = self.object_size
+        # never ask for something smaller than the cascade window, it cannot be detected anyway
+        min_size = (max(self.window[0], int(w * low * scale)), max(self.window[1], int(h * low * scale)))
+        max_size = (max(min_size[0], int(w * high * scale)), max(min_size[1], int(h * high * scale)))
+        return {"minSize": min_size, "maxSize": max_size}
+
+    @staticmethod
+    def to_gray(image):
+        if image.ndim == 2:
+            return image
+        with profiler.stage("cascade", "gray"):
+            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    def _downscale(self, gray):
+        if self.scale == 1.0:
+            return gray
+        # INTER_AREA averages the pixels, which keeps the Haar features stable at small scales
+        with profiler.stage("cascade", "downscale"):
+            return cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def _run(self, gray, limits):
+        params = dict(self.params)
+        params.update(limits)
+        with profiler.stage("cascade", "detect_multiscale"):
+            rects = self.cascade.detectMultiScale(gray, **params)
+        return np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+
+    def detect(self, image):
+        """Full-image search on the downscaled copy. Returns an (N, 4) int array of (x, y, w, h) at full resolution."""
+        small = self._downscale(self.to_gray(image))
+        rects = self._run(small, self.size_limits())
+        return np.round(rects / self.scale).astype(np.int32)
+
+    def _roi_search(self, gray):
+        h, w = gray.shape[:2]
+        found = []
+        for (x, y, bw, bh) in self.previous:
+            # expand the previous box and search it at the downscaled resolution
+            mx, my = int(bw * self.roi_margin), int(bh * self.roi_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(w, x + bw + mx), min(h, y + bh + my)
+            roi = self._downscale(gray[y0:y1, x0:x1])
+
+            # the object keeps roughly its size between frames
+            s = self.scale
+            min_size = (max(self.window[0], int(bw * 0.7 * s)), max(self.window[1], int(bh * 0.7 * s)))
+            max_size = (max(min_size[0], int(bw * 1.4 * s)), max(min_size[1], int(bh * 1.4 * s)))
+            if roi.shape[0] < min_size[1] or roi.shape[1] < min_size[0]:
+                continue
+
+            rects = self._run(roi, {"minSize": min_size, "maxSize": max_size})
+            found.append(np.round(rects / s).astype(np.int32) + (x0, y0, 0, 0))
+        if not found:
+            return np.empty((0, 4), dtype=np.int32)
+        found = np.concatenate(found).astype(np.int32)
+        # neighbouring ROIs can overlap and find the same object twice; the first one found is kept
+        return found[np.sort(nms(found, np.zeros(len(found)), iou_threshold=0.5))]
+
+    def track(self, frame):
+        """Detection for the next video frame, searching only around the previous detections when possible."""
+        full = (self.force_full_search or len(self.previous) == 0
+                or self.frame_count % self.full_search_every == 0)
+        self.frame_count += 1
+        profiler.inc("frames", "cascade")
+
+        if full:
+            profiler.inc("full_searches", "cascade")
+            rects = self.detect(frame)
+            self.force_full_search = False
+        else:
+            rects = self._roi_search(self.to_gray(frame))
+            # something moved out of its ROI - look at the whole frame next time
+            self.force_full_search = len(rects) < len(self.previous)
+
+        profiler.observe("detections_per_frame", "cascade", len(rects))
+        self.previous = rects
+        return rects
+
+    def reset(self):
+        self.frame_count = 0
+        self.previous = np.empty((0, 4), dtype=np.int32)
+        self.force_full_search = True
@@ -0,0 +1,79 @@
+'''
+One command line entry point for every detector: python -m object_detection <detector> <paths>.
+
+The tutorial scripts import cv2 and matplotlib.pyplot first, list the current directory with os.listdir() and do
+all their work at import time. This command:
+
+- takes explicit paths - images, directories of images, manifests (.txt/.lst) or a mix of them; nothing is looked
+  up in the working directory
+- imports nothing heavy until a detector runs: --help and usage errors never import OpenCV or NumPy, and no code
+  path imports matplotlib
+- loads only the models of the chosen detector (Detectors(preload=False)): "edges" never builds the SIFT product
+  index or the HOG SVM
+- writes JSON lines to stdout by default, or to the sinks of object_detection.output
+
+    python -m object_detection faces 8_face_detection/barcelona.jpg --param minNeighbors=7
+    python -m object_detection pedestrians 11_pedestrian_detection --sink people.csv --sink annotated/
+
+The repository is not an installable package, so there is no "detect" executable: run it with python -m from the
+repository root, or alias detect="python -m object_detection".
+benchmarks/bench_startup.py measures the start-up time and fails when it is over budget.
+'''
+
+import argparse
+import json
+import os
+import sys
+
+# Detectors.NAMES, spelled out so that parsing the command line does not import OpenCV
+DETECTORS = ("edges", "corners", "contours", "color", "template", "features", "watershed", "faces", "cats",
+             "pedestrians")
+
+
+def parse_param(text):
+    """name=value; the value is JSON when it can be ("7", "1.05", "[8, 8]"), a plain string otherwise."""
+    name, _, value = text.partition("=")
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+def _named_path(text):
+    name, sep, path = text.partition("=")
+    if not sep or not name:
+        raise argparse.ArgumentTypeError("expected NAME=PATH, got {}".format(text))
+    return name, path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m object_detection",
+                                     description="Run a detector of the tutorials over images")
+    parser.add_argument("detector", choices=DETECTORS)
+    parser.add_argument("paths", nargs="+", help="images, directories of images or manifests (.txt/.lst)")
+    parser.add_argument("--sink", action="append", default=None,
+                        help="- (JSON lines on stdout, the default), null, display, results file (.jsonl/.json/.csv) "
+                             "or output directory; repeatable")
+    parser.add_argument("--param", action="append", type=parse_param, default=[], help="detector parameter name=value")
+    parser.add_argument("--template", action="append", type=_named_path, default=[], metavar="NAME=PATH",
+                        help="template image of the template detector; repeatable")
+    parser.add_argument("--product", action="append", type=_named_path, default=[], metavar="NAME=PATH",
+                        help="product image of the features detector; repeatable")
+    args = parser.parse_args(argv)
+
+    missing = [path for path in args.paths + [p for _, p in args.template + args.product] if not os.path.exists(path)]
+    if missing:
+        parser.error("no such file or directory: {}".format(", ".join(missing)))
+
+    from object_detection.detectors import Detectors
+    from object_detection.output import open_sink, run
+
+    detectors = Detectors(dict(args.template) or None, dict(args.product) or None, preload=False)
+    sinks = [open_sink(spec) for spec in (args.sink or ["-"])]
+    count = run(args.detector, args.paths, sinks, dict(args.param), detectors)
+    # stdout carries the results
+    print("{} images".format(count), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+'''
+Headless, allocation-free color tracker (see 4_color_detection_and_tracking).
+
+The tutorial loop allocates new images for the blur, HSV conversion, mask, erosion, dilation and mask copy on every
+frame, shows three debug windows and prints an info string. ColorTracker does the same processing but:
+
+- allocates every intermediate buffer once, for the frame size, and reuses it through the dst= arguments of OpenCV
+- optionally builds the mask on a downscaled frame (mask_scale < 1) and maps the results back to full resolution
+- keeps the center history in a fixed NumPy ring buffer instead of a deque of tuples
+- returns a structured Track record (center, minAreaRect, area) instead of printing
+- does not draw anything; draw() does it on request
+
+    tracker = ColorTracker((480, 960))
+    track = tracker.process(frame)  # None when nothing blue is visible
+'''
+
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from object_detection.profiling import default_profiler as profiler
+
+# blue range of the tutorial - HSV (hue, saturation, brightness)
+BLUE_LOWER = (84, 98, 0)
+BLUE_UPPER = (179, 255, 255)
+
+# frame: frame number, center: (x, y), rect: cv2.minAreaRect ((cx, cy), (w, h), angle), area: contour area
+Track = namedtuple("Track", "frame center rect area")
+
+
+class ColorTracker:
+    """
+    frame_shape - (height, width) of the frames that will be processed; other sizes raise ValueError
+    lower/upper - HSV range of the tracked color
+    mask_scale  - the mask is built at this fraction of the frame size (1.0 = full resolution)
+    history     - number of centers kept for the trail
+    """
+
+    def __init__(self, frame_shape, lower=BLUE_LOWER, upper=BLUE_UPPER, blur_ksize=11, morph_iterations=2,
+                 mask_scale=1.0, history=16):
+        h, w = frame_shape[:2]
+        self.frame_size = (w, h)
+        self.mask_scale = mask_scale
+        mw, mh = max(1, int(round(w * mask_scale))), max(1, int(round(h * mask_scale)))
+        self.mask_size = (mw, mh)
+
+        # the blur has to cover the same part of the scene at every scale, so the kernel shrinks with it (odd size)
+        k = max(1, int(round(blur_ksize * mask_scale)))
+        self.blur_ksize = (k | 1, k | 1)
+        self.morph_iterations = morph_iterations
+        self.lower = np.array(lower, dtype=np.uint8)
+        self.upper = np.array(upper, dtype=np.uint8)
+
+        # preallocated buffers
+        self.small = np.empty((mh, mw, 3), np.uint8) if mask_scale != 1.0 else None
+        self.blurred = np.empty((mh, mw, 3), np.uint8)
+        self.hsv = np.empty((mh, mw, 3), np.uint8)
+        self.mask = np.empty((mh, mw), np.uint8)
+        self.eroded = np.empty((mh, mw), np.uint8)
+
+        # ring buffer of centers, newest at self.head - 1
+        self.history = np.zeros((history, 2), np.int32)
+        self.head = 0
+        self.count = 0
+        self.frame_index = 0
+
+    def build_mask(self, frame):
+        """Blur, HSV, inRange and opening into the preallocated buffers. Returns the mask buffer."""
+        if frame.shape[1::-1] != self.frame_size:
+            # OpenCV would silently allocate new outputs instead of filling the buffers read by the next steps
+            raise ValueError("frame is {}x{}, the tracker was built for {}x{}".format(
+                frame.shape[1], frame.shape[0], *self.frame_size))
+        src = frame
+        if self.small is not None:
+            with profiler.stage("color_tracker", "resize"):
+                cv2.resize(frame, self.mask_size, dst=self.small, interpolation=cv2.INTER_AREA)
+            src = self.small
+        with profiler.stage("color_tracker", "blur"):
+            cv2.GaussianBlur(src, self.blur_ksize, 0, dst=self.blurred)
+        with profiler.stage("color_tracker", "hsv"):
+            cv2.cvtColor(self.blurred, cv2.COLOR_BGR2HSV, dst=self.hsv)
+        with profiler.stage("color_tracker", "in_range"):
+            cv2.inRange(self.hsv, self.lower, self.upper, dst=self.mask)
+        with profiler.stage("color_tracker", "morphology"):
+            cv2.erode(self.mask, None, dst=self.eroded, iterations=self.morph_iterations)
+            cv2.dilate(self.eroded, None, dst=self.mask, iterations=self.morph_iterations)
+        return self.mask
+
+    def process(self, frame):
+        """Track the largest object of the color in frame. Returns a Track or None."""
+        index = self.frame_index
+        self.frame_index += 1
+        profiler.inc("frames", "color_tracker")
+
+        mask = self.build_mask(frame)
+        # findContours does not modify its input (OpenCV >= 3.2), so the mask is not copied
+        with profiler.stage("color_tracker", "find_contours"):
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        profiler.observe("detections_per_frame", "color_tracker", len(contours))
+        if not contours:
+            return None
+
+        with profiler.stage("color_tracker", "measure"):
+            c = max(contours, key=cv2.contourArea)
+            m = cv2.moments(c)
+            if m["m00"] == 0:
+                return None
+            (x, y), (width, height), rotation = cv2.minAreaRect(c)
+
+        s = 1.0 / self.mask_scale
+        center = (int(m["m10"] / m["m00"] * s), int(m["m01"] / m["m00"] * s))
+        self.history[self.head] = center
+        self.head = (self.head + 1) % len(self.history)
+        self.count = min(self.count + 1, len(self.history))
+
+        rect = ((x * s, y * s), (width * s, height * s), rotation)
+        return Track(index, center, rect, m["m00"] * s * s)
+
+    def trail(self):
+        """The stored centers, newest first, as an (n, 2) array."""
+        order = (self.head - 1 - np.arange(self.count)) % len(self.history)
+        return self.history[order]
+
+    def reset(self):
+        self.head = 0
+        self.count = 0
+        self.frame_index = 0
+
+
+def draw(frame, track, trail=None):
+    """Draw a track like the tutorial: yellow box, pink center and the green trail."""
+    with profiler.stage("color_tracker", "draw"):
+        box = np.int64(cv2.boxPoints(track.rect))
+        cv2.drawContours(frame, [box], 0, (0, 255, 255), 2)
+        cv2.circle(frame, track.center, 5, (255, 0, 255), -1)
+        if trail is not None and len(trail) > 1:
+            cv2.polylines(frame, [trail.reshape(-1, 1, 2)], False, (0, 255, 0), 3)
+    return frame
@@ -0,0 +1,210 @@
+'''
+Corner detection for tracking (see 2_corner_detection).
+
+The tutorial computes cornerHarris and thresholds it with a full-image mask, then reads sudoku.jpg from disk again
+for goodFeaturesToTrack and draws the corners one cv2.circle at a time. CornerDetector instead:
+
+- reads nothing: it takes the image, computes each requested response (Harris, Shi-Tomasi) once per frame and
+  keeps them, so the Harris mask, the corner selection and any later use share them
+- selects corners with vectorized non-maximum suppression: local maxima by one dilation over the min_distance
+  window, the quality threshold, and optional grid bucketing that keeps the best `per_cell` corners in every cell,
+  so the corners are spread over the frame instead of piling up on the most textured part
+- optionally refines them to sub-pixel accuracy with cornerSubPix
+- returns an (N, 2) float32 array, ready for cv2.calcOpticalFlowPyrLK
+
+    detector = CornerDetector(max_corners=120, min_distance=10, grid=(4, 4), subpix=True)
+    corners = detector.detect(gray)
+
+The dilation suppresses every corner that has a stronger one within min_distance (a square window), which is close
+to, but not exactly, the greedy minimum distance of goodFeaturesToTrack.
+'''
+
+import argparse
+import json
+import threading
+
+import cv2
+import numpy as np
+
+from object_detection.batch import iter_frames, thread_map
+from object_detection.profiling import default_profiler as profiler
+
+METHODS = ("harris", "shi_tomasi")
+
+
+def to_gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def corner_responses(gray, methods=METHODS, block_size=3, ksize=3, k=0.04):
+    """
+    {method: float32 response} of a grayscale image. The two are computed separately: cornerEigenValsAndVecs
+    would give both from one structure tensor but also computes the eigenvectors, and is slower than both calls.
+    """
+    responses = {}
+    if "harris" in methods:
+        responses["harris"] = cv2.cornerHarris(gray, block_size, ksize, k)
+    if "shi_tomasi" in methods:
+        responses["shi_tomasi"] = cv2.cornerMinEigenVal(gray, block_size, ksize)
+    return responses
+
+
+def local_maxima(response, min_distance, threshold):
+    """(points (N, 2) float32 x, y; scores (N,)) of the pixels that are the maximum of their window and > threshold."""
+    size = 2 * max(1, int(min_distance)) + 1
+    dilated = cv2.dilate(response, cv2.getStructuringElement(cv2.MORPH_RECT, (size, size)))
+    ys, xs = np.nonzero((response >= dilated) & (response > threshold))
+    return np.column_stack((xs, ys)).astype(np.float32), response[ys, xs]
+
+
+def grid_select(points, scores, shape, grid=None, per_cell=None, max_corners=None):
+    """
+    Indices of the kept points, best first: at most per_cell per grid cell (rows, cols), then at most
+    max_corners overall. Without per_cell the cells share max_corners evenly.
+    """
+    if len(scores) == 0:
+        return np.empty(0, np.int64)
+    if grid is not None:
+        rows, cols = grid
+        h, w = shape[:2]
+        cell = (np.minimum(points[:, 1] * rows // h, rows - 1) * cols
+                + np.minimum(points[:, 0] * cols // w, cols - 1)).astype(np.int64)
+        if per_cell is None and max_corners:
+            per_cell = -(-max_corners // (rows * cols))
+        if per_cell is not None:
+            # sort by cell, then by score descending; the rank inside the cell is the distance to the cell's start
+            order = np.lexsort((-scores, cell))
+            sorted_cells = cell[order]
+            starts = np.searchsorted(sorted_cells, sorted_cells, side="left")
+            order = order[np.arange(len(order)) - starts < per_cell]
+            keep = order[np.argsort(-scores[order], kind="stable")]
+            return keep[:max_corners] if max_corners else keep
+    keep = np.argsort(-scores, kind="stable")
+    return keep[:max_corners] if max_corners else keep
+
+
+class CornerDetector:
+    """
+    method       - "shi_tomasi" (goodFeaturesToTrack's score) or "harris"
+    max_corners  - most corners returned (None = all)
+    quality      - corners below quality * the strongest response are dropped
+    min_distance - non-maximum suppression radius in pixels
+    grid         - (rows, cols) bucketing, None to select by score only
+    per_cell     - most corners per grid cell (default: max_corners shared evenly by the cells)
+    subpix       - refine with cornerSubPix in a subpix_window half-size window
+    """
+
+    def __init__(self, method="shi_tomasi", max_corners=120, quality=0.01, min_distance=10, grid=None,
+                 per_cell=None, subpix=False, subpix_window=(5, 5), block_size=3, ksize=3, k=0.04):
+        if method not in METHODS:
+            raise ValueError("method must be one of {}".format(", ".join(METHODS)))
+        self.method = method
+        self.max_corners = max_corners
+        self.quality = quality
+        self.min_distance = min_distance
+        self.grid = grid
+        self.per_cell = per_cell
+        self.subpix = subpix
+        self.subpix_window = subpix_window
+        self.criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT, 30, 0.01)
+        self.block_size = block_size
+        self.ksize = ksize
+        self.k = k
+        self.responses = {}  # of the last frame
+        self.scores = np.empty(0, np.float32)  # of the last corners
+
+    def compute(self, gray, methods=None):
+        """Computes and keeps the responses of a grayscale frame (default: only the detector's method)."""
+        with profiler.stage("corners", "response"):
+            self.responses = corner_responses(gray, methods or (self.method,), self.block_size, self.ksize, self.k)
+        return self.responses
+
+    def response(self, method=None):
+        return self.responses[method or self.method]
+
+    def threshold_mask(self, ratio=0.2, method="harris"):
+        """The tutorial's Harris mask (response > ratio * max) from the kept response."""
+        response = self.response(method)
+        return response > ratio * float(response.max())
+
+    def select(self, gray=None):
+        """Corners (N, 2) float32 from the kept response; gray is needed for the sub-pixel refinement."""
+        response = self.response()
+        with profiler.stage("corners", "nms"):
+            points, scores = local_maxima(response, self.min_distance, self.quality * float(response.max()))
+            keep = grid_select(points, scores, response.shape, self.grid, self.per_cell, self.max_corners)
+            points, self.scores = points[keep], scores[keep]
+        if self.subpix and len(points):
+            with profiler.stage("corners", "subpix"):
+                refined = cv2.cornerSubPix(gray, points.reshape(-1, 1, 2).copy(), self.subpix_window, (-1, -1),
+                                           self.criteria)
+            points = refined.reshape(-1, 2)
+        profiler.observe("detections_per_frame", "corners", len(points))
+        return points
+
+    def detect(self, image, methods=None):
+        """Responses and corners of one frame. Pass methods=METHODS to keep both responses for later use."""
+        gray = to_gray(image)
+        self.compute(gray, None if methods is None else tuple(sorted(set(methods) | {self.method})))
+        return self.select(gray)
+
+
+def detect_corners(source, workers=None, max_pending=None, **params):
+    """
+    Corners of every image or video frame of source (a list of images/paths, a directory, a manifest or a video),
+    in order: yields (name, corners (N, 2) float32). params go to CornerDetector, one detector per thread.
+    """
+    local = threading.local()
+
+    def run(item):
+        detector = getattr(local, "detector", None)
+        if detector is None:
+            detector = local.detector = CornerDetector(**params)
+        name, image = item
+        if isinstance(image, str):
+            image = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                return name, None
+        return name, detector.detect(image)
+
+    return thread_map(run, iter_frames(source), workers, max_pending, name="corners")
+
+
+def draw_corners(image, corners, color=(125, 125, 125), radius=3):
+    """Filled circles at the corners, drawn with one dilation instead of a cv2.circle call per corner."""
+    h, w = image.shape[:2]
+    xy = np.round(corners).astype(np.int64).reshape(-1, 2)
+    xy = xy[(xy[:, 0] >= 0) & (xy[:, 0] < w) & (xy[:, 1] >= 0) & (xy[:, 1] < h)]
+    mask = np.zeros((h, w), np.uint8)
+    mask[xy[:, 1], xy[:, 0]] = 255
+    mask = cv2.dilate(mask, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1)))
+    image[mask > 0] = color if image.ndim == 3 else color[0]
+    return image
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Corners of images or video frames, as JSON lines")
+    parser.add_argument("source", help="image, directory, manifest of images or a video file")
+    parser.add_argument("-o", "--output", required=True, help="JSON lines file")
+    parser.add_argument("--method", choices=METHODS, default="shi_tomasi")
+    parser.add_argument("--max-corners", type=int, default=120)
+    parser.add_argument("--min-distance", type=int, default=10)
+    parser.add_argument("--grid", type=int, nargs=2, metavar=("ROWS", "COLS"), default=None)
+    parser.add_argument("--subpix", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    grid = tuple(args.grid) if args.grid else None
+    count = 0
+    with open(args.output, "w") as f:
+        for name, corners in detect_corners(args.source, args.workers, method=args.method, grid=grid,
+                                            max_corners=args.max_corners, min_distance=args.min_distance,
+                                            subpix=args.subpix):
+            if corners is not None:
+                f.write(json.dumps({"source": name, "corners": np.round(corners, 2).tolist()}) + "\n")
+                count += 1
+    print("{} frames written to {}".format(count, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+'''
+Headless dataset builder for custom cascade training (see 10_custom_cascade.zip).
+
+create_dataset.py grabs camera frames, resizes them to 180x120 and calls cv2.imwrite on every 5th frame inside the
+capture loop, so every PNG encode stalls the capture. pos.lst, neg.lst and pos_samples.vec then come from a Windows
+GUI tool. Here the whole dataset is built from video files, image directories or a camera, without any window:
+
+- capture() resizes and keeps every n-th frame and hands it to an ImageWriter: the PNGs are encoded and written on a
+  small thread pool with a bounded number of pending images, so the capture loop only waits when the disk can't keep up
+- augment_positives() makes rotated, scaled and brightness-shifted copies of the positives on a thread pool, each
+  copy seeded by (seed, image, copy) so the dataset is the same whatever the number of workers
+- write_lists() writes pos.lst ("p/79_.png 1 0 0 180 120") and neg.lst ("n/127_.png") as opencv_traincascade expects
+- write_vec() writes the .vec samples of opencv_createsamples directly: a 12-byte header (count, width * height, 0, 0)
+  then, per sample, one zero byte and width * height little-endian int16 gray values
+
+    python -m object_detection.dataset --positives object.mp4 --negatives background.mp4 -o dataset --augment 4
+    opencv_traincascade -data dataset/classifier -vec dataset/pos_samples.vec -bg dataset/neg.lst -w 36 -h 24 ...
+'''
+
+import argparse
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from object_detection.batch import iter_frames, thread_map
+
+FRAME_SIZE = (180, 120)  # width, height of the saved images, as in create_dataset.py
+SAMPLE_SIZE = (36, 24)  # width, height of the .vec samples (the classifier's window in 10_custom_cascade)
+VEC_HEADER = struct.Struct("<iihh")
+
+
+class ImageWriter:
+    """
+    Writes images on a background thread pool. write() returns as soon as the image is queued, and blocks only when
+    max_pending images are already waiting. The images must not be modified after write(). close() waits for all
+    writes and raises the first error.
+    """
+
+    def __init__(self, workers=2, max_pending=64):
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="writer")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.written = 0
+        self.errors = []
+
+    def _write(self, path, image):
+        try:
+            if not cv2.imwrite(path, image):
+                raise ValueError("could not write {}".format(path))
+            with self.lock:
+                self.written += 1
+        except Exception as e:
+            with self.lock:
+                self.errors.append(e)
+        finally:
+            self.slots.release()
+
+    def write(self, path, image):
+        self.slots.acquire()
+        self.pool.submit(self._write, path, image)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        if self.errors:
+            raise self.errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_frames(source, max_frames=None):
+    """
+    Frames of a camera index, a video file, a directory, a manifest or a list of images.
+    Unreadable images are skipped.
+    """
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        cap = cv2.VideoCapture(int(source))
+        try:
+            count = 0
+            while max_frames is None or count < max_frames:
+                success, frame = cap.read()
+                if not success:
+                    return
+                yield frame
+                count += 1
+        finally:
+            cap.release()
+        return
+
+    for count, (_, image) in enumerate(iter_frames(source)):
+        if max_frames is not None and count >= max_frames:
+            return
+        if isinstance(image, str):
+            image = cv2.imread(image)
+            if image is None:
+                continue
+        yield image
+
+
+def capture(source, directory, writer, size=FRAME_SIZE, every=5, max_frames=None, start=0):
+    """
+    Queues every n-th frame of source on writer as <directory>/<start + i>_.png, resized to size (None keeps it),
+    and returns the paths. Only the kept frames are resized, with the tutorial's bilinear resize (INTER_AREA
+    is about 6x slower at 640x480 -> 180x120).
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index, frame in enumerate(read_frames(source, max_frames)):
+        if index % every:
+            continue
+        if size is not None and frame.shape[1::-1] != tuple(size):
+            frame = cv2.resize(frame, tuple(size))
+        path = os.path.join(directory, "{}_.png".format(start + len(paths)))
+        writer.write(path, frame)
+        paths.append(path)
+    return paths
+
+
+def augment_image(image, rng, rotation=10.0, brightness=0.2, scale=(0.9, 1.1)):
+    """
+    Rotated (+-rotation degrees) and scaled copy of an image in one warpAffine (reflected borders, same size),
+    with its brightness multiplied by 1 +- brightness.
+    """
+    h, w = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), rng.uniform(-rotation, rotation), rng.uniform(*scale))
+    out = cv2.warpAffine(image, matrix, (w, h), borderMode=cv2.BORDER_REFLECT_101)
+    return cv2.convertScaleAbs(out, dst=out, alpha=1.0 + rng.uniform(-brightness, brightness))
+
+
+def augment_positives(paths, directory, copies=4, workers=None, seed=0, start=0, **params):
+    """
+    Writes copies augmented versions of every image of paths as <directory>/<start + n>_.png, on a thread pool.
+    Returns the new paths. params go to augment_image.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    def run(item):
+        i, path = item
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError("could not read {}".format(path))
+        written = []
+        for k in range(copies):
+            out = os.path.join(directory, "{}_.png".format(start + i * copies + k))
+            if not cv2.imwrite(out, augment_image(image, np.random.default_rng((seed, i, k)), **params)):
+                raise ValueError("could not write {}".format(out))
+            written.append(out)
+        return written
+
+    return [p for written in thread_map(run, enumerate(paths), workers, name="augment") for p in written]
+
+
+def write_lists(root, positives, negatives, pos_name="pos.lst", neg_name="neg.lst"):
+    """
+    pos.lst with one whole-image box per positive and neg.lst, paths relative to root.
+    positives are image paths or (path, [(x, y, w, h), ...]) pairs.
+    """
+    with open(os.path.join(root, pos_name), "w") as f:
+        for item in positives:
+            path, boxes = (item, None) if isinstance(item, str) else item
+            if boxes is None:
+                image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+                if image is None:
+                    raise ValueError("could not read {}".format(path))
+                boxes = [(0, 0, image.shape[1], image.shape[0])]
+            f.write(" ".join([os.path.relpath(path, root), str(len(boxes))]
+                             + [str(int(v)) for box in boxes for v in box]) + "\n")
+    with open(os.path.join(root, neg_name), "w") as f:
+        for path in negatives:
+            f.write(os.path.relpath(path, root) + "\n")
+
+
+def read_info(path):
+    """[(absolute image path, [(x, y, w, h), ...])] of a pos.lst / info file."""
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            values = [int(v) for v in fields[2:2 + 4 * int(fields[1])]]
+            boxes = [tuple(values[i:i + 4]) for i in range(0, len(values), 4)]
+            entries.append((os.path.join(base, fields[0]), boxes))
+    return entries
+
+
+def vec_samples(entries, size=SAMPLE_SIZE, workers=None):
+    """Grayscale size samples of every box of the (path, boxes) entries, cropped and resized on a thread pool."""
+    def run(entry):
+        path, boxes = entry
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError("could not read {}".format(path))
+        return [cv2.resize(gray[y:y + h, x:x + w], tuple(size), interpolation=cv2.INTER_AREA)
+                for x, y, w, h in boxes]
+
+    for samples in thread_map(run, entries, workers, name="samples"):
+        yield from samples
+
+
+def write_vec(path, samples, size=SAMPLE_SIZE):
+    """Writes grayscale samples of size (width, height) as an opencv_createsamples .vec file. Returns the count."""
+    w, h = size
+    count = 0
+    with open(path, "wb") as f:
+        f.write(VEC_HEADER.pack(0, w * h, 0, 0))  # the count is patched at the end
+        for sample in samples:
+            if sample.shape != (h, w):
+                raise ValueError("sample {} does not match the size {}x{}".format(sample.shape, w, h))
+            f.write(b"\x00")
+            f.write(sample.astype("<i2").tobytes())
+            count += 1
+        f.seek(0)
+        f.write(VEC_HEADER.pack(count, w * h, 0, 0))
+    return count
+
+
+def read_vec(path, size=SAMPLE_SIZE):
+    """(N, height, width) uint8 samples of a .vec file."""
+    w, h = size
+    with open(path, "rb") as f:
+        count, area, _, _ = VEC_HEADER.unpack(f.read(VEC_HEADER.size))
+    if area != w * h:
+        raise ValueError("{} holds {} pixel samples, not {}x{}".format(path, area, w, h))
+    records = np.fromfile(path, np.dtype([("gap", "u1"), ("data", "<i2", (h, w))]), count, offset=VEC_HEADER.size)
+    return records["data"].astype(np.uint8)
+
+
+def build_dataset(positives, negatives, output, size=FRAME_SIZE, every=5, augment=0, sample_size=SAMPLE_SIZE,
+                  workers=None, writers=2, seed=0, max_frames=None, **params):
+    """
+    Builds output/p, output/n, pos.lst, neg.lst and pos_samples.vec from a positive and a negative source
+    (camera index, video, directory or manifest). Returns the counts.
+    """
+    pos_dir, neg_dir = os.path.join(output, "p"), os.path.join(output, "n")
+    with ImageWriter(writers) as writer:
+        pos = capture(positives, pos_dir, writer, size, every, max_frames)
+        neg = capture(negatives, neg_dir, writer, size, every, max_frames)
+    if augment:
+        pos += augment_positives(pos, pos_dir, augment, workers, seed, start=len(pos), **params)
+
+    # resized frames are all of the same size, otherwise write_lists reads every image for its size
+    entries = [(path, [(0, 0) + tuple(size)]) for path in pos] if size is not None else pos
+    write_lists(output, entries, neg)
+    if size is None:
+        entries = read_info(os.path.join(output, "pos.lst"))
+    vec = os.path.join(output, "pos_samples.vec")
+    samples = write_vec(vec, vec_samples(entries, sample_size, workers), sample_size)
+    return {"positives": len(pos), "negatives": len(neg), "samples": samples}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a cascade training dataset without any GUI")
+    parser.add_argument("--positives", required=True, help="camera index, video, directory or manifest of positives")
+    parser.add_argument("--negatives", required=True, help="camera index, video, directory or manifest of negatives")
+    parser.add_argument("-o", "--output", required=True, help="dataset directory")
+    parser.add_argument("--size", type=int, nargs=2, metavar=("W", "H"), default=FRAME_SIZE)
+    parser.add_argument("--every", type=int, default=5, help="keep every n-th frame")
+    parser.add_argument("--max-frames", type=int, default=None, help="frames read from each source")
+    parser.add_argument("--augment", type=int, default=0, help="augmented copies per positive")
+    parser.add_argument("--sample-size", type=int, nargs=2, metavar=("W", "H"), default=SAMPLE_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    counts = build_dataset(args.positives, args.negatives, args.output, tuple(args.size), args.every, args.augment,
+                           tuple(args.sample_size), args.workers, args.writers, args.seed, args.max_frames)
+    print("{positives} positives, {negatives} negatives, {samples} samples in ".format(**counts) + args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+'''
+Memory-mapped descriptor store for the feature matching templates.
+
+sift.detectAndCompute only gives in-memory NumPy arrays, so with a large catalogue every worker recomputes the
+descriptors or keeps its own copy. A store is a folder with a small JSON header and fixed-layout little-endian files:
+
+    store.json                 names and image shapes of the templates, row counts, format version
+    <kind>_descriptors.bin     one row per keypoint: float32 x 128 for sift, uint8 x 32 for orb
+    <kind>_keypoints.bin       float32 x 4 per keypoint: x, y, size, angle
+    <kind>_offsets.bin         int64 x (templates + 1): rows of template i are offsets[i]:offsets[i + 1]
+
+The loader opens the files with np.memmap read-only, so any number of processes share one page-cached copy
+and opening a store costs next to nothing. Templates are views into the mapped files, not copies.
+
+Build a store from a folder of images:
+    python -m object_detection.descriptor_store products/ products.store --kinds sift orb
+'''
+
+import argparse
+import json
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+from object_detection.features import ORB_NFEATURES, Template, compute_features, create_extractor
+from object_detection.samples import list_images
+
+VERSION = 1
+
+# descriptor layout of every supported kind
+LAYOUTS = {
+    "sift": (np.dtype("<f4"), 128),
+    "orb": (np.dtype("<u1"), 32),
+}
+KEYPOINT_DTYPE = np.dtype("<f4")
+OFFSET_DTYPE = np.dtype("<i8")
+
+
+def _file(store_dir, kind, part):
+    return os.path.join(store_dir, "{}_{}.bin".format(kind, part))
+
+
+def build_store(images, store_dir, kinds=("sift", "orb"), names=None, nfeatures=ORB_NFEATURES):
+    """
+    Compute the features of every image and write them into a new store.
+    Rows are streamed to disk image by image, so memory use does not grow with the catalogue.
+    The store is written next to store_dir and renamed into place when complete.
+    """
+    if names is None:
+        names = [os.path.splitext(os.path.basename(path))[0] for path in images]
+    tmp_dir = store_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    extractors = {kind: create_extractor(kind, nfeatures) for kind in kinds}
+    files = {}
+    for kind in kinds:
+        files[kind] = (open(_file(tmp_dir, kind, "descriptors"), "wb"), open(_file(tmp_dir, kind, "keypoints"), "wb"))
+    offsets = {kind: [0] for kind in kinds}
+    shapes = []
+
+    try:
+        for path in images:
+            image = cv2.imread(path, 0)
+            if image is None:
+                raise ValueError("unreadable image: {}".format(path))
+            shapes.append(list(image.shape[:2]))
+
+            for kind in kinds:
+                dtype, width = LAYOUTS[kind]
+                points, descriptors = compute_features(extractors[kind], image)
+                if descriptors is None:
+                    descriptors = np.empty((0, width), dtype)
+                des_file, kp_file = files[kind]
+                descriptors.astype(dtype, copy=False).tofile(des_file)
+                points.astype(KEYPOINT_DTYPE, copy=False).tofile(kp_file)
+                offsets[kind].append(offsets[kind][-1] + len(descriptors))
+    finally:
+        for des_file, kp_file in files.values():
+            des_file.close()
+            kp_file.close()
+
+    for kind in kinds:
+        np.array(offsets[kind], dtype=OFFSET_DTYPE).tofile(_file(tmp_dir, kind, "offsets"))
+
+    header = {
+        "version": VERSION,
+        "kinds": {kind: {"rows": offsets[kind][-1], "width": LAYOUTS[kind][1]} for kind in kinds},
+        "names": list(names),
+        "shapes": shapes,
+    }
+    with open(os.path.join(tmp_dir, "store.json"), "w") as f:
+        json.dump(header, f)
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    return store_dir
+
+
+class DescriptorStore:
+    """Read-only, memory-mapped view of a store written by build_store."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        if not os.path.isfile(os.path.join(store_dir, "store.json")):
+            raise FileNotFoundError("no descriptor store at {} (build one with build_store)".format(store_dir))
+        with open(os.path.join(store_dir, "store.json")) as f:
+            self.header = json.load(f)
+        if self.header["version"] != VERSION:
+            raise ValueError("unsupported descriptor store version: {}".format(self.header["version"]))
+
+        self.names = self.header["names"]
+        self.shapes = [tuple(s) for s in self.header["shapes"]]
+        self._maps = {}
+        for kind, info in self.header["kinds"].items():
+            self._maps[kind] = self._open(kind, info["rows"], info["width"])
+
+    def _open(self, kind, rows, width):
+        dtype = LAYOUTS[kind][0]
+        offsets = np.memmap(_file(self.store_dir, kind, "offsets"), OFFSET_DTYPE, mode="r")
+        if rows == 0:
+            # np.memmap cannot map an empty file
+            return np.empty((0, width), dtype), np.empty((0, 4), KEYPOINT_DTYPE), offsets
+        descriptors = np.memmap(_file(self.store_dir, kind, "descriptors"), dtype, mode="r", shape=(rows, width))
+        keypoints = np.memmap(_file(self.store_dir, kind, "keypoints"), KEYPOINT_DTYPE, mode="r", shape=(rows, 4))
+        return descriptors, keypoints, offsets
+
+    @property
+    def kinds(self):
+        return list(self._maps)
+
+    def __len__(self):
+        return len(self.names)
+
+    def descriptors(self, kind):
+        """All descriptor rows of one kind as a single (rows, width) memmap."""
+        return self._maps[kind][0]
+
+    def template(self, kind, i):
+        descriptors, keypoints, offsets = self._maps[kind]
+        start, end = int(offsets[i]), int(offsets[i + 1])
+        return Template(self.names[i], keypoints[start:end], descriptors[start:end], self.shapes[i])
+
+    def templates(self, kind):
+        """Templates of one kind, skipping the ones without enough keypoints to be matched."""
+        for i in range(len(self)):
+            template = self.template(kind, i)
+            if len(template.descriptors) >= 2:
+                yield template
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a memory-mapped descriptor store from a folder of images")
+    parser.add_argument("source", help="image directory, single image or manifest file")
+    parser.add_argument("store", help="output store folder")
+    parser.add_argument("--kinds", nargs="+", choices=sorted(LAYOUTS), default=["sift", "orb"])
+    parser.add_argument("--nfeatures", type=int, default=ORB_NFEATURES, help="ORB keypoints per image")
+    args = parser.parse_args(argv)
+
+    images = list_images(args.source)
+    build_store(images, args.store, kinds=args.kinds, nfeatures=args.nfeatures)
+    store = DescriptorStore(args.store)
+    for kind in store.kinds:
+        print("{}: {} templates, {} rows".format(kind, len(store), len(store.descriptors(kind))))
+
+
+if __name__ == "__main__":
+    main()
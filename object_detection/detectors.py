@@ -0,0 +1,172 @@
+'''
+Every technique of the tutorial folders as a headless detector returning JSON-ready results.
+
+Detectors loads the models once - the cascades (through the registry), the HOG people SVM, the template images and
+the product index of the feature matcher - and runs any detector by name:
+
+    detectors = Detectors()
+    detectors.run("faces", image, {"minNeighbors": 7})
+
+The results only contain plain lists, numbers and strings so they can be sent as JSON as they are.
+'''
+
+import os
+from functools import cached_property
+
+import cv2
+import numpy as np
+
+from object_detection.cascade import FastCascadeDetector
+from object_detection.contours import analyze as analyze_contours
+from object_detection.descriptor_store import DescriptorStore
+from object_detection.color_tracking import BLUE_LOWER, BLUE_UPPER
+from object_detection.edges import SIGMA, EdgeExtractor
+from object_detection.features import ProductIndex
+from object_detection.multi_color_tracking import MultiColorTracker
+from object_detection.nms import postprocess
+from object_detection.pedestrians import DEFAULT_NMS, DEFAULT_PARAMS as HOG_PARAMS, create_hog
+from object_detection.registry import default_registry
+from object_detection.samples import sample_path
+from object_detection.segmentation import segment
+from object_detection.template_matching import match_templates
+
+# models loaded by default, all bundled with the tutorial folders
+DEFAULT_TEMPLATES = {"cat_face": sample_path("5_template_matching", "cat_face.jpg")}
+DEFAULT_PRODUCTS = {"nestle": sample_path("6_feature_matching", "nestle.jpg")}
+DEFAULT_COLORS = [("blue", BLUE_LOWER, BLUE_UPPER)]
+
+
+def to_gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def _boxes(rects):
+    return np.asarray(rects, dtype=np.int64).reshape(-1, 4).tolist()
+
+
+def detect_edges(image, sigma=SIGMA, blur=5):
+    """Canny with thresholds around the median intensity (1_edge_detection)."""
+    edges, thresholds = EdgeExtractor(blur, sigma).extract(image)
+    return {"thresholds": list(thresholds), "edge_pixels": int(cv2.countNonZero(edges))}
+
+
+def detect_corners(image, max_corners=120, quality=0.01, min_distance=10):
+    """Shi-Tomasi corners (2_corner_detection)."""
+    corners = cv2.goodFeaturesToTrack(to_gray(image), max_corners, quality, min_distance)
+    return {"corners": [] if corners is None else corners.reshape(-1, 2).tolist()}
+
+
+def detect_contours(image, threshold=None):
+    """External and internal contours (3_contour_detection). The image is binarized first when threshold is given."""
+    result = analyze_contours(to_gray(image), threshold)
+    return {"external": result.stats["bbox"][result.external].tolist(), "internal": int((~result.external).sum())}
+
+
+def detect_colors(image, colors=None, min_area=100):
+    """Every object of every HSV range (4_color_detection_and_tracking)."""
+    tracker = MultiColorTracker(image.shape, colors or DEFAULT_COLORS, min_area=min_area)
+    return {
+        name: [{"center": [round(c[0], 1), round(c[1], 1)], "bbox": [round(v, 1) for v in bbox], "area": area}
+               for c, bbox, _, area in found]
+        for name, found in tracker.detect(image).items()
+    }
+
+
+def detect_cascade(cascade, image, scale=1.0, **params):
+    """
+    Haar cascade boxes (8_face_detection, 9_cat_face_detection_with_cascade). By default the full-resolution search
+    of the tutorial scripts. scale=0.5 (--param scale=0.5 on the command line) searches a half-size copy, about 3x
+    faster, but misses objects smaller than twice the cascade window (48 px with the 24x24 face cascade): 12 of the
+    18 faces of barcelona.jpg. scale="auto" with object_size picks the smallest safe scale (see FastCascadeDetector).
+    """
+    return {"boxes": _boxes(FastCascadeDetector(cascade, scale=scale, **params).detect(image))}
+
+
+def read_gray(path):
+    """Grayscale model image (template or product); a missing or unreadable file is an error naming it."""
+    if not os.path.isfile(path):
+        raise FileNotFoundError("no such image: {}".format(path))
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("could not read {}".format(path))
+    return image
+
+
+def detect_pedestrians(hog, image, **params):
+    """HOG people detector boxes and weights (11_pedestrian_detection), duplicates removed with NMS."""
+    params = dict(HOG_PARAMS, **params)
+    rects, weights = hog.detectMultiScale(image, **params)
+    rects, weights, _ = postprocess(rects, weights, **DEFAULT_NMS)
+    return {"boxes": _boxes(rects), "weights": weights.tolist()}
+
+
+class Detectors:
+    """
+    The models and the detectors using them. One instance per thread: the OpenCV objects inside
+    (cascades, HOG, FLANN) must not be used from two threads at the same time.
+
+    templates - {name: image path} for the template detector
+    products  - {name: image path} for the feature-matching detector, or a DescriptorStore or the path of one
+    preload   - load every model now (a service worker); otherwise each one is loaded by the first detector
+                needing it, so a one-off run of "edges" never builds the product index or the HOG SVM
+    """
+
+    NAMES = ("edges", "corners", "contours", "color", "template", "features", "watershed", "faces", "cats",
+             "pedestrians")
+
+    def __init__(self, templates=None, products=None, kind="sift", preload=True):
+        self.template_paths = templates or DEFAULT_TEMPLATES
+        self.products = products if products is not None else DEFAULT_PRODUCTS
+        self.kind = kind
+        if preload:
+            for model in ("templates", "index", "hog"):
+                getattr(self, model)
+            default_registry.preload(["face", "cat"])
+
+    @cached_property
+    def templates(self):
+        return [(name, read_gray(path)) for name, path in self.template_paths.items()]
+
+    @cached_property
+    def index(self):
+        if isinstance(self.products, dict):
+            index = ProductIndex(kind=self.kind)
+            for name, path in self.products.items():
+                index.add_template(name, read_gray(path))
+            index.merge()
+            return index
+        store = DescriptorStore(self.products) if isinstance(self.products, str) else self.products
+        return ProductIndex.from_store(store, self.kind)
+
+    @cached_property
+    def hog(self):
+        return create_hog()
+
+    def run(self, name, image, params=None):
+        params = params or {}
+        if name == "edges":
+            return detect_edges(image, **params)
+        if name == "corners":
+            return detect_corners(image, **params)
+        if name == "contours":
+            return detect_contours(image, **params)
+        if name == "color":
+            return detect_colors(image, **params)
+        if name == "template":
+            return {"matches": [dict(m, box=list(m["box"])) for m in match_templates(to_gray(image), self.templates,
+                                                                                      **params)]}
+        if name == "features":
+            return {"products": self.index.query(to_gray(image), **params)}
+        if name == "watershed":
+            stats = segment(image, params, contours=False, labels=False).stats
+            return {"count": stats["count"], "area": stats["area"].tolist(), "bbox": stats["bbox"].tolist(),
+                    "centroid": np.round(stats["centroid"], 2).tolist()}
+        if name == "faces":
+            return detect_cascade(default_registry.get("face"), image, **params)
+        if name == "cats":
+            params.setdefault("scaleFactor", 1.045)
+            params.setdefault("minNeighbors", 2)
+            return detect_cascade(default_registry.get("cat"), image, **params)
+        if name == "pedestrians":
+            return detect_pedestrians(self.hog, image, **params)
+        raise KeyError("unknown detector: {}".format(name))
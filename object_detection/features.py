@@ -0,0 +1,254 @@
+'''
+Product recognition index for feature matching (see 6_feature_matching).
+
+The tutorial matches one template (nestle.jpg) against one scene (chocolates.jpg) with a brute-force matcher and
+recomputes the descriptors on every run. Brute force compares every descriptor with every other one, which does not
+scale to thousands of templates per shelf image. ProductIndex instead:
+
+1) computes the keypoints and descriptors of every template once and stores them on disk (one .npz per template)
+2) builds a FLANN index over all of them: a KD-tree forest for SIFT (float descriptors) or LSH for ORB (binary ones)
+3) answers a query with Lowe's ratio test, then verifies every candidate template with a RANSAC homography
+4) adds templates incrementally: new templates go into a small "delta" index that is merged into the main index
+   only when it grows past `merge_every` templates, so an add never rebuilds the whole catalogue
+
+    index = ProductIndex("products_db", kind="sift")
+    index.add_template("nestle", cv2.imread("nestle.jpg", 0))
+    index.query(cv2.imread("chocolates.jpg", 0))
+
+ORB is the fast path, but its keypoints are spread over the whole image: with 1000 of them the 1010x758 shelf of
+chocolates.jpg keeps only a couple of dozen on the nestle bar, and 4 or so survive RANSAC. Hence ORB_NFEATURES:
+with 5000 keypoints nestle is found with about 30 inliers. The price is the LSH query: against nestle alone ORB is
+still 6x faster than SIFT, against a catalogue of 200 templates it is 2x slower (see benchmarks/bench_features.py),
+so SIFT remains the default and ORB with fewer keypoints trades recall for speed.
+'''
+
+import json
+import os
+
+import cv2
+import numpy as np
+
+FLANN_INDEX_KDTREE = 1
+FLANN_INDEX_LSH = 6
+
+# ORB keypoints per image, measured with benchmarks/bench_features.py on nestle.jpg/chocolates.jpg
+ORB_NFEATURES = 5000
+
+
+def create_extractor(kind, nfeatures=ORB_NFEATURES):
+    if kind == "sift":
+        return cv2.SIFT_create()
+    if kind == "orb":
+        return cv2.ORB_create(nfeatures=nfeatures)
+    raise ValueError("unknown feature kind: {} (use sift or orb)".format(kind))
+
+
+def create_flann(kind):
+    if kind == "sift":
+        index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
+    else:
+        # binary descriptors need locality sensitive hashing instead of a KD-tree
+        index_params = dict(algorithm=FLANN_INDEX_LSH, table_number=6, key_size=12, multi_probe_level=1)
+    return cv2.FlannBasedMatcher(index_params, dict(checks=50))
+
+
+def compute_features(extractor, image):
+    """(points, descriptors): points is an (N, 4) float32 array of x, y, size, angle."""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    keypoints, descriptors = extractor.detectAndCompute(image, None)
+    points = np.array([(k.pt[0], k.pt[1], k.size, k.angle) for k in keypoints], dtype=np.float32).reshape(-1, 4)
+    return points, descriptors
+
+
+def ratio_test(knn_matches, ratio=0.75):
+    """Lowe's ratio test - keep a match only if it is clearly better than the second best one."""
+    good = []
+    for pair in knn_matches:
+        if len(pair) == 2 and pair[0].distance < ratio * pair[1].distance:
+            good.append(pair[0])
+    return good
+
+
+class Template:
+    __slots__ = ("name", "points", "descriptors", "shape")
+
+    def __init__(self, name, points, descriptors, shape):
+        self.name = name
+        self.points = points
+        self.descriptors = descriptors
+        self.shape = tuple(shape)
+
+
+class _Segment:
+    """One trained FLANN index over a list of templates. imgIdx of a match is the position in `templates`."""
+
+    def __init__(self, kind, templates):
+        self.templates = list(templates)
+        self.matcher = create_flann(kind)
+        if self.templates:
+            self.matcher.add([t.descriptors for t in self.templates])
+            self.matcher.train()
+
+    def knn(self, descriptors, k=2):
+        if not self.templates:
+            return [[] for _ in range(len(descriptors))]
+        return self.matcher.knnMatch(descriptors, k=k)
+
+
+class ProductIndex:
+    """
+    db_dir      - folder of the descriptor database, created if it does not exist; None keeps everything in memory
+    kind        - "sift" (KD-tree) or "orb" (LSH)
+    merge_every - size of the delta index that triggers a merge into the main index
+    nfeatures   - ORB keypoints per image (ignored by SIFT)
+    """
+
+    def __init__(self, db_dir=None, kind="sift", merge_every=64, nfeatures=ORB_NFEATURES):
+        self.db_dir = db_dir
+        self.kind = kind
+        self.merge_every = merge_every
+        self.extractor = create_extractor(kind, nfeatures)
+        self.main = _Segment(kind, [])
+        self.delta = []
+        self._delta_segment = None
+
+        if db_dir is not None:
+            os.makedirs(db_dir, exist_ok=True)
+            self._load()
+
+    @classmethod
+    def from_store(cls, store, kind="sift", **kwargs):
+        """
+        Index over the templates of a DescriptorStore (see descriptor_store.py).
+        The descriptors are read from the memory-mapped files, nothing is recomputed.
+        """
+        index = cls(None, kind=kind, **kwargs)
+        index.main = _Segment(kind, store.templates(kind))
+        return index
+
+    # persistence
+
+    def _manifest_path(self):
+        return os.path.join(self.db_dir, "templates.json")
+
+    def _load(self):
+        if not os.path.exists(self._manifest_path()):
+            return
+        with open(self._manifest_path()) as f:
+            manifest = json.load(f)
+        if manifest["kind"] != self.kind:
+            raise ValueError("{} holds {} descriptors, not {}".format(self.db_dir, manifest["kind"], self.kind))
+
+        templates = []
+        for name in manifest["templates"]:
+            data = np.load(os.path.join(self.db_dir, name + ".npz"))
+            templates.append(Template(name, data["points"], data["descriptors"], data["shape"]))
+        self.main = _Segment(self.kind, templates)
+
+    def _save_manifest(self):
+        manifest = {"kind": self.kind, "templates": self.names()}
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path())
+
+    # building
+
+    def names(self):
+        return [t.name for t in self.main.templates + self.delta]
+
+    def __len__(self):
+        return len(self.main.templates) + len(self.delta)
+
+    def add_template(self, name, image):
+        """Compute and store the features of one template and make it searchable."""
+        points, descriptors = compute_features(self.extractor, image)
+        if descriptors is None or len(descriptors) < 2:
+            raise ValueError("template {} has too few keypoints".format(name))
+
+        if self.db_dir is not None:
+            np.savez(os.path.join(self.db_dir, name + ".npz"), points=points, descriptors=descriptors,
+                     shape=np.array(image.shape[:2]))
+        self.delta.append(Template(name, points, descriptors, image.shape[:2]))
+        self._delta_segment = None
+
+        if len(self.delta) >= self.merge_every:
+            self.merge()
+        if self.db_dir is not None:
+            self._save_manifest()
+
+    def merge(self):
+        """Fold the delta templates into the main index (one full rebuild of the main index)."""
+        if self.delta:
+            self.main = _Segment(self.kind, self.main.templates + self.delta)
+            self.delta = []
+            self._delta_segment = None
+
+    # querying
+
+    def _segments(self):
+        segments = [self.main]
+        if self.delta:
+            # the delta index is small, so rebuilding it after an add is cheap
+            if self._delta_segment is None:
+                self._delta_segment = _Segment(self.kind, self.delta)
+            segments.append(self._delta_segment)
+        return segments
+
+    def _knn(self, descriptors):
+        """Two nearest template descriptors for every query descriptor, over all segments."""
+        segments = self._segments()
+        per_segment = [segment.knn(descriptors, k=2) for segment in segments]
+        if len(segments) == 1:
+            return [[(m, segments[0]) for m in pair] for pair in per_segment[0]]
+
+        merged = []
+        for pairs in zip(*per_segment):
+            candidates = [(m, segment) for segment, pair in zip(segments, pairs) for m in pair]
+            candidates.sort(key=lambda c: c[0].distance)
+            merged.append(candidates[:2])
+        return merged
+
+    def query(self, image, ratio=0.75, min_matches=10, min_inliers=8, ransac_threshold=5.0):
+        """
+        Find the templates visible in image.
+        Returns a list of dicts (name, matches, inliers, homography, corners) sorted by number of inliers.
+        corners is the template outline projected into the image.
+        """
+        points, descriptors = compute_features(self.extractor, image)
+        if descriptors is None or len(self) == 0:
+            return []
+
+        # group the matches that pass the ratio test by template
+        per_template = {}
+        for pair in self._knn(descriptors):
+            if len(pair) == 2 and pair[0][0].distance < ratio * pair[1][0].distance:
+                match, segment = pair[0]
+                template = segment.templates[match.imgIdx]
+                per_template.setdefault(template.name, (template, []))[1].append(match)
+
+        results = []
+        for template, matches in per_template.values():
+            if len(matches) < min_matches:
+                continue
+            src = template.points[[m.trainIdx for m in matches], :2].reshape(-1, 1, 2)
+            dst = points[[m.queryIdx for m in matches], :2].reshape(-1, 1, 2)
+            homography, mask = cv2.findHomography(src, dst, cv2.RANSAC, ransac_threshold)
+            inliers = int(mask.sum()) if mask is not None else 0
+            if homography is None or inliers < min_inliers:
+                continue
+
+            h, w = template.shape
+            outline = np.float32([[0, 0], [w, 0], [w, h], [0, h]]).reshape(-1, 1, 2)
+            corners = cv2.perspectiveTransform(outline, homography).reshape(-1, 2)
+            results.append({
+                "name": template.name,
+                "matches": len(matches),
+                "inliers": inliers,
+                "homography": homography.tolist(),
+                "corners": corners.tolist(),
+            })
+
+        results.sort(key=lambda r: r["inliers"], reverse=True)
+        return results
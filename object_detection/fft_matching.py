@@ -0,0 +1,153 @@
+'''
+FFT-based template matching backend.
+
+Spatial matching costs about (image pixels) x (template pixels) operations, so a large template such as cat_face.jpg
+against cat.jpg gets expensive. In the frequency domain the correlation costs two transforms of the padded frame,
+whatever the template size, and the template's transform only has to be computed once per padded frame size:
+FFTMatcher caches it and reuses it for every frame of that size.
+
+The normalization terms (window sums of the image and of its square) come from integral images, so the results
+are those of TM_CCORR_NORMED, TM_CCOEFF_NORMED and TM_SQDIFF_NORMED within floating point tolerance.
+
+cv2.matchTemplate itself already switches to a DFT for big templates, it just recomputes the template transform on
+every call. So the FFT backend only pays off for big templates on big frames, which is what use_fft() checks.
+It works on single-channel images; match_template(backend="auto") keeps color ones on cv2.matchTemplate and keeps
+one FFTMatcher per template array (per thread), so repeated calls with the same template object reuse its transform.
+Code matching a derived template (resized, pyrDown'ed) over many frames should hold the FFTMatcher itself:
+
+    matcher = FFTMatcher(template, "TM_CCOEFF_NORMED")
+    results = matcher.match_each(frames)   # one result per frame, like cv2.matchTemplate
+'''
+
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# measured with benchmarks/bench_fft_matching.py on upscaled cat.jpg/cat_face.jpg
+FFT_MIN_IMAGE_AREA = 2000 * 1500
+FFT_MIN_TEMPLATE_FRACTION = 0.1
+
+METHODS = (cv2.TM_CCORR_NORMED, cv2.TM_CCOEFF_NORMED, cv2.TM_SQDIFF_NORMED)
+
+
+def use_fft(image_shape, template_shape):
+    """Pick the backend from the sizes: True when the FFT backend is expected to be faster."""
+    image_area = image_shape[0] * image_shape[1]
+    template_area = template_shape[0] * template_shape[1]
+    return image_area >= FFT_MIN_IMAGE_AREA and template_area >= FFT_MIN_TEMPLATE_FRACTION * image_area
+
+
+def _window_sums(table, h, w):
+    """Sum of every h x w window from an integral image."""
+    return table[h:, w:] - table[:-h, w:] - table[h:, :-w] + table[:-h, :-w]
+
+
+class FFTMatcher:
+    """Normalized cross-correlation of one grayscale template against many frames."""
+
+    def __init__(self, template, method="TM_CCOEFF_NORMED"):
+        if isinstance(method, str):
+            method = getattr(cv2, method)
+        if method not in METHODS:
+            raise ValueError("FFTMatcher supports the normalized methods only")
+        self.method = method
+
+        template = np.asarray(template, dtype=np.float64)
+        if method == cv2.TM_CCOEFF_NORMED:
+            # with a zero-mean template the window mean drops out of the numerator
+            template = template - template.mean()
+        self.template = template
+        self.shape = template.shape
+        self.template_norm2 = float((template ** 2).sum())
+
+        self._spectra = {}  # padded size -> template spectrum
+        self._buffers = {}  # padded size -> zero-padded frame buffer
+
+    def _prepare(self, frame_shape):
+        ih, iw = frame_shape
+        padded = (cv2.getOptimalDFTSize(ih), cv2.getOptimalDFTSize(iw))
+        spectrum = self._spectra.get(padded)
+        if spectrum is None:
+            th, tw = self.shape
+            buffer = np.zeros(padded, np.float32)
+            buffer[:th, :tw] = self.template
+            spectrum = self._spectra[padded] = cv2.dft(buffer, nonzeroRows=th)
+            self._buffers[padded] = np.zeros(padded, np.float32)
+        return spectrum, self._buffers[padded]
+
+    def match(self, image):
+        th, tw = self.shape
+        ih, iw = image.shape[:2]
+        if th > ih or tw > iw:
+            raise ValueError("template is larger than the image")
+        spectrum, buffer = self._prepare((ih, iw))
+
+        # the valid part of a circular correlation padded to at least the frame size never wraps around
+        buffer[:ih, :iw] = image
+        product = cv2.mulSpectrums(cv2.dft(buffer, nonzeroRows=ih), spectrum, 0, conjB=True)
+        corr = cv2.idft(product, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)[: ih - th + 1, : iw - tw + 1]
+
+        sums, sq_sums = cv2.integral2(image, sdepth=cv2.CV_64F)
+        window_sq = _window_sums(sq_sums, th, tw)
+        if self.method == cv2.TM_CCORR_NORMED:
+            result = corr / np.sqrt(np.maximum(self.template_norm2 * window_sq, 1e-12))
+        elif self.method == cv2.TM_CCOEFF_NORMED:
+            window = _window_sums(sums, th, tw)
+            variance = np.maximum(window_sq - window * window / (th * tw), 0.0)
+            denom = np.sqrt(self.template_norm2 * variance)
+            # flat windows have no defined correlation, cv2.matchTemplate reports 0 there too
+            result = np.where(denom > 1e-6, corr / np.maximum(denom, 1e-6), 0.0)
+        else:
+            denom = np.sqrt(np.maximum(self.template_norm2 * window_sq, 1e-12))
+            result = (window_sq - 2 * corr + self.template_norm2) / denom
+
+        if self.method != cv2.TM_SQDIFF_NORMED:
+            np.clip(result, -1.0, 1.0, out=result)
+        return result.astype(np.float32)
+
+    def match_each(self, frames):
+        """match() of every grayscale frame, one transform per frame; same-size frames share the template transform."""
+        return [self.match(frame) for frame in frames]
+
+
+# recently used matchers per thread (their padded buffers must not be shared), by template array and method
+_matchers = threading.local()
+MAX_CACHED_MATCHERS = 16
+
+
+def cached_matcher(template, method):
+    """
+    The FFTMatcher of a template array, reused across calls so the template spectrum is computed once per frame size.
+    Keyed by the array object, not its content: a template modified in place needs a new array (or FFTMatcher).
+    """
+    cache = getattr(_matchers, "cache", None)
+    if cache is None:
+        cache = _matchers.cache = OrderedDict()
+    key = (id(template), template.shape, method)
+    entry = cache.get(key)
+    # the entry holds on to its template, so its id cannot be reused by another array while it is cached
+    if entry is None or entry[0] is not template:
+        entry = cache[key] = (template, FFTMatcher(template, method))
+        if len(cache) > MAX_CACHED_MATCHERS:
+            cache.popitem(last=False)
+    cache.move_to_end(key)
+    return entry[1]
+
+
+def match_template(image, template, method="TM_CCOEFF_NORMED", backend="auto"):
+    """
+    cv2.matchTemplate with a choice of backend: "spatial", "fft" or "auto" (picked from the sizes). The FFT backend
+    works on single-channel images only, "auto" keeps color images on the spatial one.
+    """
+    if isinstance(method, str):
+        method = getattr(cv2, method)
+    single_channel = image.ndim == 2 and template.ndim == 2
+    if backend == "auto":
+        backend = "fft" if method in METHODS and single_channel and use_fft(image.shape, template.shape) else "spatial"
+    if backend == "fft":
+        if not single_channel:
+            raise ValueError("the FFT backend needs single-channel images, convert them to grayscale first")
+        return cached_matcher(template, method).match(image)
+    return cv2.matchTemplate(image, template, method)
@@ -0,0 +1,372 @@
+'''
+Many capture sources - cameras, RTSP/HTTP streams, video files - ingested concurrently with asyncio.
+
+face_detection.py, color_detection_and_tracking.py, create_dataset.py and own_cascade_detection.py each open
+cv2.VideoCapture(0) and run one blocking while True loop, ignoring the success flag of cap.read(). Ingest runs
+one reader and one dispatcher coroutine per source on a single event loop:
+
+    reader (blocking reads on a read thread) -> per-source frame queue -> dispatcher -> shared detector executor
+
+- rate limit: a source delivers at most max_fps frames per second. A live source keeps grabbing every frame (so
+  the driver's buffer never goes stale) but only decodes the ones it delivers; a file is paced by sleeping, which
+  turns it into a stand-in stream
+- backpressure: every source has a small queue and at most one frame in detection at a time. When the detector
+  falls behind, a live source drops its oldest queued frame, a file source waits
+- detection: the frames of all sources share one executor - a thread pool running a detector callable, or a
+  DetectionService (object_detection.service) when the detector is one of its names, batching across sources
+- recovery: a failed read (success == False or an exception) is retried; after max_failures in a row the capture
+  is released and reopened with exponential backoff, up to max_reconnects times. A file that ends starts over
+  with loop=True, and finishes its source otherwise
+
+    ingest = Ingest([Source("cam1", "rtsp://..."), Source("door", "door.mp4", max_fps=5, loop=True)],
+                    face_detector(), on_result=lambda name, frame: print(name, frame.detections))
+    report = ingest.run(duration=60)
+
+    python -m object_detection.ingest video1.mp4 video2.mp4 rtsp://host/stream --fps 10 --duration 30
+'''
+
+import argparse
+import asyncio
+import inspect
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from object_detection.pipeline import Frame, LatencyStats, face_detector
+from object_detection.profiling import default_profiler as profiler
+from object_detection.service import DetectionService
+
+
+def _is_live(target):
+    # a camera index or a stream URL produces frames whether we read them or not, a file waits for us
+    return not (isinstance(target, str) and os.path.isfile(target))
+
+
+class Source:
+    """
+    name                - label of the frames in results and reports
+    target              - anything cv2.VideoCapture accepts (camera index, file, URL) or a callable returning an
+                          opened capture-like object (read/grab/retrieve/isOpened/release)
+    max_fps             - most frames delivered per second, None for every frame
+    queue_size          - frames waiting for detection
+    live                - drop stale frames instead of waiting; default: everything but a local file
+    loop                - a file starts over when it ends
+    max_failures        - failed reads in a row before the capture is reopened
+    reconnect_delay     - first wait before reopening, doubled on every failed attempt up to max_reconnect_delay
+    max_reconnect_delay
+    max_reconnects      - reopen attempts in a row before the source gives up, None for never
+    max_frames          - stop after this many delivered frames
+    """
+
+    def __init__(self, name, target, max_fps=None, queue_size=2, live=None, loop=False, max_failures=3,
+                 reconnect_delay=0.5, max_reconnect_delay=30.0, max_reconnects=None, max_frames=None):
+        self.name = name
+        self.target = int(target) if isinstance(target, str) and target.isdigit() else target
+        self.max_fps = max_fps
+        self.queue_size = queue_size
+        self.live = _is_live(self.target) if live is None else live
+        self.loop = loop
+        self.max_failures = max_failures
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_reconnects = max_reconnects
+        self.max_frames = max_frames
+
+        self.delivered = 0
+        self.skipped = 0  # grabbed but not decoded, above max_fps
+        self.dropped = 0  # stale frames dropped from the queue
+        self.failed_reads = 0
+        self.reconnects = 0
+        self.failed_opens = 0
+        self.restarts = 0  # files started over
+        self.processed = 0
+        self.errors = 0
+        self.state = "idle"
+        self.stages = {name: LatencyStats() for name in ("read", "queue", "detect", "end_to_end")}
+
+    def open(self):
+        cap = self.target() if callable(self.target) else cv2.VideoCapture(self.target)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        return cap
+
+    def report(self):
+        return {
+            "state": self.state,
+            "delivered": self.delivered,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "failed_reads": self.failed_reads,
+            "reconnects": self.reconnects,
+            "failed_opens": self.failed_opens,
+            "restarts": self.restarts,
+            "errors": self.errors,
+            "stages": {name: stats.summary() for name, stats in self.stages.items()},
+        }
+
+
+def _read(cap, decode):
+    """One frame: grab, and decode it only when it is delivered. (success, image or None)."""
+    if not cap.grab():
+        return False, None
+    if not decode:
+        return True, None
+    return cap.retrieve()
+
+
+class Ingest:
+    """
+    sources   - Source objects (or targets, named by their position)
+    detector  - callable image -> detections, run on a shared thread pool; or a detector name of
+                object_detection.detectors, run by a DetectionService shared by all sources
+    on_result - called with (source name, Frame) for every detected frame; may be a coroutine function
+    workers   - detector threads (default: number of CPUs)
+    params    - parameters of a named detector
+    """
+
+    def __init__(self, sources, detector=None, on_result=None, workers=None, params=None):
+        self.sources = [s if isinstance(s, Source) else Source(str(i), s) for i, s in enumerate(sources)]
+        names = [s.name for s in self.sources]
+        if len(set(names)) != len(names):
+            raise ValueError("source names must be unique: {}".format(", ".join(names)))
+        self.detector = detector if detector is not None else face_detector()
+        self.on_result = on_result
+        self.workers = workers or os.cpu_count() or 1
+        self.params = params or {}
+        self.service = None
+        self.started = None
+        self.finished = None
+        self._stop = None
+
+    def stop(self):
+        """Ask run() to finish; safe to call from the on_result callback."""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def _sleep(self, seconds):
+        """Sleeps, returns True when stop() was called meanwhile."""
+        try:
+            await asyncio.wait_for(self._stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _open(self, source, reads, delay=0.0):
+        """
+        Opens the capture after waiting delay seconds, retrying with exponential backoff.
+        (capture, next delay), capture None when the source gives up or run() stops.
+        """
+        loop = asyncio.get_running_loop()
+        attempts = 0
+        while not self._stop.is_set():
+            if delay and await self._sleep(delay):
+                break
+            source.state = "connecting"
+            try:
+                cap = await loop.run_in_executor(reads, source.open)
+            except Exception:
+                cap = None
+            delay = min(max(delay * 2, source.reconnect_delay), source.max_reconnect_delay)
+            if cap is not None:
+                source.state = "running"
+                return cap, delay
+            attempts += 1
+            source.failed_opens += 1
+            profiler.inc("failed_opens", "ingest")
+            if source.max_reconnects is not None and attempts > source.max_reconnects:
+                source.state = "failed"
+                return None, delay
+        source.state = "stopped"
+        return None, delay
+
+    async def _put(self, source, queue, frame):
+        if not source.live:
+            await queue.put(frame)
+            return
+        if queue.full():
+            # only this reader puts, so after taking the stalest frame out there is room for the new one
+            queue.get_nowait()
+            source.dropped += 1
+            profiler.inc("dropped_frames", "ingest")
+        queue.put_nowait(frame)
+
+    async def _reader(self, source, queue, reads):
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / source.max_fps if source.max_fps else 0.0
+        due = time.perf_counter()
+        failures = 0
+        since_open = 0
+        delay = 0.0
+        cap, _ = await self._open(source, reads)
+        try:
+            while cap is not None and not self._stop.is_set():
+                if source.max_frames is not None and source.delivered >= source.max_frames:
+                    source.state = "done"
+                    break
+                if not source.live and due > time.perf_counter() and await self._sleep(due - time.perf_counter()):
+                    break
+
+                decode = time.perf_counter() >= due
+                t0 = time.perf_counter()
+                try:
+                    success, image = await loop.run_in_executor(reads, _read, cap, decode)
+                except Exception:
+                    success, image = False, None
+                t1 = time.perf_counter()
+
+                if not success or (decode and image is None):
+                    if not source.live:
+                        # the end of a file; one that has no frame at all is not started over
+                        if not source.loop or since_open == 0:
+                            source.state = "done"
+                            break
+                        source.restarts += 1
+                        await loop.run_in_executor(reads, cap.release)
+                        cap, _ = await self._open(source, reads)
+                        since_open = 0
+                        continue
+                    source.failed_reads += 1
+                    profiler.inc("failed_reads", "ingest")
+                    failures += 1
+                    if failures >= source.max_failures:
+                        source.reconnects += 1
+                        profiler.inc("reconnects", "ingest")
+                        await loop.run_in_executor(reads, cap.release)
+                        # the backoff goes on until a read succeeds: a stream that opens but never delivers is
+                        # not reopened in a tight loop
+                        cap, delay = await self._open(source, reads, delay)
+                        since_open = 0
+                        failures = 0
+                    continue
+                failures = 0
+                since_open += 1
+                delay = 0.0
+                if not decode:
+                    source.skipped += 1
+                    continue
+
+                source.stages["read"].add(t1 - t0)
+                # the next slot; after a stall, deliver from now on instead of catching up with a burst
+                due = max(due + interval, t1) if interval else t1
+                await self._put(source, queue, Frame(source.delivered, image, t1))
+                source.delivered += 1
+                profiler.inc("frames", "ingest")
+        finally:
+            if cap is not None:
+                await loop.run_in_executor(reads, cap.release)
+            if source.state in ("running", "connecting"):
+                source.state = "stopped"
+            await queue.put(None)
+
+    async def _detect(self, frame, detectors):
+        if isinstance(self.detector, str):
+            return await asyncio.wrap_future(self.service.submit(self.detector, frame.image, self.params))
+        return await asyncio.get_running_loop().run_in_executor(detectors, self.detector, frame.image)
+
+    async def _dispatcher(self, source, queue, detectors):
+        while True:
+            frame = await queue.get()
+            if frame is None:
+                return
+            if self._stop.is_set():
+                # the frames still queued at the end are not detected
+                continue
+            frame.t_dequeue = time.perf_counter()
+            source.stages["queue"].add(frame.t_dequeue - frame.t_capture)
+            try:
+                frame.detections = await self._detect(frame, detectors)
+            except Exception:
+                source.errors += 1
+                profiler.inc("detector_errors", "ingest")
+                continue
+            frame.t_detected = time.perf_counter()
+            source.stages["detect"].add(frame.t_detected - frame.t_dequeue)
+            source.stages["end_to_end"].add(frame.t_detected - frame.t_capture)
+            source.processed += 1
+            if self.on_result is not None:
+                result = self.on_result(source.name, frame)
+                if inspect.isawaitable(result):
+                    await result
+
+    async def run_async(self, duration=None):
+        """Ingests until every source is done, failed or duration seconds have passed. Returns report()."""
+        self._stop = asyncio.Event()
+        self.started = time.perf_counter()
+        reads = ThreadPoolExecutor(len(self.sources), thread_name_prefix="ingest-read")
+        detectors = None
+        if isinstance(self.detector, str):
+            self.service = DetectionService(self.workers)
+        else:
+            detectors = ThreadPoolExecutor(self.workers, thread_name_prefix="ingest-detect",
+                                           initializer=cv2.setNumThreads, initargs=(1,))
+        timer = asyncio.get_running_loop().call_later(duration, self.stop) if duration else None
+        try:
+            tasks = []
+            for source in self.sources:
+                queue = asyncio.Queue(source.queue_size)
+                tasks.append(asyncio.create_task(self._reader(source, queue, reads)))
+                tasks.append(asyncio.create_task(self._dispatcher(source, queue, detectors)))
+            await asyncio.gather(*tasks)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self._stop.set()
+            reads.shutdown()
+            if detectors is not None:
+                detectors.shutdown()
+            if self.service is not None:
+                self.service.close()
+                self.service = None
+            self.finished = time.perf_counter()
+        return self.report()
+
+    def run(self, duration=None):
+        return asyncio.run(self.run_async(duration))
+
+    def report(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        elapsed = end - self.started if self.started is not None else 0.0
+        processed = sum(s.processed for s in self.sources)
+        return {
+            "seconds": elapsed,
+            "processed": processed,
+            "fps": processed / elapsed if elapsed else 0.0,
+            "sources": {s.name: s.report() for s in self.sources},
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detection on many cameras, streams and video files at once")
+    parser.add_argument("sources", nargs="+", help="camera indices, video files or stream URLs")
+    parser.add_argument("--detector", default="faces",
+                        help="detector name of the detection service, or cascade:<name or XML> for a bare cascade")
+    parser.add_argument("--fps", type=float, default=None, help="most frames per second and source")
+    parser.add_argument("--queue-size", type=int, default=2)
+    parser.add_argument("--loop", action="store_true", help="start video files over when they end")
+    parser.add_argument("--duration", type=float, default=None, help="seconds, default: until all sources end")
+    parser.add_argument("--max-reconnects", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    detector = args.detector
+    if detector.startswith("cascade:"):
+        detector = face_detector(detector.split(":", 1)[1])
+    sources = [Source("{}:{}".format(i, os.path.basename(str(target)) or target), target, args.fps, args.queue_size,
+                      loop=args.loop, max_reconnects=args.max_reconnects) for i, target in enumerate(args.sources)]
+    report = Ingest(sources, detector, workers=args.workers).run(args.duration)
+
+    print("{processed} frames in {seconds:.1f}s, {fps:.1f} FPS".format(**report))
+    print("{:<24} {:>9} {:>9} {:>8} {:>8} {:>8} {:>10} {:>10}".format(
+        "source", "state", "processed", "skipped", "dropped", "failed", "reconnects", "p95 ms"))
+    for name, r in report["sources"].items():
+        p95 = r["stages"]["end_to_end"].get("p95_ms", 0.0)
+        print("{:<24} {:>9} {:>9} {:>8} {:>8} {:>8} {:>10} {:>10.1f}".format(
+            name, r["state"], r["processed"], r["skipped"], r["dropped"], r["failed_reads"], r["reconnects"], p95))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+'''
+Multi-color, multi-object tracker with persistent IDs (see 4_color_detection_and_tracking).
+
+The tutorial tracks one hard-coded HSV range and keeps only the largest contour, so every other object is lost.
+MultiColorTracker takes a list of named HSV ranges and, per frame:
+
+1) blurs and converts the frame to HSV once, shared by all colors (preallocated buffers, as in ColorTracker)
+2) builds one mask per color and keeps every contour above min_area
+3) links the detections to the existing tracks of the same color by centroid distance or IoU, with the Hungarian
+   algorithm when scipy is installed and a greedy assignment otherwise
+4) gives each new object a new ID; a track that is not seen for max_missed frames is closed
+
+    tracker = MultiColorTracker(frame.shape, [("blue", (84, 98, 0), (179, 255, 255)),
+                                              ("yellow", (20, 100, 100), (35, 255, 255))])
+    for obj in tracker.process(frame):
+        print(obj.id, obj.color, obj.center)
+    tracker.counts  # objects seen per color so far
+'''
+
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+from object_detection.nms import box_overlap
+
+# one tracked object in the current frame; bbox is (x, y, w, h), rect is cv2.minAreaRect
+TrackedObject = namedtuple("TrackedObject", "id color center bbox rect area")
+
+
+class _Track:
+    __slots__ = ("id", "color", "center", "bbox", "missed", "hits", "history", "head", "count")
+
+    def __init__(self, track_id, color, center, bbox, history):
+        self.id = track_id
+        self.color = color
+        self.center = center
+        self.bbox = bbox
+        self.missed = 0
+        self.hits = 0
+        self.history = np.zeros((history, 2), np.float32)
+        self.head = 0
+        self.count = 0
+        self.add(center, bbox)
+
+    def add(self, center, bbox):
+        self.center = center
+        self.bbox = bbox
+        self.missed = 0
+        self.hits += 1
+        self.history[self.head] = center
+        self.head = (self.head + 1) % len(self.history)
+        self.count = min(self.count + 1, len(self.history))
+
+    def trail(self):
+        """Stored centers, newest first."""
+        order = (self.head - 1 - np.arange(self.count)) % len(self.history)
+        return self.history[order]
+
+
+def assign(cost, max_cost):
+    """Pairs (row, col) with cost <= max_cost, each row and column used at most once."""
+    if cost.size == 0:
+        return []
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(cost)
+        return [(r, c) for r, c in zip(rows, cols) if cost[r, c] <= max_cost]
+
+    # greedy: cheapest pairs first
+    pairs = []
+    used_rows, used_cols = set(), set()
+    for flat in np.argsort(cost, axis=None):
+        r, c = divmod(int(flat), cost.shape[1])
+        if cost[r, c] > max_cost:
+            break
+        if r not in used_rows and c not in used_cols:
+            pairs.append((r, c))
+            used_rows.add(r)
+            used_cols.add(c)
+    return pairs
+
+
+class MultiColorTracker:
+    """
+    frame_shape  - (height, width) of the frames; other sizes raise ValueError
+    colors       - list of (name, hsv_lower, hsv_upper)
+    min_area     - contours smaller than this (in full resolution pixels) are ignored
+    metric       - "centroid" (distance in pixels, gated by max_distance) or "iou" (gated by min_iou)
+    max_missed   - frames a track survives without a detection
+    mask_scale   - masks are built at this fraction of the frame size
+    """
+
+    def __init__(self, frame_shape, colors, min_area=100, metric="centroid", max_distance=80, min_iou=0.1,
+                 max_missed=5, blur_ksize=11, morph_iterations=2, mask_scale=1.0, history=32):
+        h, w = frame_shape[:2]
+        self.frame_size = (w, h)
+        self.mask_scale = mask_scale
+        mw, mh = max(1, int(round(w * mask_scale))), max(1, int(round(h * mask_scale)))
+        self.mask_size = (mw, mh)
+        k = max(1, int(round(blur_ksize * mask_scale)))
+        self.blur_ksize = (k | 1, k | 1)
+        self.morph_iterations = morph_iterations
+
+        self.colors = [(name, np.array(lower, np.uint8), np.array(upper, np.uint8)) for name, lower, upper in colors]
+        self.min_area = min_area
+        self.metric = metric
+        self.max_distance = max_distance
+        self.min_iou = min_iou
+        self.max_missed = max_missed
+        self.history = history
+
+        # shared buffers, plus one mask per color
+        self.small = np.empty((mh, mw, 3), np.uint8) if mask_scale != 1.0 else None
+        self.blurred = np.empty((mh, mw, 3), np.uint8)
+        self.hsv = np.empty((mh, mw, 3), np.uint8)
+        self.masks = {name: np.empty((mh, mw), np.uint8) for name, _, _ in self.colors}
+        self.eroded = np.empty((mh, mw), np.uint8)
+
+        self.tracks = {}  # id -> _Track, open tracks only
+        self.next_id = 1
+        self.counts = {name: 0 for name, _, _ in self.colors}
+
+    def _hsv(self, frame):
+        if frame.shape[1::-1] != self.frame_size:
+            # OpenCV would silently allocate new outputs instead of filling the buffers read by the next steps
+            raise ValueError("frame is {}x{}, the tracker was built for {}x{}".format(
+                frame.shape[1], frame.shape[0], *self.frame_size))
+        src = frame
+        if self.small is not None:
+            cv2.resize(frame, self.mask_size, dst=self.small, interpolation=cv2.INTER_AREA)
+            src = self.small
+        cv2.GaussianBlur(src, self.blur_ksize, 0, dst=self.blurred)
+        return cv2.cvtColor(self.blurred, cv2.COLOR_BGR2HSV, dst=self.hsv)
+
+    def detect(self, frame):
+        """All objects above min_area, per color: {name: list of (center, bbox, rect, area)}."""
+        hsv = self._hsv(frame)
+        s = 1.0 / self.mask_scale
+        min_area = self.min_area * self.mask_scale * self.mask_scale
+        detections = {}
+        for name, lower, upper in self.colors:
+            mask = self.masks[name]
+            cv2.inRange(hsv, lower, upper, dst=mask)
+            cv2.erode(mask, None, dst=self.eroded, iterations=self.morph_iterations)
+            cv2.dilate(self.eroded, None, dst=mask, iterations=self.morph_iterations)
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+            found = []
+            for c in contours:
+                m = cv2.moments(c)
+                if m["m00"] < min_area:
+                    continue
+                center = (m["m10"] / m["m00"] * s, m["m01"] / m["m00"] * s)
+                x, y, bw, bh = cv2.boundingRect(c)
+                (rx, ry), (rw, rh), angle = cv2.minAreaRect(c)
+                found.append((center, (x * s, y * s, bw * s, bh * s), ((rx * s, ry * s), (rw * s, rh * s), angle),
+                              m["m00"] * s * s))
+            detections[name] = found
+        return detections
+
+    def _cost(self, tracks, found):
+        if self.metric == "iou":
+            overlap = box_overlap([t.bbox for t in tracks], [d[1] for d in found])
+            return 1.0 - overlap, 1.0 - self.min_iou
+        a = np.array([t.center for t in tracks], np.float64).reshape(-1, 2)
+        b = np.array([d[0] for d in found], np.float64).reshape(-1, 2)
+        return np.linalg.norm(a[:, None, :] - b[None, :, :], axis=2), self.max_distance
+
+    def process(self, frame):
+        """Detect and link. Returns a TrackedObject for every object seen in this frame."""
+        detections = self.detect(frame)
+        output = []
+        for name, found in detections.items():
+            tracks = [t for t in self.tracks.values() if t.color == name]
+            cost, max_cost = self._cost(tracks, found)
+            pairs = assign(cost, max_cost)
+
+            matched_tracks = set()
+            matched_found = set()
+            for r, c in pairs:
+                center, bbox, rect, area = found[c]
+                tracks[r].add(center, bbox)
+                matched_tracks.add(r)
+                matched_found.add(c)
+                output.append(TrackedObject(tracks[r].id, name, center, bbox, rect, area))
+
+            for r, track in enumerate(tracks):
+                if r not in matched_tracks:
+                    track.missed += 1
+                    if track.missed > self.max_missed:
+                        del self.tracks[track.id]
+
+            for c, (center, bbox, rect, area) in enumerate(found):
+                if c in matched_found:
+                    continue
+                track = _Track(self.next_id, name, center, bbox, self.history)
+                self.tracks[track.id] = track
+                self.counts[name] += 1
+                self.next_id += 1
+                output.append(TrackedObject(track.id, name, center, bbox, rect, area))
+        return output
+
+    def trail(self, track_id):
+        return self.tracks[track_id].trail()
@@ -0,0 +1,263 @@
+'''
+Several cascades and the HOG people detector on the same frames, from one shared image pyramid.
+
+Every detectMultiScale call builds its own pyramid: running the face, cat and custom cascades and HOG on a frame
+resizes it four times over, level by level. MultiDetector builds the grayscale pyramid once per frame and runs every
+model on the levels it needs:
+
+- a cascade runs on one level at a time with minSize = maxSize = its window, so OpenCV evaluates that level only;
+  the raw hits of all levels are mapped back to full resolution and grouped with cv2.groupRectangles, like
+  detectMultiScale does. The pyramid is resized the same way (INTER_LINEAR_EXACT), so on the levels downscaled less
+  than 2x the raw hits are exactly detectMultiScale's. Below that OpenCV slides the window by 1 pixel instead of 2,
+  which is emulated with the 4 shifted origins; it also skips the window after a first-stage reject, which depends
+  on the scan order, so a few borderline hits differ there (face: 17 detections on barcelona.jpg either way).
+  coarse_step=2 keeps the 2-pixel step on all levels: about half the cascade time, a few less raw hits
+- HOG runs hog.detect on each level and its hits are grouped the same way (weights: best SVM score of the group)
+- levels that are smaller than a model's window, or outside its min_size/max_size, are skipped for that model
+- the (model, level) pairs run on a thread pool, largest levels first, and the results come back labeled
+
+All models share the pyramid's scale factor (default 1.1), so a cascade tuned with a finer step, like the cat
+script's 1.045, sees fewer scales than it would alone.
+
+The Python API cannot hand a cascade a precomputed integral image: every call still integrates its level, and
+the window evaluations dominate (the pyramid is ~25 ms of a ~2 s face search on barcelona.jpg). What the shared
+pyramid buys is the resizing done once, one pool spreading all (model, level) pairs over the cores, per-model
+level selection and coarse_step.
+
+    detector = MultiDetector(["face", "cat", "custom", "pedestrians"])
+    results = detector.detect(frame)              # {"face": (boxes, weights), ...}
+    boxes, weights, labels = merge(results)
+'''
+
+import argparse
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from object_detection.batch import iter_frames
+from object_detection.nms import group_scores
+from object_detection.profiling import default_profiler as profiler
+from object_detection.registry import get_cascade
+
+HOG_NAMES = ("pedestrians", "hog")
+
+
+def build_pyramid(gray, scale_factor=1.1, min_size=(24, 24)):
+    """[(factor, level)] with level = gray downscaled by factor, until a level is smaller than min_size (w, h)."""
+    h, w = gray.shape[:2]
+    levels = []
+    factor = 1.0
+    while True:
+        size = (int(round(w / factor)), int(round(h / factor)))
+        if size[0] < min_size[0] or size[1] < min_size[1]:
+            return levels
+        levels.append((factor, gray if factor == 1.0 else cv2.resize(gray, size, interpolation=cv2.INTER_LINEAR_EXACT)))
+        factor *= scale_factor
+
+
+def _group(raw, scores, group_threshold, eps):
+    """detectMultiScale's grouping of the raw (N, 4) hits; weights = hits per group, or the best score of a group."""
+    if len(raw) == 0:
+        return np.empty((0, 4), np.int32), np.empty(0)
+    boxes, counts = cv2.groupRectangles(raw.tolist(), group_threshold, eps)
+    boxes = np.asarray(boxes, np.int32).reshape(-1, 4)
+    if scores is None or len(boxes) == 0:
+        return boxes, np.asarray(counts, np.float64).ravel()
+    return boxes, group_scores(raw, scores, boxes)
+
+
+class CascadeModel:
+    """
+    name          - label of the detections
+    cascade       - registered cascade name or XML path (every thread loads its own through the registry)
+    min_neighbors - hits needed to keep a group, detectMultiScale's minNeighbors
+    min_size      - smallest / largest object (w, h) in full resolution pixels searched for
+    max_size
+    coarse_step   - window step on the levels downscaled 2x or more: 1 like detectMultiScale, or 2 (faster)
+    """
+
+    def __init__(self, name, cascade=None, min_neighbors=3, min_size=None, max_size=None, coarse_step=1, eps=0.2):
+        self.name = name
+        self.cascade = cascade or name
+        self.window = tuple(get_cascade(self.cascade).getOriginalWindowSize())
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.max_size = max_size
+        self.coarse_step = coarse_step
+        self.eps = eps
+
+    def detect_level(self, level, factor):
+        """Raw hits (N, 4) of the window on one pyramid level, in level coordinates, and no scores."""
+        cascade = get_cascade(self.cascade)
+        # detectMultiScale slides the window by 1 pixel on the levels downscaled 2x or more, but by 2 on a single level
+        shifts = ((0, 0),) if factor < 2.0 or self.coarse_step == 2 else ((0, 0), (1, 0), (0, 1), (1, 1))
+        found = []
+        for dx, dy in shifts:
+            rects = cascade.detectMultiScale(level[dy:, dx:], scaleFactor=1.1, minNeighbors=0, minSize=self.window,
+                                             maxSize=self.window)
+            found.append(np.asarray(rects, np.float64).reshape(-1, 4) + (dx, dy, 0, 0))
+        return np.concatenate(found), None
+
+    def group(self, raw, scores):
+        return _group(raw, None, self.min_neighbors, self.eps)
+
+
+class HOGModel:
+    """
+    The default people detector of 11_pedestrian_detection, on the shared grayscale levels.
+    hit_threshold, win_stride and padding go to hog.detect; group_threshold is detectMultiScale's finalThreshold.
+    """
+
+    window = (64, 128)
+
+    def __init__(self, name="pedestrians", hit_threshold=0.0, win_stride=(8, 8), padding=(8, 8), group_threshold=2,
+                 min_size=None, max_size=None, eps=0.2):
+        self.name = name
+        self.hit_threshold = hit_threshold
+        self.win_stride = win_stride
+        self.padding = padding
+        self.group_threshold = group_threshold
+        self.min_size = min_size
+        self.max_size = max_size
+        self.eps = eps
+        self._local = threading.local()
+
+    def _hog(self):
+        hog = getattr(self._local, "hog", None)
+        if hog is None:
+            hog = self._local.hog = cv2.HOGDescriptor()
+            hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+        return hog
+
+    def detect_level(self, level, factor):
+        points, weights = self._hog().detect(level, hitThreshold=self.hit_threshold, winStride=self.win_stride,
+                                             padding=self.padding)
+        points = np.asarray(points, np.float64).reshape(-1, 2)
+        rects = np.column_stack((points, np.tile(self.window, (len(points), 1)))).reshape(-1, 4)
+        return rects, np.asarray(weights, np.float64).ravel()
+
+    def group(self, raw, scores):
+        return _group(raw, scores, self.group_threshold, self.eps)
+
+
+def create_model(spec):
+    """A model from a name: "pedestrians"/"hog" for HOG, a registered cascade name or an XML path otherwise."""
+    if not isinstance(spec, str):
+        return spec
+    if spec in HOG_NAMES:
+        return HOGModel(spec)
+    return CascadeModel(spec)
+
+
+def _searched(model, factor):
+    """Whether the model looks for objects of its window size times factor."""
+    w, h = model.window[0] * factor, model.window[1] * factor
+    if model.min_size is not None and (w < model.min_size[0] or h < model.min_size[1]):
+        return False
+    return model.max_size is None or (w <= model.max_size[0] and h <= model.max_size[1])
+
+
+class MultiDetector:
+    """
+    models       - CascadeModel / HOGModel objects or names for create_model
+    scale_factor - step between the pyramid levels, shared by all models
+    workers      - threads running the (model, level) pairs; 0 runs them in the calling thread
+    """
+
+    def __init__(self, models, scale_factor=1.1, workers=None):
+        self.models = [create_model(m) for m in models]
+        names = [m.name for m in self.models]
+        if len(set(names)) != len(names):
+            raise ValueError("model names must be unique: {}".format(", ".join(names)))
+        self.scale_factor = scale_factor
+        self.min_window = (min(m.window[0] for m in self.models), min(m.window[1] for m in self.models))
+        self.pool = None
+        if workers != 0:
+            self.pool = ThreadPoolExecutor(workers, thread_name_prefix="multi_detect", initializer=cv2.setNumThreads,
+                                           initargs=(1,))
+
+    def _run(self, task):
+        model, factor, level = task
+        with profiler.stage("multi_detect", model.name):
+            rects, scores = model.detect_level(level, factor)
+        return rects * factor, scores
+
+    def detect(self, image):
+        """{model name: ((N, 4) int32 boxes at full resolution, (N,) weights)} of one frame."""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        with profiler.stage("multi_detect", "pyramid"):
+            levels = build_pyramid(gray, self.scale_factor, self.min_window)
+
+        # largest levels first, so the longest tasks start first
+        tasks = [(model, factor, level) for factor, level in levels for model in self.models
+                 if level.shape[1] >= model.window[0] and level.shape[0] >= model.window[1]
+                 and _searched(model, factor)]
+        results = self.pool.map(self._run, tasks) if self.pool else map(self._run, tasks)
+
+        raw = {model.name: ([], []) for model in self.models}
+        for (model, _, _), (rects, scores) in zip(tasks, results):
+            raw[model.name][0].append(rects)
+            if scores is not None:
+                raw[model.name][1].append(scores)
+
+        detections = {}
+        with profiler.stage("multi_detect", "group"):
+            for model in self.models:
+                rects, scores = raw[model.name]
+                rects = np.round(np.concatenate(rects)).astype(np.int32) if rects else np.empty((0, 4), np.int32)
+                detections[model.name] = model.group(rects, np.concatenate(scores) if scores else None)
+        profiler.inc("frames", "multi_detect")
+        profiler.observe("detections_per_frame", "multi_detect", sum(len(b) for b, _ in detections.values()))
+        return detections
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def merge(detections):
+    """(boxes (N, 4), weights (N,), labels (N,)) of all models, in model order."""
+    if not detections:
+        return np.empty((0, 4), np.int32), np.empty(0), np.empty(0, object)
+    boxes = np.concatenate([b for b, _ in detections.values()])
+    weights = np.concatenate([w for _, w in detections.values()])
+    labels = np.concatenate([np.full(len(b), name, object) for name, (b, _) in detections.items()])
+    return boxes, weights, labels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Several cascades and HOG from one image pyramid, as JSON lines")
+    parser.add_argument("source", help="image, directory, manifest of images or a video file")
+    parser.add_argument("-o", "--output", required=True, help="JSON lines file")
+    parser.add_argument("--models", nargs="+", default=["face", "cat", "custom", "pedestrians"],
+                        help="registered cascade names, XML paths, or pedestrians for HOG")
+    parser.add_argument("--scale-factor", type=float, default=1.1)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    count = 0
+    with MultiDetector(args.models, args.scale_factor, args.workers) as detector, open(args.output, "w") as f:
+        for name, image in iter_frames(args.source):
+            if isinstance(image, str):
+                image = cv2.imread(image)
+                if image is None:
+                    continue
+            boxes, weights, labels = merge(detector.detect(image))
+            detections = [{"label": label, "box": box, "weight": weight}
+                          for label, box, weight in zip(labels, boxes.tolist(), weights.tolist())]
+            f.write(json.dumps({"source": name, "detections": detections}) + "\n")
+            count += 1
+    print("{} frames written to {}".format(count, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+'''
+Non-maximum suppression and detection post-processing shared by the detectors.
+
+pedestrian_detection.py draws every rect of hog.detectMultiScale and ignores the weights, so overlapping and nested
+duplicates of the same person reach the output; the cascades only have minNeighbors grouping. Everything here works
+on any (rects, weights) output - (N, 4) (x, y, w, h) boxes and (N,) scores:
+
+- nms: greedy NMS, one vectorized overlap row per kept box (never the N x N matrix). metric="iou" is the usual
+  intersection over union, metric="min" is intersection over the smaller box, which also removes a box nested inside
+  a larger one (the typical HOG duplicate, whose IoU stays low)
+- soft_nms: Gaussian or linear score decay instead of removal
+- batched_nms: independent NMS per class (or per image) in a single call; every round keeps the best box of every
+  group at once, so a batch of images costs as many rounds as the busiest image needs
+- top_k_per_class: the best k of every class, vectorized
+- group_scores: the best score of the raw hits behind every box of a grouping such as cv2.groupRectangles
+- postprocess / postprocess_batch: weight threshold, NMS, per-class top-K in one call, for one image or many
+
+    boxes, scores, labels = postprocess(rects, weights, score_threshold=0.3, iou_threshold=0.5, metric="min")
+'''
+
+import numpy as np
+
+METRICS = ("iou", "min")
+
+
+def _as_boxes(boxes):
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def box_overlap(a, b, metric="iou"):
+    """(len(a), len(b)) overlaps of two sets of (x, y, w, h) boxes: IoU, or intersection over the smaller box."""
+    a, b = _as_boxes(a)[:, None], _as_boxes(b)[None]
+    w = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    h = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    inter = np.clip(w, 0, None) * np.clip(h, 0, None)
+    area_a, area_b = a[..., 2] * a[..., 3], b[..., 2] * b[..., 3]
+    if metric == "min":
+        return inter / np.maximum(np.minimum(area_a, area_b), 1e-9)
+    if metric != "iou":
+        raise ValueError("metric must be one of {}".format(", ".join(METRICS)))
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def group_scores(hits, scores, boxes):
+    """
+    Best score of the hits behind every group box: a hit belongs to the box it overlaps most. Hits overlapping no box
+    (the outliers cv2.groupRectangles rejected) are left out; a box without hits scores -inf.
+    """
+    best = np.full(len(boxes), -np.inf)
+    if len(hits) and len(boxes):
+        overlap = box_overlap(hits, boxes)
+        inside = overlap.max(axis=1) > 0
+        np.maximum.at(best, np.argmax(overlap[inside], axis=1), np.asarray(scores, np.float64).ravel()[inside])
+    return best
+
+
+def _row(boxes, areas, i, rest, metric):
+    """Overlap of box i with the boxes rest, from the precomputed corners and areas."""
+    x1, y1, x2, y2 = boxes
+    w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+    h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+    inter = w * h
+    if metric == "min":
+        return inter / np.maximum(np.minimum(areas[i], areas[rest]), 1e-9)
+    return inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+
+
+def _corners(boxes):
+    boxes = _as_boxes(boxes)
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    return (x1, y1, x1 + boxes[:, 2], y1 + boxes[:, 3]), boxes[:, 2] * boxes[:, 3]
+
+
+def nms(boxes, scores, iou_threshold=0.3, metric="iou", max_output=None):
+    """
+    Greedy non-maximum suppression. Returns the indices of the kept boxes, best first; a box is removed when it
+    overlaps a kept one by more than iou_threshold. Equal scores keep their input order.
+    """
+    if metric not in METRICS:
+        raise ValueError("metric must be one of {}".format(", ".join(METRICS)))
+    corners, areas = _corners(boxes)
+    order = np.argsort(-np.asarray(scores, dtype=np.float64).ravel(), kind="stable")
+
+    keep = []
+    while len(order) and (max_output is None or len(keep) < max_output):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        order = rest[_row(corners, areas, i, rest, metric) <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def soft_nms(boxes, scores, sigma=0.5, iou_threshold=0.3, score_threshold=0.001, method="gaussian", metric="iou"):
+    """
+    Soft-NMS: instead of removing the boxes overlapping a kept one, their scores decay - by exp(-overlap^2 / sigma)
+    ("gaussian") or by (1 - overlap) above iou_threshold ("linear"). Boxes whose score falls below score_threshold
+    are dropped. Returns (indices in selection order, decayed scores).
+    """
+    if method not in ("gaussian", "linear"):
+        raise ValueError("method must be gaussian or linear")
+    corners, areas = _corners(boxes)
+    current = np.asarray(scores, dtype=np.float64).ravel().copy()
+    remaining = np.flatnonzero(current >= score_threshold)
+
+    keep, kept_scores = [], []
+    while len(remaining):
+        best = np.argmax(current[remaining])
+        i = remaining[best]
+        keep.append(i)
+        kept_scores.append(current[i])
+        remaining = np.delete(remaining, best)
+        overlap = _row(corners, areas, i, remaining, metric)
+        if method == "gaussian":
+            current[remaining] *= np.exp(-overlap * overlap / sigma)
+        else:
+            current[remaining] *= np.where(overlap > iou_threshold, 1.0 - overlap, 1.0)
+        remaining = remaining[current[remaining] >= score_threshold]
+    return np.array(keep, dtype=np.int64), np.array(kept_scores, dtype=np.float64)
+
+
+def _offset_boxes(boxes, groups):
+    """Boxes moved so that every group has its own, non-overlapping part of the plane."""
+    boxes = _as_boxes(boxes).copy()
+    if len(boxes):
+        span = (boxes[:, 0] + boxes[:, 2]).max() - min(boxes[:, 0].min(), 0) + 1
+        boxes[:, 0] += np.asarray(groups, dtype=np.float64) * span
+    return boxes
+
+
+def batched_nms(boxes, scores, groups, iou_threshold=0.3, metric="iou", max_per_group=None):
+    """
+    nms applied to every group (class id, image index, ...) independently, in one call. Every round keeps the best
+    remaining box of all groups at once and removes what overlaps it in its group, so the number of rounds is the
+    most boxes kept in one group, not the total. Returns the kept indices, round by round.
+    """
+    if metric not in METRICS:
+        raise ValueError("metric must be one of {}".format(", ".join(METRICS)))
+    corners, areas = _corners(boxes)
+    groups = np.unique(np.asarray(groups).ravel(), return_inverse=True)[1]
+    # by group, best first inside a group
+    remaining = np.lexsort((-np.asarray(scores, dtype=np.float64).ravel(), groups))
+    best = np.empty(groups.max() + 1 if len(groups) else 0, np.int64)
+
+    keep = []
+    rounds = 0
+    while len(remaining) and (max_per_group is None or rounds < max_per_group):
+        first = np.ones(len(remaining), bool)
+        first[1:] = groups[remaining[1:]] != groups[remaining[:-1]]
+        picked = remaining[first]
+        keep.append(picked)
+        best[groups[picked]] = picked
+        rest = remaining[~first]
+        remaining = rest[_row(corners, areas, best[groups[rest]], rest, metric) <= iou_threshold]
+        rounds += 1
+    return np.concatenate(keep) if keep else np.empty(0, np.int64)
+
+
+def top_k_per_class(scores, labels, k):
+    """Indices of the best k scores of every label, best first overall."""
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    labels = np.unique(np.asarray(labels).ravel(), return_inverse=True)[1]
+    # sort by label, then by score descending; the rank inside a label is the distance to the label's start
+    order = np.lexsort((-scores, labels))
+    sorted_labels = labels[order]
+    starts = np.searchsorted(sorted_labels, sorted_labels, side="left")
+    order = order[np.arange(len(order)) - starts < k]
+    return order[np.argsort(-scores[order], kind="stable")]
+
+
+def postprocess(rects, weights=None, labels=None, score_threshold=None, iou_threshold=0.3, top_k=None, metric="iou",
+                soft=False, sigma=0.5):
+    """
+    Weight threshold, NMS (per label when labels are given, soft-NMS when soft=True) and per-label top-K of one
+    detector output. weights default to 1 (input order wins between overlapping boxes).
+    Returns (boxes (N, 4) int32, scores (N,), labels (N,) or None), best first.
+    """
+    boxes = _as_boxes(rects)
+    scores = np.ones(len(boxes)) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+    if len(scores) != len(boxes):
+        raise ValueError("{} weights for {} boxes".format(len(scores), len(boxes)))
+    labels = None if labels is None else np.asarray(labels).ravel()
+    index = np.arange(len(boxes))
+
+    if score_threshold is not None:
+        index = index[scores >= score_threshold]
+    groups = np.zeros(len(index), np.int64) if labels is None else np.unique(labels[index], return_inverse=True)[1]
+    if iou_threshold is not None and len(index):
+        if soft:
+            kept, new_scores = soft_nms(_offset_boxes(boxes[index], groups), scores[index], sigma, iou_threshold,
+                                        metric=metric, score_threshold=score_threshold or 0.001)
+            scores = scores.copy()
+            scores[index[kept]] = new_scores
+        else:
+            kept = batched_nms(boxes[index], scores[index], groups, iou_threshold, metric)
+        index, groups = index[kept], groups[kept]
+    if top_k is not None:
+        index = index[top_k_per_class(scores[index], groups, top_k)]
+    else:
+        index = index[np.argsort(-scores[index], kind="stable")]
+    return (np.round(boxes[index]).astype(np.int32), scores[index],
+            None if labels is None else labels[index])
+
+
+def postprocess_batch(outputs, score_threshold=None, iou_threshold=0.3, top_k=None, metric="iou"):
+    """
+    postprocess for many images at once: outputs is a list of (rects, weights) or (rects, weights, labels) per image.
+    All boxes go through one batched_nms (groups = image x label), so the NumPy calls are per NMS round, not per
+    image. With top_k, the rounds stop after top_k.
+    Returns [(boxes, scores, labels or None)] in input order.
+    """
+    counts = [len(_as_boxes(o[0])) for o in outputs]
+    if not outputs or not sum(counts):
+        return [(np.empty((0, 4), np.int32), np.empty(0), None if len(o) < 3 else np.empty(0, object))
+                for o in outputs]
+    has_labels = len(outputs[0]) > 2
+    boxes = np.concatenate([_as_boxes(o[0]) for o in outputs])
+    scores = np.concatenate([np.ones(n) if o[1] is None else np.asarray(o[1], dtype=np.float64).ravel()
+                             for o, n in zip(outputs, counts)])
+    image = np.repeat(np.arange(len(outputs)), counts)
+    labels = np.concatenate([np.asarray(o[2]).ravel() for o in outputs]) if has_labels else None
+
+    groups = image
+    if labels is not None:
+        # one group per (image, label)
+        label_ids = np.unique(labels, return_inverse=True)[1]
+        groups = image * (label_ids.max() + 1) + label_ids
+    index = np.arange(len(boxes))
+    if score_threshold is not None:
+        index = index[scores[index] >= score_threshold]
+    if iou_threshold is not None and len(index):
+        index = index[batched_nms(boxes[index], scores[index], groups[index], iou_threshold, metric, top_k)]
+    if top_k is not None:
+        index = index[top_k_per_class(scores[index], groups[index], top_k)]
+    # back to images, best first inside each
+    index = index[np.lexsort((-scores[index], image[index]))]
+    splits = np.searchsorted(image[index], np.arange(1, len(outputs)))
+    return [(np.round(boxes[i]).astype(np.int32), scores[i], None if labels is None else labels[i])
+            for i in np.split(index, splits)]
@@ -0,0 +1,233 @@
+'''
+Output layer for the detectors: structured results first, drawing only when a visual sink asks for it.
+
+The tutorial scripts end in plt.show(), cv2.imshow or a blocking cv2.waitKey(0) per image, so they cannot run on a
+server and always pay for drawing. Here a detector (object_detection.detectors) returns its JSON-ready result and
+the result goes to one or more sinks:
+
+    NullSink        - pure compute, nothing is kept
+    ResultsSink     - JSON lines (.jsonl/.json) or one CSV row per object (.csv)
+    ImageWriterSink - annotated copies of the images written to a directory
+    DisplaySink     - annotated image in a window, like the tutorial scripts
+
+Only the last two are visual: annotations() turns a result into boxes, points and polygons and draw() renders them
+on a copy of the image, and both are only called for them.
+
+    python -m object_detection.output faces 8_face_detection --sink faces.csv --sink annotated/
+    python -m object_detection.output pedestrians 11_pedestrian_detection --sink display
+'''
+
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from object_detection.cli import parse_param
+from object_detection.profiling import default_profiler as profiler
+from object_detection.samples import list_images
+
+# one detector result for one image
+Record = namedtuple("Record", "source detector result")
+
+COLOR = (0, 0, 255)
+
+
+def annotations(detector, result):
+    """
+    The shapes of a result, as a list of (kind, geometry, label):
+    ("box", (x, y, w, h), label), ("point", (x, y), label) or ("polygon", [(x, y), ...], label).
+    """
+    if detector in ("faces", "cats"):
+        return [("box", box, None) for box in result["boxes"]]
+    if detector == "pedestrians":
+        return [("box", box, "{:.2f}".format(w)) for box, w in zip(result["boxes"], result["weights"])]
+    if detector == "template":
+        return [("box", m["box"], "{} {:.2f}".format(m["template"], m["score"])) for m in result["matches"]]
+    if detector == "features":
+        return [("polygon", p["corners"], "{} ({} inliers)".format(p["name"], p["inliers"]))
+                for p in result["products"]]
+    if detector == "watershed":
+        return [("box", box, str(i + 1)) for i, box in enumerate(result["bbox"])]
+    if detector == "contours":
+        return [("box", box, None) for box in result["external"]]
+    if detector == "corners":
+        return [("point", point, None) for point in result["corners"]]
+    if detector == "color":
+        return [("box", obj["bbox"], name) for name, objects in result.items() for obj in objects]
+    # edges: only counts, nothing to draw
+    return []
+
+
+def draw(image, detector, result):
+    """Annotated copy of the image."""
+    with profiler.stage("output", "draw"):
+        return _draw(image, detector, result)
+
+
+def _draw(image, detector, result):
+    canvas = image.copy() if image.ndim == 3 else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    for kind, geometry, label in annotations(detector, result):
+        if kind == "point":
+            x, y = int(geometry[0]), int(geometry[1])
+            cv2.circle(canvas, (x, y), 3, COLOR, cv2.FILLED)
+        elif kind == "polygon":
+            points = np.int32(np.round(geometry)).reshape(-1, 1, 2)
+            cv2.polylines(canvas, [points], True, COLOR, 2, cv2.LINE_AA)
+            x, y = points[0, 0]
+        else:
+            x, y, w, h = (int(round(v)) for v in geometry)
+            cv2.rectangle(canvas, (x, y), (x + w, y + h), COLOR, 2)
+        if label:
+            cv2.putText(canvas, label, (int(x), max(12, int(y) - 5)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, COLOR, 1)
+    return canvas
+
+
+# Sinks - called with every record and its image; a sink returns False to stop the run.
+# Only sinks with visual = True look at the image.
+
+class NullSink:
+    visual = False
+
+    def __call__(self, record, image):
+        return True
+
+    def close(self):
+        pass
+
+
+class ResultsSink:
+    """
+    JSON lines with the full result, or CSV with one row per object (source, detector, kind, x, y, w, h, label).
+    path "-" writes JSON lines to stdout.
+    """
+    visual = False
+    CSV_FIELDS = ("source", "detector", "kind", "x", "y", "w", "h", "label")
+
+    def __init__(self, path):
+        self.path = path
+        self.csv = path.lower().endswith(".csv")
+        self.file = sys.stdout if path == "-" else open(path, "w", newline="" if self.csv else None)
+        if self.csv:
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.CSV_FIELDS)
+
+    def __call__(self, record, image):
+        if not self.csv:
+            self.file.write(json.dumps(record._asdict()) + "\n")
+            return True
+        for kind, geometry, label in annotations(record.detector, record.result):
+            if kind == "point":
+                x, y, w, h = geometry[0], geometry[1], "", ""
+            elif kind == "polygon":
+                x, y, w, h = cv2.boundingRect(np.float32(geometry))
+            else:
+                x, y, w, h = geometry
+            self.writer.writerow((record.source, record.detector, kind, x, y, w, h, label or ""))
+        return True
+
+    def close(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+
+
+class ImageWriterSink:
+    """Writes <image name>_<detector><ext> annotated copies into out_dir."""
+    visual = True
+
+    def __init__(self, out_dir, ext=".jpg"):
+        self.out_dir = out_dir
+        self.ext = ext
+        os.makedirs(out_dir, exist_ok=True)
+
+    def __call__(self, record, image):
+        stem = os.path.splitext(os.path.basename(record.source))[0]
+        path = os.path.join(self.out_dir, "{}_{}{}".format(stem, record.detector, self.ext))
+        cv2.imwrite(path, draw(image, record.detector, record.result))
+        return True
+
+    def close(self):
+        pass
+
+
+class DisplaySink:
+    """Shows every annotated image; delay=0 waits for a key as the tutorial scripts do. q or Esc stops the run."""
+    visual = True
+
+    def __init__(self, window="detections", delay=0):
+        self.window = window
+        self.delay = delay
+
+    def __call__(self, record, image):
+        cv2.imshow(self.window, draw(image, record.detector, record.result))
+        return cv2.waitKey(self.delay) & 0xFF not in (ord("q"), 27)
+
+    def close(self):
+        cv2.destroyWindow(self.window)
+
+
+def open_sink(spec):
+    """
+    "null", "display", "-" (JSON lines on stdout), a .jsonl/.json/.csv results file, or a directory for annotated
+    images.
+    """
+    if spec == "null":
+        return NullSink()
+    if spec == "display":
+        return DisplaySink()
+    if spec == "-" or spec.lower().endswith((".jsonl", ".json", ".csv")):
+        return ResultsSink(spec)
+    return ImageWriterSink(spec)
+
+
+def run(detector, source, sinks, params=None, detectors=None):
+    """
+    Runs one detector over the images of source (directory, image or manifest, see list_images, or a list of them)
+    and passes every record to the sinks. The sinks are closed at the end. Returns the number of images processed.
+    """
+    if detectors is None:
+        from object_detection.detectors import Detectors
+        # only the models of this detector are loaded
+        detectors = Detectors(preload=False)
+
+    sources = [source] if isinstance(source, str) else source
+    count = 0
+    try:
+        for path in (path for source in sources for path in list_images(source)):
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            record = Record(path, detector, detectors.run(detector, image, dict(params or {})))
+            count += 1
+            if not all([sink(record, image) for sink in sinks]):
+                break
+    finally:
+        for sink in sinks:
+            sink.close()
+    return count
+
+
+def main(argv=None):
+    from object_detection.detectors import Detectors
+
+    parser = argparse.ArgumentParser(description="Run a detector over images, headless or not")
+    parser.add_argument("detector", choices=Detectors.NAMES)
+    parser.add_argument("source", help="image, directory or manifest of images")
+    parser.add_argument("--sink", action="append", default=None,
+                        help="null, display, results file (.jsonl/.json/.csv) or output directory; repeatable")
+    parser.add_argument("--param", action="append", type=parse_param, default=[], help="detector parameter name=value")
+    args = parser.parse_args(argv)
+
+    sinks = [open_sink(spec) for spec in (args.sink or ["null"])]
+    count = run(args.detector, args.source, sinks, dict(args.param))
+    print("{} images".format(count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+'''
+Headless batch pedestrian detection with the HOG people detector (see 11_pedestrian_detection).
+
+Images are spread across a process pool. Every worker builds its own HOGDescriptor with the default people SVM
+once, when the worker starts, and then only reads images and runs detectMultiScale.
+The overlapping and nested duplicates detectMultiScale leaves are removed with NMS on the weights (see nms.py),
+then the boxes and weights are written to a JSONL (default) or Parquet results file.
+
+Usage:
+    python -m object_detection.pedestrians 11_pedestrian_detection -o results.jsonl --workers 8
+'''
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from object_detection.nms import postprocess
+from object_detection.samples import list_images
+
+# same parameters as the tutorial script
+DEFAULT_PARAMS = {"padding": (8, 8), "scale": 1.05}
+# a box covered by a stronger one for more than 65% of its own area is a duplicate (also when nested inside it)
+DEFAULT_NMS = {"iou_threshold": 0.65, "metric": "min", "score_threshold": None}
+
+# one detector per worker process, created by _init_worker
+_hog = None
+_params = None
+_nms = None
+
+
+def create_hog():
+    """HOG identifier with the default people SVM added to it."""
+    hog = cv2.HOGDescriptor()
+    hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+    return hog
+
+
+def _setup(params, nms=None):
+    global _hog, _params, _nms
+    _hog = create_hog()
+    _params = params
+    _nms = nms
+
+
+def _init_worker(params, nms=None):
+    # every process already runs on its own core, OpenCV's internal threads would only fight over them
+    cv2.setNumThreads(1)
+    _setup(params, nms)
+
+
+def _detect_path(path):
+    image = cv2.imread(path)
+    if image is None:
+        return {"path": path, "error": "unreadable image", "boxes": [], "weights": []}
+
+    rects, weights = _hog.detectMultiScale(image, **_params)
+    if _nms is not None:
+        rects, weights, _ = postprocess(rects, weights, **_nms)
+    return {
+        "path": path,
+        "width": image.shape[1],
+        "height": image.shape[0],
+        "boxes": [[int(v) for v in rect] for rect in rects],  # (x, y, w, h)
+        "weights": [float(w) for w in weights.ravel()] if len(weights) else [],
+    }
+
+
+def detect_images(paths, workers=None, chunksize=4, params=None, nms=DEFAULT_NMS):
+    """
+    Yield one result dict per image path, in input order.
+    workers=None uses every core, workers=0 runs everything in the calling process.
+    nms are the postprocess() arguments for the boxes of every image, None keeps detectMultiScale's boxes as they are.
+    """
+    params = dict(DEFAULT_PARAMS if params is None else params)
+
+    if workers == 0:
+        # the calling process keeps its OpenCV thread count, so detectMultiScale still uses every core
+        _setup(params, nms)
+        for path in paths:
+            yield _detect_path(path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(params, nms)) as pool:
+        # chunksize > 1 sends several paths per round trip so the IPC cost is paid per chunk, not per image
+        yield from pool.map(_detect_path, paths, chunksize=chunksize)
+
+
+def write_jsonl(records, output):
+    count = 0
+    with open(output, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+            count += 1
+    return count
+
+
+def write_parquet(records, output, batch_size=1024):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+
+    schema = pa.schema([
+        ("path", pa.string()),
+        ("width", pa.int32()),
+        ("height", pa.int32()),
+        ("boxes", pa.list_(pa.list_(pa.int32()))),
+        ("weights", pa.list_(pa.float32())),
+        ("error", pa.string()),
+    ])
+
+    count = 0
+    batch = []
+    with pq.ParquetWriter(output, schema) as writer:
+        for record in records:
+            batch.append(record)
+            if len(batch) == batch_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def run_batch(source, output, workers=None, fmt=None, chunksize=4, params=None, nms=DEFAULT_NMS):
+    """Detect pedestrians in every image of source and write the results. Returns a small summary dict."""
+    paths = list_images(source)
+    if fmt is None:
+        fmt = "parquet" if output.endswith(".parquet") else "jsonl"
+    writer = write_parquet if fmt == "parquet" else write_jsonl
+
+    start = time.perf_counter()
+    count = writer(detect_images(paths, workers=workers, chunksize=chunksize, params=params, nms=nms), output)
+    elapsed = time.perf_counter() - start
+
+    return {"images": count, "seconds": elapsed, "images_per_sec": count / elapsed if elapsed else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch HOG pedestrian detection")
+    parser.add_argument("source", help="image directory, single image or manifest file with one path per line")
+    parser.add_argument("-o", "--output", default="pedestrians.jsonl", help=".jsonl or .parquet results file")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="0 runs in the main process")
+    parser.add_argument("--chunksize", type=int, default=4)
+    parser.add_argument("--scale", type=float, default=DEFAULT_PARAMS["scale"])
+    parser.add_argument("--padding", type=int, default=DEFAULT_PARAMS["padding"][0])
+    parser.add_argument("--overlap", type=float, default=DEFAULT_NMS["iou_threshold"],
+                        help="NMS threshold (intersection over the smaller box)")
+    parser.add_argument("--min-weight", type=float, default=None, help="drop the boxes with a lower SVM weight")
+    parser.add_argument("--no-nms", action="store_true", help="keep detectMultiScale's boxes as they are")
+    args = parser.parse_args(argv)
+
+    params = {"padding": (args.padding, args.padding), "scale": args.scale}
+    nms = None if args.no_nms else dict(DEFAULT_NMS, iou_threshold=args.overlap, score_threshold=args.min_weight)
+    summary = run_batch(args.source, args.output, args.workers, args.format, args.chunksize, params, nms)
+    print("{images} images in {seconds:.2f}s ({images_per_sec:.1f} images/sec)".format(**summary))
+
+
+if __name__ == "__main__":
+    main()
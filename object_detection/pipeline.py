@@ -0,0 +1,343 @@
+'''
+Streaming video pipeline with decoupled capture, detect and render stages.
+
+In 8_face_detection the webcam loop reads a frame, runs the cascade, draws and shows it, all in sequence,
+so capture stalls whenever detection is slow. Here every stage runs on its own:
+
+    capture thread -> bounded frame queue -> detection worker threads -> sink (display, file writer or null)
+
+The frame queue is small and drops the oldest frame when it is full, so the detectors always work on fresh frames
+instead of falling further and further behind a live camera. OpenCV releases the GIL inside detectMultiScale,
+so plain threads are enough for the detection workers.
+
+Any cv2.VideoCapture source works (camera index, video file, stream URL), so the pipeline can be tested
+with a video file instead of a camera:
+    python -m object_detection.pipeline --source video.mp4 --sink null
+'''
+
+import argparse
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from object_detection.profiling import default_profiler as profiler
+from object_detection.registry import get_cascade
+
+
+class Frame:
+    """A captured frame travelling through the pipeline, with the timestamps of every stage."""
+    __slots__ = ("index", "image", "t_capture", "t_dequeue", "t_detected", "detections")
+
+    def __init__(self, index, image, t_capture):
+        self.index = index
+        self.image = image
+        self.t_capture = t_capture
+        self.t_dequeue = None
+        self.t_detected = None
+        self.detections = None
+
+
+class LatencyStats:
+    """Keeps the last `size` durations of a stage and reports them in milliseconds."""
+
+    def __init__(self, size=10000):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def summary(self):
+        with self.lock:
+            values = np.array(self.samples, dtype=np.float64) * 1000.0
+        if len(values) == 0:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "mean_ms": float(values.mean()),
+            "p50_ms": float(np.percentile(values, 50)),
+            "p95_ms": float(np.percentile(values, 95)),
+            "max_ms": float(values.max()),
+        }
+
+
+def draw_boxes(image, boxes, color=(255, 255, 255), thickness=2):
+    for (x, y, w, h) in boxes:
+        cv2.rectangle(image, (int(x), int(y)), (int(x + w), int(y + h)), color, thickness)
+    return image
+
+
+# Sinks - the last stage. A sink returns False to ask the pipeline to stop.
+
+class NullSink:
+    """Pure compute: drops the frames, only the statistics are kept."""
+
+    def __call__(self, frame):
+        return True
+
+    def close(self):
+        pass
+
+
+class DisplaySink:
+    """Draws the detections and shows the frame in a window. Pressing q stops the pipeline."""
+
+    def __init__(self, window="face detect"):
+        self.window = window
+
+    def __call__(self, frame):
+        with profiler.stage("pipeline", "draw"):
+            draw_boxes(frame.image, frame.detections)
+        cv2.imshow(self.window, frame.image)
+        return cv2.waitKey(1) & 0xFF != ord("q")
+
+    def close(self):
+        cv2.destroyWindow(self.window)
+
+
+class VideoWriterSink:
+    """Writes the annotated frames to a video file. The writer is opened with the size of the first frame."""
+
+    def __init__(self, path, fps=30.0, fourcc="mp4v"):
+        self.path = path
+        self.fps = fps
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.writer = None
+
+    def __call__(self, frame):
+        if self.writer is None:
+            h, w = frame.image.shape[:2]
+            self.writer = cv2.VideoWriter(self.path, self.fourcc, self.fps, (w, h))
+        with profiler.stage("pipeline", "draw"):
+            draw_boxes(frame.image, frame.detections)
+        self.writer.write(frame.image)
+        return True
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+
+def face_detector(cascade_path="face", **params):
+    """
+    Detector callable for the pipeline: frame -> list of (x, y, w, h).
+    A CascadeClassifier must not be shared between threads, the registry gives every worker thread its own.
+    The cascade runs on a grayscale copy instead of the full BGR frame.
+    """
+    params.setdefault("minNeighbors", 7)
+
+    def detect(image):
+        cascade = get_cascade(cascade_path)
+        with profiler.stage("face_detector", "gray"):
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        with profiler.stage("face_detector", "detect_multiscale"):
+            rects = cascade.detectMultiScale(gray, **params)
+        return [tuple(int(v) for v in rect) for rect in rects]
+
+    return detect
+
+
+class VideoPipeline:
+    """
+    source   - anything cv2.VideoCapture accepts, or an already opened capture
+    detector - callable image -> detections (list of boxes)
+    sink     - callable Frame -> bool, see NullSink/DisplaySink/VideoWriterSink
+    workers  - number of detection threads
+    queue_size - capacity of the frame queue
+    drop_stale - when the queue is full, drop the oldest frame (live cameras) instead of blocking capture (files)
+    """
+
+    def __init__(self, source, detector, sink=None, workers=2, queue_size=2, drop_stale=True, max_frames=None):
+        self.source = source
+        self.detector = detector
+        self.sink = sink if sink is not None else NullSink()
+        self.workers = workers
+        self.drop_stale = drop_stale
+        self.max_frames = max_frames
+
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.results = queue.Queue()
+        self.stop_event = threading.Event()
+
+        self.captured = 0
+        self.dropped = 0  # stale frames dropped from the queue by the capture thread
+        self.skipped = 0  # frames finished after a newer one was already rendered
+        self.rendered = 0
+        self.failed = 0  # frames the detector raised on
+        self.errors_lock = threading.Lock()
+        self.stages = {name: LatencyStats() for name in ("capture", "queue", "detect", "sink", "end_to_end")}
+        self.started = None
+        self.finished = None
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _open(self):
+        if isinstance(self.source, cv2.VideoCapture):
+            return self.source
+        return cv2.VideoCapture(self.source)
+
+    def _enqueue(self, frame):
+        if not self.drop_stale:
+            # block, but wake up regularly so stop() is honoured
+            while not self.stop_event.is_set():
+                try:
+                    self.frames.put(frame, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+            return
+
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            # only this thread puts, so after taking the stalest frame out there is room for the new one
+            try:
+                self.frames.get_nowait()
+                self.dropped += 1
+                profiler.inc("dropped_frames", "pipeline")
+            except queue.Empty:
+                pass
+            self.frames.put_nowait(frame)
+
+    def _capture_loop(self):
+        cap = self._open()
+        try:
+            while not self.stop_event.is_set():
+                if self.max_frames is not None and self.captured >= self.max_frames:
+                    break
+                t0 = time.perf_counter()
+                success, image = cap.read()
+                t1 = time.perf_counter()
+                if not success:
+                    break
+                self.stages["capture"].add(t1 - t0)
+                self._enqueue(Frame(self.captured, image, t1))
+                self.captured += 1
+                profiler.inc("frames", "pipeline")
+        finally:
+            if cap is not self.source:
+                cap.release()
+            # one end marker per worker; these are never dropped
+            for _ in range(self.workers):
+                self.frames.put(None)
+
+    def _detect_loop(self):
+        try:
+            while True:
+                frame = self.frames.get()
+                if frame is None:
+                    return
+                frame.t_dequeue = time.perf_counter()
+                self.stages["queue"].add(frame.t_dequeue - frame.t_capture)
+                if self.stop_event.is_set():
+                    continue
+                try:
+                    frame.detections = self.detector(frame.image)
+                except Exception:
+                    # one bad frame must not take the worker down, the frame is counted and left out
+                    with self.errors_lock:
+                        self.failed += 1
+                    profiler.inc("detector_errors", "pipeline")
+                    continue
+                frame.t_detected = time.perf_counter()
+                self.stages["detect"].add(frame.t_detected - frame.t_dequeue)
+                profiler.observe("detections_per_frame", "pipeline", len(frame.detections))
+                self.results.put(frame)
+        finally:
+            # run() waits for one end marker per worker, whatever stopped the worker
+            self.results.put(None)
+
+    def run(self):
+        """Run until the source is exhausted or the sink asks to stop. The sink runs on the calling thread."""
+        self.started = time.perf_counter()
+        threads = [threading.Thread(target=self._capture_loop, name="capture", daemon=True)]
+        threads += [threading.Thread(target=self._detect_loop, name="detect-%d" % i, daemon=True)
+                    for i in range(self.workers)]
+        for t in threads:
+            t.start()
+
+        last_index = -1
+        finished_workers = 0
+        try:
+            while finished_workers < self.workers:
+                frame = self.results.get()
+                if frame is None:
+                    finished_workers += 1
+                    continue
+                # workers can finish out of order; never go back in time on the output
+                if frame.index < last_index or self.stop_event.is_set():
+                    self.skipped += 1
+                    profiler.inc("skipped_frames", "pipeline")
+                    continue
+                last_index = frame.index
+
+                t0 = time.perf_counter()
+                keep_going = self.sink(frame)
+                t1 = time.perf_counter()
+                self.stages["sink"].add(t1 - t0)
+                self.stages["end_to_end"].add(t1 - frame.t_capture)
+                self.rendered += 1
+                if keep_going is False:
+                    self.stop()
+        finally:
+            self.stop()
+            for t in threads:
+                t.join()
+            self.sink.close()
+            self.finished = time.perf_counter()
+        return self.report()
+
+    def report(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        elapsed = end - self.started if self.started is not None else 0.0
+        return {
+            "frames_captured": self.captured,
+            "frames_rendered": self.rendered,
+            "frames_dropped": self.dropped,
+            "frames_skipped": self.skipped,
+            "frames_failed": self.failed,
+            "seconds": elapsed,
+            "fps": self.rendered / elapsed if elapsed else 0.0,
+            "stages": {name: stats.summary() for name, stats in self.stages.items()},
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Face detection on a video stream with a decoupled pipeline")
+    parser.add_argument("--source", default="0", help="camera index, video file or stream URL")
+    parser.add_argument("--cascade", default="face", help="registered cascade name or XML path")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=2)
+    parser.add_argument("--sink", default="display", help="display, null or a video file path to write")
+    parser.add_argument("--max-frames", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    if args.sink == "display":
+        sink = DisplaySink()
+    elif args.sink == "null":
+        sink = NullSink()
+    else:
+        sink = VideoWriterSink(args.sink)
+
+    # a camera produces frames whether we keep up or not, a file can wait for us
+    pipeline = VideoPipeline(source, face_detector(args.cascade), sink, workers=args.workers,
+                             queue_size=args.queue_size, drop_stale=isinstance(source, int),
+                             max_frames=args.max_frames)
+    report = pipeline.run()
+
+    print("captured {frames_captured}, rendered {frames_rendered}, dropped {frames_dropped}, "
+          "skipped {frames_skipped}, failed {frames_failed}, {fps:.1f} FPS".format(**report))
+    for name, stats in report["stages"].items():
+        if stats["count"]:
+            print("{:>10}: mean {mean_ms:7.2f} ms  p50 {p50_ms:7.2f} ms  p95 {p95_ms:7.2f} ms".format(name, **stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+'''
+Paths of the images and models bundled with the tutorial folders.
+Used by the benchmarks so nothing depends on the current working directory.
+'''
+
+import os
+import shutil
+import tempfile
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def sample_path(*parts):
+    """Absolute path of a file inside the repository, e.g. sample_path("7_watershed", "coins.jpg")."""
+    return os.path.join(ROOT, *parts)
+
+
+def extract_sample(archive, member):
+    """
+    Path of a file inside one of the zipped tutorial folders, e.g. extract_sample("10_custom_cascade.zip",
+    "10_custom_cascade/cascade.xml"). It is extracted once into the temp directory and again when the archive changes.
+    The file is written next to the target and renamed into place, so other threads and processes never see it
+    half-written.
+    """
+    archive = sample_path(archive)
+    target = os.path.join(tempfile.gettempdir(), "object_detection_samples", member)
+    if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(archive):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, partial = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".extract_")
+        try:
+            with zipfile.ZipFile(archive) as z, z.open(member) as src, os.fdopen(fd, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(partial, target)
+        except BaseException:
+            os.remove(partial)
+            raise
+    return target
+
+
+def list_images(source):
+    """
+    Resolve an image source into a sorted list of image paths.
+    source can be a directory, a single image or a manifest (.txt/.lst) with one path per line.
+    Relative paths in a manifest are resolved against the manifest's folder.
+    """
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, f) for f in os.listdir(source) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+    if source.lower().endswith(IMAGE_EXTENSIONS):
+        return [source]
+
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source) as manifest:
+        for line in manifest:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                paths.append(line if os.path.isabs(line) else os.path.join(base, line))
+    return paths
@@ -0,0 +1,427 @@
+'''
+Marker-based watershed segmentation (see 7_watershed), including a tiled engine for very large images.
+
+watershed_labels runs the tutorial pipeline - medianBlur, threshold, opening, distanceTransform, sure foreground and
+background, connectedComponents markers, cv2.watershed - without keeping or plotting any intermediate image.
+The result follows the cv2.watershed convention: -1 on the boundaries, 1 for the background, 2.. for the objects.
+
+segment(image, params) wraps it into a reusable API: labels, per-object stats (area, centroid, bbox from
+connectedComponentsWithStats) and optionally the contours. segment_batch runs it headless over many images in a
+process pool, e.g. to count coins or parts:
+    python -m object_detection.segmentation images/ -o counts.jsonl
+
+segment_tiled does the same for images far too big for that: a gigapixel scan has over a dozen full-size
+intermediates in the plain pipeline. Instead:
+
+1) the image is split into a grid of tiles, each one expanded by `overlap` pixels on every side
+2) the tiles are segmented in a process pool, only a few tiles are in flight at any time
+3) every tile writes the labels of its own (non-overlapping) core region with new global IDs; an object cut by a
+   tile seam gets one ID per tile, and two IDs are merged when they are each other's best match inside the shared
+   overlap and agree on most of the larger one. Objects touching a side where a tile was cut are truncated views
+   and take no part in the matching
+4) the output can be a np.memmap, so the peak memory is bounded by the tile size, not by the image size
+
+The overlap has to be larger than the biggest object for the seams to be resolved correctly; with a smaller one an
+object crossing a seam can come out split into two IDs, never merged with its neighbour.
+'''
+
+import argparse
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from object_detection.batch import process_map
+from object_detection.profiling import default_profiler as profiler
+from object_detection.samples import list_images
+
+# parameters of the tutorial's watershed pipeline
+DEFAULT_PARAMS = {
+    "blur": 13,              # medianBlur kernel size
+    "threshold": 65,         # binary threshold of the blurred grayscale image
+    "open_iterations": 2,    # morphological opening against the bridges between coins
+    "fg_ratio": 0.4,         # sure foreground: distance >= fg_ratio * max distance
+    "fg_distance": None,     # ... or an absolute distance in pixels (needed to get the same result in every tile)
+    "dilate_iterations": 1,  # sure background: dilated opening
+}
+
+KERNEL = np.ones((3, 3), np.uint8)
+
+
+def _params(params):
+    merged = dict(DEFAULT_PARAMS)
+    if params:
+        merged.update(params)
+    return merged
+
+
+def foreground_mask(image, params=None):
+    """Opened binary mask of the objects (blur, grayscale, threshold, opening)."""
+    p = _params(params)
+    with profiler.stage("watershed", "median_blur"):
+        blurred = cv2.medianBlur(image, p["blur"])
+    with profiler.stage("watershed", "threshold"):
+        gray = cv2.cvtColor(blurred, cv2.COLOR_BGR2GRAY) if blurred.ndim == 3 else blurred
+        _, thresh = cv2.threshold(gray, p["threshold"], 255, cv2.THRESH_BINARY)
+    with profiler.stage("watershed", "opening"):
+        return cv2.morphologyEx(thresh, cv2.MORPH_OPEN, KERNEL, iterations=p["open_iterations"])
+
+
+def watershed_labels(image, params=None):
+    """Watershed label array of one BGR image: -1 boundaries, 1 background, 2.. objects."""
+    p = _params(params)
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+    profiler.inc("frames", "watershed")
+    opening = foreground_mask(image, p)
+    with profiler.stage("watershed", "distance_transform"):
+        dist = cv2.distanceTransform(opening, cv2.DIST_L2, 5)
+        fg_distance = p["fg_distance"] if p["fg_distance"] is not None else p["fg_ratio"] * float(dist.max())
+        sure_foreground = np.uint8(dist > fg_distance) * 255
+        del dist
+
+    with profiler.stage("watershed", "markers"):
+        sure_background = cv2.dilate(opening, KERNEL, iterations=p["dilate_iterations"])
+        unknown = cv2.subtract(sure_background, sure_foreground)
+        del opening, sure_background
+
+        _, markers = cv2.connectedComponents(sure_foreground)
+        markers += 1
+        markers[unknown == 255] = 0
+    with profiler.stage("watershed", "watershed"):
+        return cv2.watershed(image, markers)
+
+
+# labels: watershed labels (None when not requested), stats: see object_stats, contours: list or None
+Segmentation = namedtuple("Segmentation", "labels stats contours")
+
+
+def _components(labels):
+    # the watershed lines (-1) separate the objects, so a 4-connected labelling of the object mask
+    # finds every object in one pass
+    return cv2.connectedComponentsWithStats(np.uint8(labels > 1), connectivity=4)
+
+
+def object_stats(labels, components=None):
+    """Per-object stats of a watershed label array: count, area (N,), centroid (N, 2) and bbox (N, 4) x, y, w, h."""
+    count, _, stats, centroids = components if components is not None else _components(labels)
+    # component 0 is the background
+    return {
+        "count": count - 1,
+        "area": stats[1:, cv2.CC_STAT_AREA],
+        "centroid": centroids[1:],
+        "bbox": stats[1:, :4],
+    }
+
+
+def object_contours(labels, components=None):
+    """
+    External contour of every object, in the order of object_stats.
+    findContours joins objects that touch diagonally across a watershed line, so every object is traced
+    inside its own bounding box.
+    """
+    count, component_labels, stats, _ = components if components is not None else _components(labels)
+    contours = []
+    for i in range(1, count):
+        x, y, w, h = stats[i, :4]
+        crop = np.uint8(component_labels[y: y + h, x: x + w] == i)
+        found, _ = cv2.findContours(crop, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(int(x), int(y)))
+        contours.append(max(found, key=len))
+    return contours
+
+
+def segment(image, params=None, contours=True, labels=True):
+    """Segment one BGR image. Returns Segmentation(labels, stats, contours)."""
+    result = watershed_labels(image, params)
+    with profiler.stage("watershed", "stats"):
+        components = _components(result)
+        stats = object_stats(result, components)
+    profiler.observe("detections_per_frame", "watershed", stats["count"])
+    found = None
+    if contours:
+        with profiler.stage("watershed", "contours"):
+            found = object_contours(result, components)
+    return Segmentation(result if labels else None, stats, found)
+
+
+def _segment_item(task):
+    item, params, contours, labels = task
+    cv2.setNumThreads(1)
+    # paths are read in the worker, so only the small results travel between processes
+    image = cv2.imread(item) if isinstance(item, str) else item
+    if image is None:
+        raise ValueError("unreadable image: {}".format(item))
+    return segment(image, params, contours, labels)
+
+
+def segment_batch(images, params=None, workers=None, contours=False, labels=False, chunksize=4, max_pending=None):
+    """
+    Segment many images (arrays or paths) in a process pool and yield their Segmentation in order.
+    By default only the stats are returned; label arrays and contours are opt-in because they are big to transfer.
+    images is consumed as the results are yielded: at most max_pending chunks of chunksize images (default 2 chunks
+    per worker) are in flight (see batch.process_map). workers=0 runs in the calling process.
+    """
+    tasks = ((item, params, contours, labels) for item in images)
+    if workers == 0:
+        for task in tasks:
+            yield _segment_item(task)
+        return
+    yield from process_map(_segment_item, tasks, workers, chunksize, max_pending)
+
+
+def estimate_fg_distance(image, params=None, max_pixels=1000000):
+    """
+    Absolute sure-foreground distance for the tiled engine, from a downscaled overview of the whole image.
+    Every tile has to use the same threshold, a per-tile maximum distance would split the image unevenly.
+    """
+    p = _params(params)
+    h, w = image.shape[:2]
+    step = int(np.ceil((h * w / float(max_pixels)) ** 0.5))
+    # plain striding only touches every step-th row, so a memory-mapped image is never read in full
+    small = np.ascontiguousarray(image[::step, ::step]) if step > 1 else image
+    scale = 1.0 / step
+    blur = max(3, int(p["blur"] * scale) | 1)
+    dist = cv2.distanceTransform(foreground_mask(small, dict(p, blur=blur)), cv2.DIST_L2, 5)
+    return p["fg_ratio"] * float(dist.max()) / scale
+
+
+def tile_grid(shape, tile_size, overlap):
+    """(core, expanded) rectangles (y0, y1, x0, x1) of every tile, row by row."""
+    h, w = shape[:2]
+    tiles = []
+    for y in range(0, h, tile_size):
+        row = []
+        for x in range(0, w, tile_size):
+            core = (y, min(h, y + tile_size), x, min(w, x + tile_size))
+            expanded = (max(0, y - overlap), min(h, core[1] + overlap), max(0, x - overlap), min(w, core[3] + overlap))
+            row.append((core, expanded))
+        tiles.append(row)
+    return tiles
+
+
+def _open_source(source):
+    if isinstance(source, str):
+        # .npy files are memory-mapped, so every worker only reads the pages of its own tile
+        return np.load(source, mmap_mode="r") if source.endswith(".npy") else cv2.imread(source)
+    return source
+
+
+def _segment_tile(task):
+    source, expanded, params = task
+    cv2.setNumThreads(1)
+    y0, y1, x0, x1 = expanded
+    tile = np.ascontiguousarray(_open_source(source)[y0:y1, x0:x1])
+    return watershed_labels(tile, params)
+
+
+class _UnionFind:
+
+    def __init__(self):
+        self.parent = np.arange(2, dtype=np.int64)
+
+    def grow(self, size):
+        if size > len(self.parent):
+            self.parent = np.concatenate([self.parent, np.arange(len(self.parent), size, dtype=np.int64)])
+
+    def find(self, a):
+        root = a
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[a] != root:
+            self.parent[a], a = root, self.parent[a]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def roots(self):
+        return np.array([self.find(i) for i in range(len(self.parent))], dtype=np.int64)
+
+
+def _strip(labels, rect, region):
+    """Part of the labels covering rect (y0, y1, x0, x1) that lies inside region."""
+    y0, y1, x0, x1 = region
+    return labels[y0 - rect[0]: y1 - rect[0], x0 - rect[2]: x1 - rect[2]]
+
+
+def _intersection(a, b):
+    return max(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3])
+
+
+def _drop_cut_objects(labels, rect, shape):
+    """Copy of a tile's labels with the objects touching a cut side (one that is not the image border) set to 0."""
+    y0, y1, x0, x1 = rect
+    # cv2.watershed marks the outermost pixels as boundaries (-1), the objects start one pixel further in
+    edges = [labels[:2].ravel() if y0 > 0 else None, labels[-2:].ravel() if y1 < shape[0] else None,
+             labels[:, :2].ravel() if x0 > 0 else None, labels[:, -2:].ravel() if x1 < shape[1] else None]
+    cut = np.unique(np.concatenate([e for e in edges if e is not None] or [np.empty(0, labels.dtype)]))
+    cut = cut[cut > 1]
+    if len(cut) == 0:
+        return labels
+    return np.where(np.isin(labels, cut), 0, labels)
+
+
+def _match_overlap(a, b, union, min_agreement):
+    """
+    Merge the IDs that cover the same object in two tiles' views of their shared overlap. Two IDs are merged only
+    when each is the other's best match and they share at least min_agreement of the larger one's area inside the
+    overlap, so a fragment truncated at a tile edge - or two coins one tile sees as one blob - never chains
+    separate objects together.
+    """
+    objects = (a > 1) & (b > 1)
+    if not objects.any():
+        return
+    keys, counts = np.unique((a[objects].astype(np.int64) << 32) | b[objects].astype(np.int64), return_counts=True)
+    la, lb = keys >> 32, keys & 0xFFFFFFFF
+    ids_a, size_a = np.unique(a[a > 1], return_counts=True)
+    ids_b, size_b = np.unique(b[b > 1], return_counts=True)
+    size_a = size_a[np.searchsorted(ids_a, la)]
+    size_b = size_b[np.searchsorted(ids_b, lb)]
+
+    # the best partner of every ID on both sides: its pair with the most shared pixels
+    best_a, best_b = _first_per_group(la, counts), _first_per_group(lb, counts)
+    mutual = np.intersect1d(best_a, best_b)
+    mutual = mutual[counts[mutual] >= min_agreement * np.maximum(size_a[mutual], size_b[mutual])]
+    for x, y in zip(la[mutual].tolist(), lb[mutual].tolist()):
+        union.union(x, y)
+
+
+def _first_per_group(groups, counts):
+    """Index of the largest count of every group."""
+    order = np.lexsort((-counts, groups))
+    first = np.ones(len(order), bool)
+    first[1:] = groups[order[1:]] != groups[order[:-1]]
+    return order[first]
+
+
+def segment_tiled(image, tile_size=1024, overlap=256, workers=None, params=None, out=None, min_agreement=0.5):
+    """
+    Tiled watershed of a large image.
+
+    image   - BGR array (np.memmap works), or a path: .npy files are memory-mapped by every worker
+    out     - optional int32 array (e.g. np.memmap) of the image size that receives the labels
+    Returns (labels, number of objects). Labels: -1 boundaries, 1 background, 2.. objects.
+    """
+    p = _params(params)
+    source = image
+    image = _open_source(image)
+    h, w = image.shape[:2]
+    if p["fg_distance"] is None:
+        p["fg_distance"] = estimate_fg_distance(image, p)
+    if out is None:
+        out = np.empty((h, w), np.int32)
+
+    grid = tile_grid((h, w), tile_size, overlap)
+    flat = [(r, c) for r in range(len(grid)) for c in range(len(grid[r]))]
+    # workers read their tile themselves when they can, otherwise the tile is sent to them
+    send = source if isinstance(source, str) else None
+
+    union = _UnionFind()
+    next_id = 2
+    # overlap strips of the finished tiles that later tiles still have to be matched against:
+    # column -> {"right": (rect, labels), "bottom": (rect, labels)}
+    previous_row = {}
+    current_row = {}
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        submitted = 0
+
+        def submit():
+            nonlocal submitted
+            r, c = flat[submitted]
+            y0, y1, x0, x1 = grid[r][c][1]
+            task_source = send if send is not None else np.ascontiguousarray(image[y0:y1, x0:x1])
+            task_rect = grid[r][c][1] if send is not None else (0, y1 - y0, 0, x1 - x0)
+            pending.append(pool.submit(_segment_tile, (task_source, task_rect, p)))
+            submitted += 1
+
+        # keep only a few tiles in flight so memory stays bounded by the tile size
+        while submitted < min(len(flat), 2 * workers):
+            submit()
+
+        for r, c in flat:
+            labels = pending.pop(0).result()
+            if submitted < len(flat):
+                submit()
+            if c == 0:
+                previous_row, current_row = current_row, {}
+
+            core, expanded = grid[r][c]
+            # local object labels 2..n -> new global IDs
+            count = int(labels.max()) - 1 if labels.max() > 1 else 0
+            lut = np.arange(-1, count + 2, dtype=np.int32)
+            lut[3:] = np.arange(next_id, next_id + count, dtype=np.int32)
+            labels = lut[labels + 1]
+            next_id += count
+            union.grow(next_id)
+
+            # objects touching a side where the tile was cut are truncated views (two cut coins can even come out
+            # as one blob); with overlap > object size they never reach the core, so they take no part in matching
+            trusted = _drop_cut_objects(labels, expanded, (h, w))
+
+            neighbours = [current_row.get(c - 1, {}).get("right")]
+            neighbours += [previous_row.get(i, {}).get("bottom") for i in (c - 1, c, c + 1)]
+            for neighbour in neighbours:
+                if neighbour is None:
+                    continue
+                region = _intersection(neighbour[0], expanded)
+                if region[0] < region[1] and region[2] < region[3]:
+                    _match_overlap(_strip(neighbour[1], neighbour[0], region), _strip(trusted, expanded, region),
+                                   union, min_agreement)
+
+            out[core[0]: core[1], core[2]: core[3]] = _strip(labels, expanded, core)
+            right = (expanded[0], expanded[1], max(expanded[2], core[3] - overlap), expanded[3])
+            bottom = (max(expanded[0], core[1] - overlap), expanded[1], expanded[2], expanded[3])
+            current_row[c] = {"right": (right, _strip(trusted, expanded, right).copy()),
+                              "bottom": (bottom, _strip(trusted, expanded, bottom).copy())}
+
+    # final pass: every merged ID becomes its smallest member, then the IDs written to out are made consecutive.
+    # Only those are counted: an object seen in a tile's margin alone, or merged away, never reaches out
+    rows = max(1, (tile_size * tile_size) // w)
+    present = np.zeros(next_id, bool)
+    for y in range(0, h, rows):
+        chunk = out[y: y + rows]
+        present[chunk[chunk > 1]] = True
+    roots = union.roots()
+    kept = np.unique(roots[np.flatnonzero(present)])
+    final = np.concatenate([[-1, 0, 1], np.searchsorted(kept, roots[2:]) + 2]).astype(np.int32)  # by label + 1
+    for y in range(0, h, rows):
+        out[y: y + rows] = final[out[y: y + rows] + 1]
+    return out, len(kept)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count objects with the watershed segmentation")
+    parser.add_argument("source", help="image directory, single image or manifest file")
+    parser.add_argument("-o", "--output", default="segmentation.jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="0 runs in the main process")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_PARAMS["threshold"])
+    parser.add_argument("--fg-ratio", type=float, default=DEFAULT_PARAMS["fg_ratio"])
+    args = parser.parse_args(argv)
+
+    paths = list_images(args.source)
+    params = {"threshold": args.threshold, "fg_ratio": args.fg_ratio}
+    with open(args.output, "w") as f:
+        for path, result in zip(paths, segment_batch(paths, params, workers=args.workers)):
+            stats = result.stats
+            record = {
+                "path": path,
+                "count": stats["count"],
+                "area": stats["area"].tolist(),
+                "centroid": np.round(stats["centroid"], 2).tolist(),
+                "bbox": stats["bbox"].tolist(),
+            }
+            f.write(json.dumps(record) + "\n")
+    print("{} images written to {}".format(len(paths), args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+'''
+Long-running detection service: every detector of object_detection.detectors behind one request API.
+
+    client -> DetectionService.submit(detector, image, params) -> per-detector batcher -> worker pool -> JSON result
+
+- models are loaded once per worker thread (Detectors), when the pool starts, never per request
+- each detector has its own batcher thread: once a worker is free it collects requests until max_batch are waiting
+  or the oldest one has waited max_wait seconds, and hands the whole batch to that worker. A burst of small requests
+  costs one dispatch instead of one per request, and the worker keeps its models and caches warm for the whole batch
+- OpenCV releases the GIL, so the workers are plain threads sharing the process memory
+
+The same API is served over HTTP (standard library only):
+
+    POST /detect/<detector>?param=value   body: encoded image (jpg, png, ...)  ->  {"detector", "result", ...}
+    GET  /detectors                       ->  the detector names
+    GET  /stats                           ->  requests, batches and latency per detector
+
+A request that is not answered within request_timeout seconds gets 503 when it was still queued (it is cancelled and
+never runs: the service is overloaded) and 504 when a worker was already running it.
+
+    python -m object_detection.service --port 8080
+
+HTTPClient talks to a running server; LocalClient has the same detect() method but calls the service in-process,
+a stand-in for testing without sockets.
+'''
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from object_detection.detectors import Detectors
+from object_detection.pipeline import LatencyStats
+
+
+def decode_image(data):
+    """Encoded image bytes -> BGR image."""
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("could not decode the image")
+    return image
+
+
+def _parse_value(value):
+    # query string values are JSON when they can be ("7", "1.05", "[8, 8]", "true"), plain strings otherwise
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+class _Request:
+    __slots__ = ("image", "params", "future", "t_submit")
+
+    def __init__(self, image, params):
+        self.image = image
+        self.params = params
+        self.future = Future()
+        self.t_submit = time.perf_counter()
+
+
+class _Batcher:
+    """Collects the requests of one detector into batches and hands them to the worker pool."""
+
+    def __init__(self, name, service):
+        self.name = name
+        self.service = service
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._loop, name="batcher-" + name, daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        max_batch, max_wait = self.service.max_batch, self.service.max_wait
+        while True:
+            request = self.queue.get()
+            if request is None:
+                return
+            # wait for a free worker: meanwhile the requests pile up in the queue and make the batch bigger
+            self.service._slots.acquire()
+            batch = [request]
+            deadline = request.t_submit + max_wait
+            while len(batch) < max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    request = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.queue.put(None)  # finish this batch, stop on the next loop
+                    break
+                batch.append(request)
+            self.service._dispatch(self.name, batch)
+
+
+class DetectionService:
+    """
+    workers   - worker threads, each with its own Detectors (default: number of CPUs)
+    max_batch - most requests of one detector handed to a worker at once
+    max_wait  - seconds a request may wait for its batch to fill up
+    detectors - keyword arguments for Detectors (templates, products, kind)
+    """
+
+    def __init__(self, workers=None, max_batch=8, max_wait=0.002, **detectors):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._config = detectors
+        self._local = threading.local()
+        # models are loaded by the initializer, so the first requests do not pay for them
+        self._ready = threading.Barrier(self.workers + 1)
+        self._init_error = None
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="detector", initializer=self._init_worker)
+        for _ in range(self.workers):
+            self.executor.submit(self._ready.wait)
+        try:
+            self._ready.wait()
+        except threading.BrokenBarrierError:
+            # a worker could not load the models (missing template, product image or store): the pool is broken
+            self.executor.shutdown()
+            raise self._init_error
+
+        # at most one batch per worker in flight, the rest of the requests wait in their detector's queue
+        self._slots = threading.Semaphore(self.workers)
+        self.names = Detectors.NAMES
+        self.batchers = {name: _Batcher(name, self) for name in self.names}
+        self._lock = threading.Lock()
+        self.counts = {name: {"requests": 0, "errors": 0, "timeouts": 0, "batches": 0} for name in self.names}
+        self.latency = {name: LatencyStats() for name in self.names}
+
+    def _init_worker(self):
+        cv2.setNumThreads(1)  # parallelism comes from the workers
+        try:
+            self._local.detectors = Detectors(**self._config)
+        except Exception as e:
+            # wake up the constructor, which is waiting for every worker to be ready, and let it raise e
+            self._init_error = e
+            self._ready.abort()
+            raise
+
+    def _dispatch(self, name, batch):
+        with self._lock:
+            self.counts[name]["batches"] += 1
+        self.executor.submit(self._run_batch, name, batch)
+
+    def _run_batch(self, name, batch):
+        detectors = self._local.detectors
+        try:
+            for request in batch:
+                if not request.future.set_running_or_notify_cancel():
+                    continue  # timed out while queued, the caller is gone
+                try:
+                    image = decode_image(request.image) if isinstance(request.image, bytes) else request.image
+                    result = detectors.run(name, image, request.params)
+                except Exception as e:
+                    with self._lock:
+                        self.counts[name]["errors"] += 1
+                    request.future.set_exception(e)
+                    continue
+                self.latency[name].add(time.perf_counter() - request.t_submit)
+                request.future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def submit(self, name, image, params=None):
+        """Queue a request; image is a BGR array or encoded image bytes. Returns a Future of the JSON result."""
+        if name not in self.batchers:
+            raise KeyError("unknown detector: {}".format(name))
+        request = _Request(image, dict(params or {}))
+        with self._lock:
+            self.counts[name]["requests"] += 1
+        self.batchers[name].queue.put(request)
+        return request.future
+
+    def detect(self, name, image, params=None, timeout=None):
+        """Result of one request; raises concurrent.futures.TimeoutError after timeout seconds (see abandon)."""
+        future = self.submit(name, image, params)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            self.abandon(name, future)
+            raise
+
+    def abandon(self, name, future):
+        """Give up on a request that timed out. True when it was still queued: it is cancelled and never runs."""
+        with self._lock:
+            self.counts[name]["timeouts"] += 1
+        return future.cancel()
+
+    def stats(self):
+        with self._lock:
+            counts = {name: dict(c) for name, c in self.counts.items()}
+        for name, c in counts.items():
+            c["mean_batch"] = c["requests"] / c["batches"] if c["batches"] else 0.0
+            c["latency"] = self.latency[name].summary()
+        return counts
+
+    def close(self):
+        for batcher in self.batchers.values():
+            batcher.queue.put(None)
+        for batcher in self.batchers.values():
+            batcher.thread.join()
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def make_server(service, host="127.0.0.1", port=8080, request_timeout=30.0):
+    """
+    HTTP front end of the service; call serve_forever() on the result. Port 0 picks a free port.
+    A detection that takes longer than request_timeout seconds is answered with 503 (still queued) or 504 (running).
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, a client reuses its connection
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/detectors":
+                self._reply(200, {"detectors": list(service.names)})
+            elif self.path == "/stats":
+                self._reply(200, service.stats())
+            else:
+                self._reply(404, {"error": "not found: {}".format(self.path)})
+
+        def do_POST(self):
+            url = urllib.parse.urlsplit(self.path)
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            name = url.path[len("/detect/"):] if url.path.startswith("/detect/") else None
+            if name not in service.batchers:
+                self._reply(404, {"error": "unknown detector: {}".format(name)})
+                return
+            params = {k: _parse_value(v) for k, v in urllib.parse.parse_qsl(url.query)}
+            start = time.perf_counter()
+            future = service.submit(name, body, params)
+            try:
+                result = future.result(request_timeout)
+            except FutureTimeout:
+                queued = service.abandon(name, future)
+                self._reply(503 if queued else 504, {"error": "no result within {}s, the request {}".format(
+                    request_timeout, "was still queued" if queued else "is still running")})
+                return
+            except (ValueError, TypeError) as e:
+                self._reply(400, {"error": str(e)})
+                return
+            except Exception as e:
+                self._reply(500, {"error": "{}: {}".format(type(e).__name__, e)})
+                return
+            self._reply(200, {"detector": name, "result": result,
+                              "seconds": round(time.perf_counter() - start, 6)})
+
+        def log_message(self, format, *args):
+            pass  # one line per request would cost more than the small detectors
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def _encode(image):
+    if isinstance(image, bytes):
+        return image
+    ok, data = cv2.imencode(".png", image)
+    if not ok:
+        raise ValueError("could not encode the image")
+    return data.tobytes()
+
+
+class HTTPClient:
+    """Client of a running server. Not thread-safe: use one client per thread."""
+
+    def __init__(self, url="http://127.0.0.1:8080", timeout=60):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def detect(self, name, image, **params):
+        query = urllib.parse.urlencode({k: json.dumps(v) for k, v in params.items()})
+        url = "{}/detect/{}{}".format(self.url, name, "?" + query if query else "")
+        request = urllib.request.Request(url, data=_encode(image), method="POST",
+                                         headers={"Content-Type": "application/octet-stream"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())["result"]
+        except urllib.error.HTTPError as e:
+            raise ValueError(json.loads(e.read()).get("error", str(e)))
+
+    def stats(self):
+        with urllib.request.urlopen(self.url + "/stats", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+class LocalClient:
+    """Stand-in for HTTPClient calling the service in-process, so the same code runs without a server."""
+
+    def __init__(self, service, timeout=60):
+        self.service = service
+        self.timeout = timeout
+
+    def detect(self, name, image, **params):
+        # round-trip through JSON so the results are exactly what an HTTP client would get
+        return json.loads(json.dumps(self.service.detect(name, image, params, self.timeout)))
+
+    def stats(self):
+        return self.service.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detection service over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a request gets 503/504")
+    args = parser.parse_args(argv)
+
+    with DetectionService(args.workers, args.max_batch, args.max_wait_ms / 1000.0) as service:
+        server = make_server(service, args.host, args.port, args.timeout)
+        print("serving {} on http://{}:{}".format(", ".join(service.names), *server.server_address))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+'''
+Parameter sweeps for detector tuning, with cached intermediate results (see 8, 9, 10_custom_cascade and 11).
+
+The tutorials tune by hand: own_cascade_detection.py has live trackbars for scale and neighbors, the cat script
+hard-codes scaleFactor=1.045, minNeighbors=2 and the face script switches to minNeighbors=7. sweep() evaluates a
+whole grid of parameters against a labeled image set instead, and reports precision, recall, F1 and time per image
+of every parameter set, and the speed/accuracy Pareto front.
+
+Every detector is split into an expensive raw stage and a cheap finishing stage, and only the parameters of the raw
+stage key the cache, together with the SHA-1 of the image file:
+
+- cascade: raw = every window hit of detectMultiScale(scaleFactor, minNeighbors=0), which is the whole pyramid
+  search; minSize/maxSize only skip pyramid levels and minNeighbors only groups, so they are applied to the cached
+  hits afterwards - with exactly the boxes detectMultiScale gives
+- hog: raw = the ungrouped hits and weights of detectMultiScale(scale, winStride, padding, hitThreshold);
+  groupThreshold and an optional NMS overlap are applied afterwards (grouped boxes within a few pixels of
+  detectMultiScale's: it weights the group average, cv2.groupRectangles does not)
+- canny: raw = the blurred grayscale image; low/high run Canny on it
+- color: raw = the blurred HSV image; lower/upper/min_area run inRange and the contours on it
+
+Raw rects are small and stored on disk as well (cache directory), so sweeping more neighbors, sizes or thresholds
+later only pays for the finishing stage; images stay in memory only. The reported time of a parameter set is what
+it would cost without the cache: the raw stage time recorded when it was computed, plus the finishing stage. The
+levels minSize/maxSize would skip are therefore still counted in a cascade's time.
+
+Labels: the boxes detectors take an info file as opencv_traincascade does (pos.lst: "img.png 2 x y w h x y w h"),
+canny takes a manifest of "image reference_edges" lines, the reference being a binary edge image.
+
+    python -m object_detection.sweep cascade faces.lst --grid '{"scaleFactor": [1.1, 1.3], "minNeighbors": [3, 5, 7]}'
+'''
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from object_detection.batch import thread_map
+from object_detection.color_tracking import BLUE_LOWER, BLUE_UPPER
+from object_detection.dataset import read_info
+from object_detection.nms import box_overlap, group_scores, postprocess
+from object_detection.registry import default_registry, get_cascade
+
+
+def grid(**axes):
+    """Every combination of the axes: grid(a=[1, 2], b=[3]) -> [{"a": 1, "b": 3}, {"a": 2, "b": 3}]."""
+    names = sorted(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[n] for n in names))]
+
+
+def file_hash(path):
+    """SHA-1 of a file's content, so renamed or copied images still hit the cache."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _size(value):
+    if value is None or isinstance(value, (tuple, list)):
+        return None if value is None else tuple(value)
+    return int(value), int(value)
+
+
+class ResultCache:
+    """
+    Raw stage results keyed by (image hash, detector, raw parameters). Every entry is a dict of NumPy arrays and the
+    seconds it took to compute. The last max_items entries stay in memory; entries computed with persist=True are
+    also written to directory (one .npz per key) and read back by later sweeps.
+    """
+
+    def __init__(self, directory=None, max_items=256):
+        self.directory = directory
+        self.max_items = max_items
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def digest(key):
+        return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _remember(self, digest, entry):
+        with self.lock:
+            self.memory[digest] = entry
+            self.memory.move_to_end(digest)
+            while len(self.memory) > self.max_items:
+                self.memory.popitem(last=False)
+
+    def get(self, key, compute, persist=False):
+        """(arrays, seconds) of key, from memory, disk or compute() -> arrays."""
+        digest = self.digest(key)
+        with self.lock:
+            entry = self.memory.get(digest)
+            if entry is not None:
+                self.memory.move_to_end(digest)
+                self.hits += 1
+                return entry
+
+        path = os.path.join(self.directory, digest + ".npz") if self.directory and persist else None
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files if name != "_seconds"}
+                entry = (arrays, float(data["_seconds"]))
+            with self.lock:
+                self.disk_hits += 1
+        else:
+            start = time.perf_counter()
+            arrays = compute()
+            entry = (arrays, time.perf_counter() - start)
+            with self.lock:
+                self.misses += 1
+            if path:
+                # written next to the final name and renamed, so a concurrent sweep never reads half a file
+                tmp = "{}.{}.tmp.npz".format(path[:-4], threading.get_ident())
+                np.savez(tmp, _seconds=np.float64(entry[1]), **arrays)
+                os.replace(tmp, path)
+        self._remember(digest, entry)
+        return entry
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+class CascadeSweep:
+    """Haar cascade: scaleFactor (raw), minNeighbors, minSize, maxSize. Labels are boxes."""
+
+    labels = "boxes"
+    raw_params = ("scaleFactor",)
+    persist = True
+    defaults = {"scaleFactor": 1.1, "minNeighbors": 3, "minSize": None, "maxSize": None}
+
+    def __init__(self, cascade="face"):
+        self.cascade = cascade
+        path = default_registry.resolve(cascade)
+        self.key = ("cascade", path, os.stat(path).st_mtime_ns)
+
+    def prepare(self, image):
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    def raw(self, gray, params):
+        rects = get_cascade(self.cascade).detectMultiScale(gray, scaleFactor=params["scaleFactor"], minNeighbors=0)
+        return {"rects": np.asarray(rects, np.int32).reshape(-1, 4)}
+
+    def finish(self, raw, params):
+        rects = raw["rects"]
+        # the levels detectMultiScale would skip for minSize/maxSize: the window size is the rect size
+        low, high = _size(params["minSize"]), _size(params["maxSize"])
+        if low is not None:
+            rects = rects[(rects[:, 2] >= low[0]) & (rects[:, 3] >= low[1])]
+        if high is not None:
+            rects = rects[(rects[:, 2] <= high[0]) & (rects[:, 3] <= high[1])]
+        if len(rects) == 0:
+            return rects
+        boxes, _ = cv2.groupRectangles(rects.tolist(), params["minNeighbors"], 0.2)
+        return np.asarray(boxes, np.int32).reshape(-1, 4)
+
+
+class HOGSweep:
+    """HOG people detector: scale, winStride, padding, hitThreshold (raw), groupThreshold, nms overlap."""
+
+    labels = "boxes"
+    raw_params = ("scale", "winStride", "padding", "hitThreshold")
+    persist = True
+    defaults = {"scale": 1.05, "winStride": 8, "padding": 8, "hitThreshold": 0.0, "groupThreshold": 2, "nms": None}
+
+    def __init__(self):
+        self.key = ("hog", "default_people")
+        self._local = threading.local()
+
+    def prepare(self, image):
+        return image
+
+    def raw(self, image, params):
+        hog = getattr(self._local, "hog", None)
+        if hog is None:
+            hog = self._local.hog = cv2.HOGDescriptor()
+            hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+        rects, weights = hog.detectMultiScale(image, hitThreshold=params["hitThreshold"],
+                                              winStride=_size(params["winStride"]), padding=_size(params["padding"]),
+                                              scale=params["scale"], groupThreshold=0)
+        return {"rects": np.asarray(rects, np.int32).reshape(-1, 4), "weights": np.asarray(weights).ravel()}
+
+    def finish(self, raw, params):
+        rects, weights = raw["rects"], raw["weights"]
+        if len(rects) and params["groupThreshold"] > 0:
+            boxes, _ = cv2.groupRectangles(rects.tolist(), params["groupThreshold"], 0.2)
+            boxes = np.asarray(boxes, np.int32).reshape(-1, 4)
+            # the weight of a group is the best weight of the hits it covers most
+            rects, weights = boxes, group_scores(rects, weights, boxes)
+        if params["nms"] is not None:
+            rects = postprocess(rects, weights, iou_threshold=params["nms"], metric="min")[0]
+        return rects
+
+
+class CannySweep:
+    """Canny: blur (raw), low, high. Labels are reference edge images, compared with a 1-pixel tolerance."""
+
+    labels = "edges"
+    raw_params = ("blur",)
+    persist = False
+    defaults = {"blur": 5, "low": 50, "high": 150}
+
+    def __init__(self):
+        self.key = ("canny",)
+
+    def prepare(self, image):
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    def raw(self, gray, params):
+        return {"image": cv2.blur(gray, (params["blur"], params["blur"])) if params["blur"] else gray}
+
+    def finish(self, raw, params):
+        return cv2.Canny(raw["image"], params["low"], params["high"])
+
+
+class ColorSweep:
+    """HSV range: blur (raw), lower, upper, min_area. Labels are boxes of the colored objects."""
+
+    labels = "boxes"
+    raw_params = ("blur",)
+    persist = False
+    defaults = {"blur": 11, "lower": BLUE_LOWER, "upper": BLUE_UPPER, "min_area": 100}
+
+    def __init__(self):
+        self.key = ("color",)
+
+    def prepare(self, image):
+        return image
+
+    def raw(self, image, params):
+        blurred = cv2.GaussianBlur(image, (params["blur"], params["blur"]), 0) if params["blur"] else image
+        return {"image": cv2.cvtColor(blurred, cv2.COLOR_BGR2HSV)}
+
+    def finish(self, raw, params):
+        mask = cv2.inRange(raw["image"], tuple(params["lower"]), tuple(params["upper"]))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= params["min_area"]]
+        return np.asarray(boxes, np.int32).reshape(-1, 4)
+
+
+SWEEPS = {"cascade": CascadeSweep, "hog": HOGSweep, "canny": CannySweep, "color": ColorSweep}
+
+
+def read_edge_labels(path):
+    """[(absolute image path, absolute reference edge image path)] of a manifest with one pair per line."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        return [tuple(os.path.join(base, p) for p in line.split()[:2]) for line in f if line.strip()]
+
+
+def match_boxes(found, truth, iou_threshold=0.5):
+    """(true positives, false positives, false negatives), every label matched at most once, best overlap first."""
+    if len(found) == 0 or len(truth) == 0:
+        return 0, len(found), len(truth)
+    overlap = box_overlap(found, truth)
+    pairs = np.argwhere(overlap >= iou_threshold)
+    pairs = pairs[np.argsort(-overlap[pairs[:, 0], pairs[:, 1]], kind="stable")]
+    used_found, used_truth = set(), set()
+    for i, j in pairs:
+        if i not in used_found and j not in used_truth:
+            used_found.add(i)
+            used_truth.add(j)
+    tp = len(used_found)
+    return tp, len(found) - tp, len(truth) - tp
+
+
+def match_edges(edges, reference, tolerance=1):
+    """Pixel (tp, fp, fn) of an edge map against a reference, edges within tolerance pixels count as found."""
+    kernel = np.ones((2 * tolerance + 1, 2 * tolerance + 1), np.uint8)
+    found, truth = edges > 0, reference > 0
+    tp = int(np.count_nonzero(found & (cv2.dilate(reference, kernel) > 0)))
+    fn = int(np.count_nonzero(truth & ~(cv2.dilate(edges, kernel) > 0)))
+    return tp, int(np.count_nonzero(found)) - tp, fn
+
+
+def sweep(kind, labels, params, workers=None, cache=None, iou_threshold=0.5, **options):
+    """
+    Evaluates every parameter dict of params (see grid) on the labeled images. labels is an info file / manifest
+    path or a list of (image path, boxes or reference path). options go to the detector (e.g. cascade="cat").
+    Returns one row per parameter set: {"params", "ms" per image, "precision", "recall", "f1", "tp", "fp", "fn"}.
+    Images run on a thread pool, each worker evaluating all parameter sets of its image.
+    """
+    if kind not in SWEEPS:
+        raise ValueError("unknown detector {}, use one of {}".format(kind, ", ".join(SWEEPS)))
+    detector = SWEEPS[kind](**options)
+    if isinstance(labels, str):
+        labels = read_edge_labels(labels) if detector.labels == "edges" else read_info(labels)
+    cache = cache or ResultCache()
+    params = [dict(detector.defaults, **p) for p in params]
+
+    def run(entry):
+        path, truth = entry
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError("could not read {}".format(path))
+        if detector.labels == "edges":
+            truth = cv2.imread(truth, cv2.IMREAD_GRAYSCALE)
+        image_hash = file_hash(path)
+        start = time.perf_counter()
+        prepared = detector.prepare(image)
+        prepare_seconds = time.perf_counter() - start
+
+        results = []
+        for p in params:
+            raw_params = {name: p[name] for name in detector.raw_params}
+            raw, raw_seconds = cache.get([image_hash, detector.key, raw_params],
+                                         lambda: detector.raw(prepared, raw_params), detector.persist)
+            start = time.perf_counter()
+            found = detector.finish(raw, p)
+            seconds = prepare_seconds + raw_seconds + time.perf_counter() - start
+            if detector.labels == "edges":
+                counts = match_edges(found, truth)
+            else:
+                counts = match_boxes(found, np.asarray(truth).reshape(-1, 4), iou_threshold)
+            results.append(counts + (seconds,))
+        return results
+
+    totals = np.zeros((len(params), 4))
+    count = 0
+    for results in thread_map(run, labels, workers, name="sweep"):
+        totals += np.asarray(results, np.float64)
+        count += 1
+
+    rows = []
+    for p, (tp, fp, fn, seconds) in zip(params, totals):
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        rows.append({
+            "params": p,
+            "ms": seconds * 1000 / max(count, 1),
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "tp": int(tp), "fp": int(fp), "fn": int(fn),
+        })
+    return rows
+
+
+def pareto_front(rows, cost="ms", score="f1"):
+    """The rows no other row beats on both cost (lower) and score (higher), cheapest first."""
+    front = []
+    for row in sorted(rows, key=lambda r: (r[cost], -r[score])):
+        if not front or row[score] > front[-1][score]:
+            front.append(row)
+    return front
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parameter sweep of a detector against labeled images")
+    parser.add_argument("detector", choices=sorted(SWEEPS))
+    parser.add_argument("labels", help="info file (boxes) or image / reference edges manifest (canny)")
+    parser.add_argument("--grid", default="{}", help="JSON {parameter: [values]}, default: the detector's defaults")
+    parser.add_argument("--option", action="append", default=[], metavar="NAME=VALUE",
+                        help="detector option, e.g. cascade=cat")
+    parser.add_argument("--cache", default=None, help="directory keeping the raw results between sweeps")
+    parser.add_argument("--iou", type=float, default=0.5, help="overlap for a detection to match a label")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("-o", "--output", help="write every row as JSON")
+    args = parser.parse_args(argv)
+
+    options = dict(option.split("=", 1) for option in args.option)
+    cache = ResultCache(args.cache)
+    start = time.perf_counter()
+    rows = sweep(args.detector, args.labels, grid(**json.loads(args.grid)), args.workers, cache, args.iou, **options)
+    elapsed = time.perf_counter() - start
+
+    front = pareto_front(rows)
+    print("{:>9} {:>9} {:>9} {:>9}  {}".format("ms/image", "precision", "recall", "f1", "params (* = Pareto front)"))
+    for row in sorted(rows, key=lambda r: r["ms"]):
+        print("{:>9.1f} {:>9.3f} {:>9.3f} {:>9.3f}  {}{}".format(row["ms"], row["precision"], row["recall"], row["f1"],
+                                                               "* " if row in front else "  ", row["params"]))
+    print("{} parameter sets in {:.2f}s, cache: {}".format(len(rows), elapsed, cache.stats()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rows": rows, "front": front}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+'''
+Template matching engine (see 5_template_matching).
+
+The tutorial runs a full cv2.matchTemplate per method over the whole image, keeps only the minMaxLoc best match and
+draws the rectangle into the image it searches, so every later method searches an already modified image.
+match_templates instead:
+
+1) searches coarse to fine - matchTemplate runs over the whole image only at the top of an image pyramid
+   (every pyrDown level has 4x fewer pixels and a 4x smaller template), and the candidates found there are refined
+   at full resolution inside small windows around them
+2) takes several templates and several template scales in one call
+3) returns every match above a threshold after non-maximum suppression, not only the single best one
+4) never writes into the search image - draw_matches draws on a copy when a picture is needed
+
+Only the normalized methods are supported because their scores are comparable between templates, scales and levels.
+TM_SQDIFF_NORMED scores are reported as 1 - score, so a higher score is always a better match.
+'''
+
+import cv2
+import numpy as np
+
+from object_detection.fft_matching import match_template
+from object_detection.nms import nms
+
+# method names of the tutorial, without eval()
+METHODS = {
+    "TM_CCOEFF_NORMED": cv2.TM_CCOEFF_NORMED,
+    "TM_CCORR_NORMED": cv2.TM_CCORR_NORMED,
+    "TM_SQDIFF_NORMED": cv2.TM_SQDIFF_NORMED,
+}
+
+
+def _method(method):
+    if isinstance(method, str):
+        method = METHODS.get(method, method)
+    if method not in METHODS.values():
+        raise ValueError("unsupported method {}, use one of {}".format(method, ", ".join(METHODS)))
+    return method
+
+
+def score_map(image, template, method, backend="spatial"):
+    """matchTemplate result where higher is always better. backend: "spatial", "fft" or "auto", see fft_matching."""
+    result = match_template(image, template, method, backend)
+    if method == cv2.TM_SQDIFF_NORMED:
+        result = 1.0 - result
+    return result
+
+
+def find_peaks(result, threshold, radius=1):
+    """Local maxima of a score map above threshold, as (ys, xs, scores) arrays."""
+    kernel = np.ones((2 * radius + 1, 2 * radius + 1), np.uint8)
+    peaks = (result >= threshold) & (result == cv2.dilate(result, kernel))
+    ys, xs = np.nonzero(peaks)
+    return ys, xs, result[ys, xs]
+
+
+def build_pyramid(image, levels):
+    pyramid = [image]
+    for _ in range(levels):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    return pyramid
+
+
+def _scaled_templates(templates, scales):
+    for name, template in templates:
+        for scale in scales:
+            if scale == 1.0:
+                yield name, scale, template
+            else:
+                interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+                yield name, scale, cv2.resize(template, None, fx=scale, fy=scale, interpolation=interpolation)
+
+
+def _coarse_candidates(pyramid, template, levels, method, threshold, max_candidates, backend):
+    """
+    Search the top pyramid level that the template still fits in.
+    Returns the candidates' full-resolution xs, ys, their coarse scores and the level factor.
+    """
+    th, tw = template.shape[:2]
+    # a template shrunk below ~8 pixels has nothing left to match on
+    while levels > 0 and min(th, tw) >> levels < 8:
+        levels -= 1
+    small = template
+    for _ in range(levels):
+        small = cv2.pyrDown(small)
+
+    result = score_map(pyramid[levels], small, method, backend)
+    ys, xs, scores = find_peaks(result, threshold)
+    order = np.argsort(scores)[::-1][:max_candidates]
+    factor = 1 << levels
+    return xs[order] * factor, ys[order] * factor, scores[order], factor
+
+
+def match_templates(image, templates, method="TM_CCOEFF_NORMED", threshold=0.8, scales=(1.0,), levels=2,
+                    coarse_slack=0.15, iou_threshold=0.3, max_candidates=50, backend="auto"):
+    """
+    image      - grayscale or BGR search image, never modified
+    templates  - a template image, or a list of (name, template) pairs
+    scales     - template scale factors to try
+    levels     - pyramid levels above full resolution used for the coarse search (0 = plain full search)
+    coarse_slack - the coarse level accepts candidates down to threshold - coarse_slack, since downsampling
+                   lowers the peak score a bit
+    backend    - matchTemplate backend of the whole-image coarse search; the small refinement windows always
+                 use the spatial one
+    Returns a list of dicts with template, scale, box (x, y, w, h) and score, best first.
+    """
+    method = _method(method)
+    if isinstance(templates, np.ndarray):
+        templates = [("template", templates)]
+    pyramid = build_pyramid(image, levels)
+    ih, iw = image.shape[:2]
+
+    boxes, scores, info = [], [], []
+    for name, scale, template in _scaled_templates(templates, scales):
+        th, tw = template.shape[:2]
+        if th > ih or tw > iw:
+            continue
+
+        xs, ys, coarse_scores, factor = _coarse_candidates(pyramid, template, levels, method,
+                                                           threshold - coarse_slack, max_candidates, backend)
+        if factor == 1:
+            # no pyramid for this template, the coarse search already was the full-resolution search
+            keep = [(x, y, s) for x, y, s in zip(xs, ys, coarse_scores) if s >= threshold]
+        else:
+            keep = []
+            margin = 2 * factor
+            for x, y in zip(xs, ys):
+                # refine inside a small full-resolution window around the coarse position
+                x0, y0 = max(0, x - margin), max(0, y - margin)
+                x1, y1 = min(iw, x + tw + margin), min(ih, y + th + margin)
+                result = score_map(image[y0:y1, x0:x1], template, method)
+                _, best, _, loc = cv2.minMaxLoc(result)
+                if best >= threshold:
+                    keep.append((x0 + loc[0], y0 + loc[1], best))
+
+        for x, y, s in keep:
+            boxes.append((int(x), int(y), tw, th))
+            scores.append(float(s))
+            info.append((name, scale))
+
+    if not boxes:
+        return []
+    scores = np.array(scores)
+    return [{"template": info[i][0], "scale": info[i][1], "box": boxes[i], "score": float(scores[i])}
+            for i in nms(boxes, scores, iou_threshold)]
+
+
+def draw_matches(image, matches, color=255, thickness=2):
+    """Copy of image with a rectangle around every match."""
+    canvas = image.copy()
+    for match in matches:
+        x, y, w, h = match["box"]
+        cv2.rectangle(canvas, (x, y), (x + w, y + h), color, thickness)
+    return canvas
@@ -0,0 +1,54 @@
+'''
+DetectionService start-up: a worker that cannot load its models makes the constructor raise instead of hang, with
+an error naming the missing file. A products store can be given by its path.
+
+    python -m pytest tests
+'''
+
+import threading
+
+import cv2
+import pytest
+
+from object_detection.descriptor_store import build_store
+from object_detection.detectors import Detectors
+from object_detection.samples import sample_path
+from object_detection.service import DetectionService
+
+
+def construct(**config):
+    """The exception of DetectionService(2, **config); fails the test if the constructor does not return."""
+    outcome = []
+
+    def target():
+        try:
+            DetectionService(2, **config).close()
+            outcome.append(None)
+        except Exception as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(60)
+    assert not thread.is_alive(), "DetectionService({}) hangs".format(config)
+    return outcome[0]
+
+
+@pytest.mark.parametrize("config, error, named", [
+    ({"products": "/nonexistent_dir"}, FileNotFoundError, "/nonexistent_dir"),
+    ({"products": {"nestle": "/nonexistent/nestle.jpg"}}, FileNotFoundError, "/nonexistent/nestle.jpg"),
+    ({"templates": {"cat_face": "/nonexistent/cat_face.jpg"}}, FileNotFoundError, "/nonexistent/cat_face.jpg"),
+    ({"templates": {"readme": sample_path("README.md")}}, ValueError, "README.md"),
+])
+def test_bad_config_raises(config, error, named):
+    e = construct(**config)
+    assert isinstance(e, error), e
+    assert named in str(e)
+
+
+def test_products_from_store_path(tmp_path):
+    store = str(tmp_path / "products.store")
+    build_store([sample_path("6_feature_matching", "nestle.jpg")], store, kinds=("sift",))
+    scene = cv2.imread(sample_path("6_feature_matching", "chocolates.jpg"))
+    products = Detectors(products=store, preload=False).run("features", scene)["products"]
+    assert [p["name"] for p in products] == ["nestle"]
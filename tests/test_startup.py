@@ -0,0 +1,32 @@
+'''
+Start-up checks of the detect command line, the pytest side of benchmarks/bench_startup.py:
+importing object_detection.cli and detect --help load none of cv2, numpy or matplotlib and stay within the budget.
+
+    python -m pytest tests
+'''
+
+from benchmarks.bench_startup import BUDGET_HELP_MS, HEAVY, heavy_imports, median_ms, python_env, run_python
+
+REPEAT = 5
+
+# --help exits through SystemExit, so the loaded modules are printed from an atexit hook
+HELP_PROBE = ("import atexit, sys; atexit.register(lambda: print('loaded:', *(m for m in {!r} if m in sys.modules)));"
+              "from object_detection.cli import main; main(['--help'])").format(HEAVY)
+
+
+def test_cli_import_loads_nothing_heavy():
+    assert heavy_imports("import object_detection.cli", python_env()) == []
+
+
+def test_help_loads_nothing_heavy():
+    output = run_python(["-c", HELP_PROBE], python_env())[1]
+    assert "usage: python -m object_detection" in output
+    assert output.splitlines()[-1].split()[1:] == []
+
+
+def test_cli_import_within_budget():
+    assert median_ms(["-c", "import object_detection.cli"], python_env(), REPEAT) <= BUDGET_HELP_MS
+
+
+def test_help_within_budget():
+    assert median_ms(["-m", "object_detection", "--help"], python_env(), REPEAT) <= BUDGET_HELP_MS